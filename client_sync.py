@@ -14,6 +14,7 @@ django.setup()  # Initialize Django
 # 2) Import Django models AFTER django.setup()
 # -----------------------------------------------------------------------------
 from main.models import Client, Contact  # Adjust import paths to match your project
+from main.linking import link_foreign_keys
 
 # -----------------------------------------------------------------------------
 # 3) API Credentials & Base URL (read via python-decouple)
@@ -218,6 +219,9 @@ def sync_clients_to_db():
                 }
             )
 
+    # Jobs synced before their client can be linked now
+    link_foreign_keys()
+
     print(f"Successfully synced {len(clients_data)} clients (and their contacts).")
 
 
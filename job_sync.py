@@ -7,6 +7,7 @@ from datetime import datetime
 from django.utils import timezone
 from decimal import Decimal, InvalidOperation
 import decimal
+import uuid
 
 # -----------------------------------------------------------------------------
 # 1) Configure Django
@@ -18,11 +19,13 @@ django.setup()  # Initialize Django
 # 2) Import Django models AFTER django.setup()
 # -----------------------------------------------------------------------------
 from main.models import (
+    Client,
     Job,
     Task,
     JobAssignedStaff,
     TaskAssignedStaff,
 )
+from main.linking import link_foreign_keys, staff_pk_map
 
 # -----------------------------------------------------------------------------
 # 3) API Credentials & Base URL (read via python-decouple)
@@ -104,6 +107,10 @@ def sync_jobs_for_staff(modified_since=None):
         print("No <Job> elements found in the response.")
         return
 
+    # Lookup tables for the foreign keys, loaded once instead of per job
+    client_pks = dict(Client.objects.values_list("uuid", "pk"))
+    staff_pks = staff_pk_map()
+
     total_jobs = 0
     for job_el in job_elements:
         # --- 1) Extract top-level Job fields ---
@@ -160,6 +167,7 @@ def sync_jobs_for_staff(modified_since=None):
                 "manager_uuid": j_manager_uuid,
                 "partner_uuid": j_partner_uuid,
                 "client_uuid": j_client_uuid,
+                "client_id": client_pks.get(_parse_uuid(j_client_uuid)),
                 "web_url": j_web_url or "",
             }
         )
@@ -177,6 +185,7 @@ def sync_jobs_for_staff(modified_since=None):
                     staff_uuid=s_uuid,
                     defaults={
                         "staff_name": s_name or "",
+                        "staff_id": staff_pks.get(_parse_uuid(s_uuid)),
                     }
                 )
 
@@ -228,6 +237,9 @@ def sync_jobs_for_staff(modified_since=None):
 
         total_jobs += 1
 
+    # Timesheets synced before their job/task can be linked now
+    link_foreign_keys()
+
     print(f"Successfully synced {total_jobs} Jobs (and their related tasks/staff).")
 
 # -----------------------------------------------------------------------------
@@ -288,6 +300,18 @@ def _parse_decimal(num_str):
     except (ValueError, InvalidOperation, decimal.DivisionByZero, OverflowError, TypeError):
         return None
 
+def _parse_uuid(uuid_str):
+    """
+    Convert a UUID string (any case, with or without hyphens) to a UUID.
+    Return None if blank or invalid.
+    """
+    if not uuid_str:
+        return None
+    try:
+        return uuid.UUID(uuid_str)
+    except ValueError:
+        return None
+
 def _parse_int(num_str):
     """
     Convert a numeric string to int. Return 0 if blank or invalid.
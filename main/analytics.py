@@ -0,0 +1,355 @@
+# main/analytics.py
+
+"""
+In-process columnar copy of the Timesheet table for ad-hoc analytics.
+
+Each worker process keeps one TimesheetCube: staff, job and task are
+dictionary-encoded to integer codes, entry dates are stored as day ordinals
+and minutes / billable as plain NumPy columns, so a filter + group-by + sum
+is a handful of vectorized operations instead of a GROUP BY on the raw table.
+The client of each row is resolved at query time through a small job ->
+client code array, so relinking a job to its client needs no row rewrites.
+
+The cube loads lazily on first use and then follows the change log: rows of
+created/updated timesheets are re-read and appended, superseded and deleted
+rows are masked out, and the arrays are compacted once enough rows are dead.
+"""
+
+import threading
+import time
+from datetime import date
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from .changelog import ChangeCursor
+from .models import Timesheet, Job, Staff, Client, DataVersion
+
+GROUP_DIMENSIONS = ('staff', 'job', 'task', 'client', 'day', 'week', 'month', 'billable')
+MAX_GROUP_DIMENSIONS = 3
+
+TIMESHEET_COLUMNS = ('uuid', 'staff_uuid', 'job_number', 'task_uuid', 'entry_date', 'minutes', 'billable')
+
+# Rows read per round trip when loading, and UUIDs per IN (...) when refreshing
+LOAD_CHUNK_SIZE = 50000
+REFRESH_CHUNK_SIZE = 1000
+
+# More pending changes (of any model) than this and a full reload is cheaper
+MAX_INCREMENTAL_CHANGES = 100000
+
+# Day ordinal of 1970-01-01, to convert ordinals to numpy datetime64
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+# Month key of rows without a date (real keys are months since 1970, possibly negative).
+# Kept small enough that packed group keys can't overflow int64.
+_NO_MONTH = -1000000
+
+
+class Dictionary:
+    """Dictionary encoding: value <-> dense integer code (-1 stands for None)"""
+
+    def __init__(self):
+        self.values = []
+        self.codes = {}
+
+    def __len__(self):
+        return len(self.values)
+
+    def encode(self, value):
+        if value is None:
+            return -1
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def lookup(self, values):
+        """Codes of the known `values` (unknown ones can't match anything)"""
+        return np.array([self.codes[value] for value in values if value in self.codes], dtype=np.int32)
+
+    def decode(self, code):
+        return None if code < 0 else self.values[code]
+
+
+def _day_ordinal(entry_date):
+    # 0 is "no date"; real ordinals start at 1
+    return timezone.localdate(entry_date).toordinal() if entry_date is not None else 0
+
+
+class TimesheetCube:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.loaded = False
+        self.last_checked = 0.0
+        self.caught_up_to = None
+
+    # Loading and refreshing
+
+    def _reset(self):
+        self.staff_codes = Dictionary()
+        self.job_codes = Dictionary()
+        self.task_codes = Dictionary()
+        self.client_codes = Dictionary()
+        self.size = 0
+        self.dead = 0
+        self.row_of = {}
+        self.columns = {
+            'staff': np.empty(0, dtype=np.int32),
+            'job': np.empty(0, dtype=np.int32),
+            'task': np.empty(0, dtype=np.int32),
+            'day': np.empty(0, dtype=np.int32),
+            'minutes': np.empty(0, dtype=np.int64),
+            'billable': np.empty(0, dtype=bool),
+            'alive': np.empty(0, dtype=bool),
+        }
+        self.job_client = np.empty(0, dtype=np.int32)
+        self.labels = {'staff': {}, 'job': {}, 'client': {}}
+        self.dimension_versions = None
+
+    def _append(self, rows):
+        """Encode and append Timesheet value rows (in TIMESHEET_COLUMNS order)"""
+        if not rows:
+            return
+        new = {
+            'staff': np.fromiter((self.staff_codes.encode(r[1]) for r in rows), dtype=np.int32, count=len(rows)),
+            'job': np.fromiter((self.job_codes.encode(r[2]) for r in rows), dtype=np.int32, count=len(rows)),
+            'task': np.fromiter((self.task_codes.encode(r[3]) for r in rows), dtype=np.int32, count=len(rows)),
+            'day': np.fromiter((_day_ordinal(r[4]) for r in rows), dtype=np.int32, count=len(rows)),
+            'minutes': np.fromiter((r[5] or 0 for r in rows), dtype=np.int64, count=len(rows)),
+            'billable': np.fromiter((bool(r[6]) for r in rows), dtype=bool, count=len(rows)),
+            'alive': np.ones(len(rows), dtype=bool),
+        }
+        needed = self.size + len(rows)
+        capacity = len(self.columns['alive'])
+        if needed > capacity:
+            capacity = max(needed, capacity * 2)
+            for name, column in self.columns.items():
+                grown = np.zeros(capacity, dtype=column.dtype)
+                grown[:self.size] = column[:self.size]
+                self.columns[name] = grown
+        for name, values in new.items():
+            self.columns[name][self.size:needed] = values
+        for offset, row in enumerate(rows):
+            self.row_of[row[0]] = self.size + offset
+        self.size = needed
+
+    def _load_dimensions(self):
+        """Names and the job -> client mapping; small, so simply re-read when they change"""
+        self.labels['staff'] = dict(Staff.objects.values_list('uuid', 'name'))
+        self.labels['client'] = dict(Client.objects.values_list('uuid', 'name'))
+        self.labels['job'] = {}
+        job_client = {}
+        for job_number, name, client_uuid in Job.objects.values_list('job_id', 'name', 'client__uuid'):
+            self.labels['job'][job_number] = name
+            job_client[self.job_codes.encode(job_number)] = self.client_codes.encode(client_uuid)
+        self.job_client = np.full(len(self.job_codes), -1, dtype=np.int32)
+        for job_code, client_code in job_client.items():
+            self.job_client[job_code] = client_code
+
+    def load(self):
+        with self._lock:
+            self._reset()
+            # Take the change-log position first so nothing written during the load is missed
+            self.changes = ChangeCursor()
+            self.dimension_versions = DataVersion.current(['job', 'client', 'staff'])
+            chunk = []
+            for row in Timesheet.objects.values_list(*TIMESHEET_COLUMNS).iterator(chunk_size=5000):
+                chunk.append(row)
+                if len(chunk) >= LOAD_CHUNK_SIZE:
+                    self._append(chunk)
+                    chunk = []
+            self._append(chunk)
+            self._load_dimensions()
+            self.loaded = True
+            self.last_checked = time.monotonic()
+
+    def refresh(self):
+        """Apply the timesheet changes logged since the last load/refresh"""
+        with self._lock:
+            changes = self.changes.read(MAX_INCREMENTAL_CHANGES)
+            if changes is None:
+                self.load()
+                return
+            latest = {row[2]: row[3] for row in changes if row[1] == 'timesheet'}
+            if latest:
+                for object_uuid in latest:
+                    row = self.row_of.pop(object_uuid, None)
+                    if row is not None:
+                        self.columns['alive'][row] = False
+                        self.dead += 1
+                upserted = [u for u, action in latest.items() if action != 'DELETE']
+                for start in range(0, len(upserted), REFRESH_CHUNK_SIZE):
+                    self._append(list(
+                        Timesheet.objects.filter(uuid__in=upserted[start:start + REFRESH_CHUNK_SIZE])
+                        .values_list(*TIMESHEET_COLUMNS)
+                    ))
+                if self.dead > self.size // 4:
+                    self._compact()
+
+            versions = DataVersion.current(['job', 'client', 'staff'])
+            if versions != self.dimension_versions or len(self.job_client) < len(self.job_codes):
+                self._load_dimensions()
+                self.dimension_versions = versions
+            self.last_checked = time.monotonic()
+
+    def _compact(self):
+        alive = self.columns['alive'][:self.size]
+        keep = np.flatnonzero(alive)
+        for name in self.columns:
+            self.columns[name] = self.columns[name][keep]
+        # Rows keep their relative order, so renumber the live UUIDs in row order
+        uuids = sorted(self.row_of, key=self.row_of.get)
+        self.row_of = {object_uuid: index for index, object_uuid in enumerate(uuids)}
+        self.size = len(keep)
+        self.dead = 0
+
+    def ensure_fresh(self):
+        interval = getattr(settings, 'ANALYTICS_REFRESH_INTERVAL', 2.0)
+        with self._lock:
+            if not self.loaded:
+                self.load()
+            elif time.monotonic() - self.last_checked >= interval:
+                self.refresh()
+
+    def catch_up(self, versions):
+        """
+        Make sure the cube has every change counted in `versions` (DataVersion
+        numbers the caller has just read), refreshing now rather than after
+        ANALYTICS_REFRESH_INTERVAL if they moved since the last call. The
+        versions are bumped after the change is logged, so an ETag made from
+        them never outruns the body (see utils.conditional_on).
+        """
+        with self._lock:
+            if not self.loaded:
+                self.load()
+            elif versions != self.caught_up_to:
+                self.refresh()
+            self.caught_up_to = versions
+
+    # Querying
+
+    def aggregate(self, group_by=(), staff=None, jobs=None, clients=None, tasks=None,
+                  start=None, end=None, billable=None, limit=1000):
+        """
+        Sum minutes over the live rows matching the filters, grouped by up to
+        three of GROUP_DIMENSIONS. Filters take raw values (UUIDs, job numbers,
+        dates); None means "don't filter". Returns a list of dicts.
+        """
+        with self._lock:
+            n = self.size
+            cols = {name: column[:n] for name, column in self.columns.items()}
+            # Pad with -1 for jobs not synced yet; the last slot also serves job code -1
+            job_client = np.full(len(self.job_codes) + 1, -1, dtype=np.int32)
+            job_client[:len(self.job_client)] = self.job_client
+            client = job_client[cols['job']]
+
+            mask = cols['alive'].copy()
+            if staff is not None:
+                mask &= np.isin(cols['staff'], self.staff_codes.lookup(staff))
+            if jobs is not None:
+                mask &= np.isin(cols['job'], self.job_codes.lookup(jobs))
+            if tasks is not None:
+                mask &= np.isin(cols['task'], self.task_codes.lookup(tasks))
+            if clients is not None:
+                mask &= np.isin(client, self.client_codes.lookup(clients))
+            if start is not None:
+                mask &= cols['day'] >= start.toordinal()
+            if end is not None:
+                mask &= (cols['day'] <= end.toordinal()) & (cols['day'] > 0)
+            if billable is not None:
+                mask &= cols['billable'] == billable
+
+            minutes = cols['minutes'][mask]
+            billable_minutes = np.where(cols['billable'][mask], minutes, 0)
+            day = cols['day'][mask]
+            keys = []
+            for dimension in group_by:
+                if dimension == 'client':
+                    keys.append(client[mask].astype(np.int64))
+                elif dimension == 'week':
+                    keys.append(np.where(day > 0, day - (day - 1) % 7, 0).astype(np.int64))
+                elif dimension == 'month':
+                    months = (day.astype(np.int64) - _EPOCH_ORDINAL).astype('datetime64[D]').astype('datetime64[M]')
+                    keys.append(np.where(day > 0, months.astype(np.int64), _NO_MONTH))
+                elif dimension == 'billable':
+                    keys.append(cols['billable'][mask].astype(np.int64))
+                else:
+                    keys.append(cols[dimension][mask].astype(np.int64))
+
+            if not keys:
+                totals = [(minutes.sum(), billable_minutes.sum(), len(minutes))]
+                groups = [()]
+            elif not len(minutes):
+                totals, groups = [], []
+            else:
+                # Pack the group columns into one mixed-radix int64 key; a 1-D unique is far
+                # cheaper than a row-wise one
+                offsets = [key.min() for key in keys]
+                radices = [int(key.max() - offset) + 1 for key, offset in zip(keys, offsets)]
+                packed = np.zeros(len(minutes), dtype=np.int64)
+                for key, offset, radix in zip(keys, offsets, radices):
+                    packed = packed * radix + (key - offset)
+                unique, inverse = np.unique(packed, return_inverse=True)
+                totals = zip(
+                    np.bincount(inverse, weights=minutes, minlength=len(unique)),
+                    np.bincount(inverse, weights=billable_minutes, minlength=len(unique)),
+                    np.bincount(inverse, minlength=len(unique)),
+                )
+                columns = []
+                for offset, radix in reversed(list(zip(offsets, radices))):
+                    columns.append(unique % radix + offset)
+                    unique = unique // radix
+                groups = zip(*reversed(columns))
+
+            results = []
+            for key, (total, billable_total, count) in zip(groups, totals):
+                row = {}
+                for dimension, code in zip(group_by, key):
+                    row.update(self._decode(dimension, int(code)))
+                total, billable_total = int(total), int(billable_total)
+                row.update({
+                    'minutes': total,
+                    'hours': total / 60,
+                    'billable_minutes': billable_total,
+                    'entries': int(count),
+                    'billable_ratio': round(billable_total / total, 4) if total else None,
+                })
+                results.append(row)
+
+        if not set(group_by) & {'day', 'week', 'month'}:
+            results.sort(key=lambda row: row['minutes'], reverse=True)
+        return results[:limit]
+
+    def _decode(self, dimension, code):
+        if dimension == 'staff':
+            value = self.staff_codes.decode(code)
+            return {'staff_uuid': value, 'staff_name': self.labels['staff'].get(value)}
+        if dimension == 'job':
+            value = self.job_codes.decode(code)
+            return {'job_id': value, 'job_name': self.labels['job'].get(value)}
+        if dimension == 'task':
+            return {'task_uuid': self.task_codes.decode(code)}
+        if dimension == 'client':
+            value = self.client_codes.decode(code)
+            return {'client_uuid': value, 'client_name': self.labels['client'].get(value)}
+        if dimension == 'billable':
+            return {'billable': bool(code)}
+        if dimension == 'month':
+            return {'month': None if code == _NO_MONTH else str(np.datetime64(code, 'M'))}
+        return {dimension: date.fromordinal(code).strftime('%Y-%m-%d') if code > 0 else None}
+
+
+_cube = TimesheetCube()
+
+
+def get_cube():
+    """The process-wide cube, loaded on first use and kept up to date with the change log"""
+    _cube.ensure_fresh()
+    return _cube
+
+
+def catch_up(versions):
+    """Bring the process-wide cube up to the DataVersion `versions` (see TimesheetCube.catch_up)"""
+    _cube.catch_up(versions)
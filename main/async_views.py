@@ -0,0 +1,291 @@
+# main/async_views.py
+
+"""
+The read endpoints as async views, served under ASGI (uvicorn workers).
+A request waiting on SQL Server holds a coroutine rather than a worker
+process, so an instance serves as many concurrent users as the database
+can take instead of as many as it has workers.
+
+They are mounted at the endpoints' own paths (main.urls), with the
+authentication (main.authentication), ETags (main.utils) and response
+bodies of the sync views; a method other than GET / HEAD goes to the sync
+view given as the fallback, if any. Queries go through Django's async ORM.
+Each process lets at most settings.ASYNC_DB_CONCURRENCY requests use the
+database at once; the rest wait on a semaphore without holding a connection
+or a thread. Under WSGI Django runs them through async_to_sync.
+"""
+
+import asyncio
+import logging
+import weakref
+from datetime import datetime
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Exists, F, OuterRef
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import quote_etag
+from rest_framework import exceptions
+from rest_framework.request import Request
+
+from .authentication import ClaimsJWTAuthentication
+from .dashboard import weekly_hours
+from .fieldsets import JOB_FIELDS, CLIENT_FIELDS, CONTACT_FIELDS
+from .filters import JobFilter, ClientFilter, ContactFilter, MAX_PAGE_SIZE
+from .models import Job, JobAssignedStaff, Client, Task, Contact
+from .renderers import FastJSONRenderer
+from .summaries import week_start_of
+from .utils import data_etag
+from .views import submit_timesheet, submit_weekly_hours
+
+logger = logging.getLogger(__name__)
+
+# One semaphore per event loop (a process runs one; the test client starts one per request)
+_db_slots = weakref.WeakKeyDictionary()
+
+
+def db_slot():
+    loop = asyncio.get_running_loop()
+    slot = _db_slots.get(loop)
+    if slot is None:
+        slot = _db_slots[loop] = asyncio.Semaphore(getattr(settings, 'ASYNC_DB_CONCURRENCY', 8))
+    return slot
+
+
+def _json(data, status=200):
+    return HttpResponse(FastJSONRenderer().render(data), status=status, content_type='application/json')
+
+
+def _authenticate(request):
+    """The request's user via its JWT, with the profile loaded; raises NotAuthenticated without one"""
+    if request.user is None or not request.user.is_authenticated:
+        raise exceptions.NotAuthenticated()
+    # Views use the profile for scoping; load it here, in the sync thread
+    request.user.profile
+    return request.user
+
+
+def async_read(*model_names, dated=False, fallback=None):
+    """
+    Authentication, ETag / If-None-Match and error handling for an async GET
+    view, all inside a database slot. The view returns an HttpResponse.
+    `dated` is as for utils.conditional_on. Other methods go to the sync
+    `fallback` view, or get a 405.
+    """
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                if fallback is not None:
+                    return await sync_to_async(fallback)(request, *args, **kwargs)
+                return _json({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+            request = Request(request, authenticators=[ClaimsJWTAuthentication()])
+            async with db_slot():
+                try:
+                    await sync_to_async(_authenticate)(request)
+                except exceptions.APIException as e:
+                    detail = e.detail if isinstance(e.detail, dict) else {'detail': e.detail}
+                    response = _json(detail, status=e.status_code)
+                    response.headers['WWW-Authenticate'] = ClaimsJWTAuthentication().authenticate_header(request)
+                    return response
+
+                try:
+                    # As utils.conditional_on: only successful responses are tagged
+                    etag = quote_etag(await sync_to_async(data_etag)(request, model_names, dated))
+                    response = get_conditional_response(request, etag=etag)
+                    if response is None:
+                        response = await view(request, *args, **kwargs)
+                except Exception as e:
+                    logger.exception("Error in async %s: %s", view.__name__, e)
+                    return _json({'error': str(e)}, status=500)
+
+            if response.status_code == 304 or 200 <= response.status_code < 300:
+                response.headers.setdefault('ETag', etag)
+            # The body depends on who is asking
+            patch_vary_headers(response, ('Authorization',))
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapper
+    return decorator
+
+
+def _filtered(request, filterset_class, queryset):
+    """`queryset` narrowed and sorted by the request's filter parameters, or a 400 response"""
+    filterset = filterset_class(request.query_params, queryset=queryset, request=request)
+    if not filterset.is_valid():
+        return _json({'error': filterset.errors}, status=400)
+    return filterset.qs
+
+
+async def _list_response(request, rows, transform):
+    """
+    transform(row) for each of `rows`. With `limit` only one page is read,
+    limit + 1 rows to tell whether there is another, and returned as
+    {'results', 'offset', 'limit', 'next_offset'}.
+    """
+    limit = request.query_params.get('limit')
+    if limit is None:
+        return _json([transform(row) async for row in rows])
+    try:
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        offset = max(0, int(request.query_params.get('offset', 0)))
+    except ValueError:
+        return _json({'error': 'limit and offset must be integers'}, status=400)
+    page = [row async for row in rows[offset:offset + limit + 1]]
+    return _json({
+        'results': [transform(row) for row in page[:limit]],
+        'offset': offset,
+        'limit': limit,
+        'next_offset': offset + limit if len(page) > limit else None,
+    })
+
+
+@async_read('jobassignedstaff', 'job', 'client', 'task', 'timesheet')
+async def my_jobs(request, staff_uuid):
+    """Jobs assigned to a staff member, by due date. `fields` selects the keys returned (see JOB_FIELDS)."""
+    try:
+        columns, transform = JOB_FIELDS.select(request)
+    except ValueError as e:
+        return _json({'error': str(e)}, status=400)
+    jobs = Job.objects.filter(job_assigned_staff__staff_uuid=staff_uuid).order_by('due_date').values(*columns)
+    return _json([transform(job) async for job in jobs])
+
+
+@async_read('jobassignedstaff', 'job', 'client', 'task', 'timesheet')
+async def all_jobs(request):
+    """
+    Every job with at least one assigned staff member, by due date. Filters
+    (see JobFilter): `state` (comma separated), `client`, `manager`, `staff`,
+    `job_number` (prefix), `due_from` / `due_to` (YYYY-MM-DD), `completed`;
+    `ordering` by due_date, job_number or state; opt-in paging with
+    `limit` / `offset`; `fields` selects the keys returned (see JOB_FIELDS).
+    """
+    try:
+        columns, transform = JOB_FIELDS.select(request)
+    except ValueError as e:
+        return _json({'error': str(e)}, status=400)
+    jobs = _filtered(request, JobFilter, Job.objects.filter(
+        Exists(JobAssignedStaff.objects.filter(job=OuterRef('pk')))
+    ).order_by('due_date'))
+    if isinstance(jobs, HttpResponse):
+        return jobs
+    return await _list_response(request, jobs.values(*columns), transform)
+
+
+@async_read('job', 'task', 'timesheet')
+async def job_detail(request, job_id):
+    job = await Job.objects.filter(job_id=job_id).values('id', 'job_id', 'name').afirst()
+    if job is None:
+        return _json({'error': 'Job not found'}, status=404)
+
+    tasks = Task.objects.filter(job_id=job['id']).values(
+        'uuid', 'name', 'estimated_minutes', 'completed', logged_minutes=F('progress__actual_minutes')
+    )
+    task_list = []
+    async for task in tasks:
+        actual_minutes = task.pop('logged_minutes') or 0
+        task['actual_minutes'] = actual_minutes
+        task['remaining_minutes'] = task['estimated_minutes'] - actual_minutes if task['estimated_minutes'] else 0
+        task['status'] = 'Incomplete'
+        task_list.append(task)
+
+    return _json({'job_id': job['job_id'], 'job_name': job['name'], 'tasks': task_list})
+
+
+@async_read('job', 'task')
+async def job_tasks(request, job_id):
+    job = await Job.objects.filter(job_id=job_id).values_list('id', flat=True).afirst()
+    if job is None:
+        return _json({'error': f'Job {job_id} not found'}, status=404)
+    tasks = Task.objects.filter(job_id=job).values('id', 'uuid', 'name', 'estimated_minutes').order_by('name')
+    return _json([task async for task in tasks])
+
+
+@async_read('client')
+async def client_list(request):
+    """
+    Clients ordered by name. Filters (see ClientFilter): `status`
+    (active/archived), `type`, `account_manager`, `job_manager`, `prospect`;
+    `ordering=name|-name`; opt-in paging with `limit` / `offset`; `fields`
+    selects the keys returned (see CLIENT_FIELDS).
+    """
+    try:
+        columns, transform = CLIENT_FIELDS.select(request)
+    except ValueError as e:
+        return _json({'error': str(e)}, status=400)
+    clients = _filtered(request, ClientFilter, Client.objects.order_by('name'))
+    if isinstance(clients, HttpResponse):
+        return clients
+    return await _list_response(request, clients.values(*columns), transform)
+
+
+@async_read('client')
+async def client_detail(request, client_id):
+    try:
+        client = await Client.objects.aget(uuid=client_id)
+    except Client.DoesNotExist:
+        return _json({'error': 'Client not found'}, status=404)
+    return _json({
+        'uuid': client.uuid,
+        'id': client.id,
+        'name': client.name,
+        'phone': client.phone,
+        'email': client.email,
+        'website': client.website,
+        'address': client.address,
+        'city': client.city,
+        'region': client.region,
+        'country': client.country,
+        'post_code': client.post_code,
+        'account_manager': client.account_manager_name,
+        'job_manager': client.job_manager_name
+    })
+
+
+@async_read('contact', 'client')
+async def all_contacts(request):
+    """
+    Contacts ordered by name. Filters (see ContactFilter): `client`,
+    `primary`; `ordering=name|-name`; opt-in paging with `limit` / `offset`;
+    `fields` selects the keys returned (see CONTACT_FIELDS).
+    """
+    try:
+        columns, transform = CONTACT_FIELDS.select(request)
+    except ValueError as e:
+        return _json({'error': str(e)}, status=400)
+    contacts = _filtered(request, ContactFilter, Contact.objects.order_by('name'))
+    if isinstance(contacts, HttpResponse):
+        return contacts
+    return await _list_response(request, contacts.values(*columns), transform)
+
+
+@async_read('contact')
+async def client_contacts(request, client_id):
+    contacts = Contact.objects.filter(client_id=client_id).values('uuid', 'name', 'phone', 'email').order_by('name')
+    return _json([contact async for contact in contacts])
+
+
+async def _weekly_hours(request, staff_uuid, week_start=None):
+    """
+    The staff member's week (the current one by default), per day and per
+    job/task. `shape=compact` returns the dates once, hours as 7-element
+    arrays and notes only for the days that have any.
+    """
+    if week_start is None:
+        week_start = week_start_of(timezone.localdate())
+    else:
+        try:
+            week_start = datetime.strptime(week_start, '%Y-%m-%d').date()
+        except ValueError:
+            return _json({'error': 'Invalid date format. Use YYYY-MM-DD'}, status=400)
+    # One query and a pass over its rows; run it whole rather than row by row
+    week = await sync_to_async(weekly_hours)(staff_uuid, week_start, request.query_params.get('shape') == 'compact')
+    return _json(week)
+
+
+staff_weekly_hours = async_read('timesheet', 'task', fallback=submit_weekly_hours)(_weekly_hours)
+# The current week, so which week depends on the date; a POST submits
+current_weekly_hours = async_read('timesheet', 'task', dated=True, fallback=submit_timesheet)(_weekly_hours)
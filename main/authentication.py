@@ -0,0 +1,121 @@
+# main/authentication.py
+
+"""
+JWT authentication that reads the user and the profile in one query.
+
+Tokens carry the user's and profile's primary keys, staff_uuid and role as
+claims: added at login and re-read from the database on every token refresh.
+ClaimsJWTAuthentication authenticates by the user's primary key claim with a
+single values() query for the user's is_active flag and the profile's role
+and staff_uuid, and builds the User with its profile attached from that row,
+every other field deferred: the views that only look at profile.role /
+staff_uuid / is_admin / is_manager (most of them) make no further query for
+it, and anything else (e.g. djoser's /auth/users/me/) loads the field it
+needs on first access. A deactivated or deleted user is refused straight
+away, and a demotion or a staff reassignment applies to the next request
+rather than when the access token expires; refreshing a token for a
+deactivated user fails too. Tokens issued before the claims existed are
+authenticated the usual way.
+"""
+
+from django.contrib.auth.models import User
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, TokenError
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import UserProfile
+
+USER_PK_CLAIM = 'uid'
+PROFILE_PK_CLAIM = 'profile_id'
+STAFF_UUID_CLAIM = 'staff_uuid'
+ROLE_CLAIM = 'role'
+
+PROFILE_CLAIMS = (USER_PK_CLAIM, PROFILE_PK_CLAIM, STAFF_UUID_CLAIM, ROLE_CLAIM)
+
+
+def add_profile_claims(token, user):
+    """Set the profile claims on `token` from `user` (a no-op for users without a profile)"""
+    try:
+        profile = user.profile
+    except UserProfile.DoesNotExist:
+        return token
+    token[USER_PK_CLAIM] = user.pk
+    token[PROFILE_PK_CLAIM] = profile.pk
+    token[STAFF_UUID_CLAIM] = str(profile.staff_uuid) if profile.staff_uuid else None
+    token[ROLE_CLAIM] = profile.role
+    return token
+
+
+def _deferred(model, **loaded):
+    """A `model` instance as if read from the database with only the `loaded` fields selected"""
+    names = [field.attname for field in model._meta.concrete_fields if field.attname in loaded]
+    return model.from_db(DEFAULT_DB_ALIAS, names, [loaded[name] for name in names])
+
+
+def user_from_row(token, row):
+    """The token's User, with .profile, built from the row ClaimsJWTAuthentication reads"""
+    user = _deferred(
+        User, id=token[USER_PK_CLAIM], username=token[api_settings.USER_ID_CLAIM], is_active=row['is_active'],
+    )
+    profile = _deferred(
+        UserProfile,
+        id=row['profile__id'],
+        user_id=user.pk,
+        staff_uuid=row['profile__staff_uuid'],
+        role=row['profile__role'],
+    )
+    # Never saved back: the other fields were not read
+    profile.from_token = True
+    UserProfile.user.field.set_cached_value(profile, user)
+    User.profile.related.set_cached_value(user, profile)
+    return user
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        if not all(claim in validated_token for claim in PROFILE_CLAIMS):
+            return super().get_user(validated_token)
+        # The role and staff_uuid from the database, so a change applies before the token expires
+        try:
+            row = User.objects.values('is_active', 'profile__id', 'profile__role', 'profile__staff_uuid').get(
+                pk=validated_token[USER_PK_CLAIM]
+            )
+        except User.DoesNotExist:
+            # Refused as SimpleJWT's own lookup would
+            raise AuthenticationFailed("User not found", code='user_not_found')
+        if not row['is_active']:
+            raise AuthenticationFailed("User is inactive", code='user_inactive')
+        if row['profile__id'] is None:
+            # Profile deleted since the token was issued
+            return super().get_user(validated_token)
+        return user_from_row(validated_token, row)
+
+
+class ProfileTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        return add_profile_claims(super().get_token(user), user)
+
+
+class ProfileRefreshToken(RefreshToken):
+    @property
+    def access_token(self):
+        # Re-read the claims rather than copying the (possibly stale) ones from the refresh token
+        access = super().access_token
+        for claim in PROFILE_CLAIMS:
+            if claim in access:
+                del access[claim]
+        user = User.objects.select_related('profile').filter(
+            is_active=True, **{api_settings.USER_ID_FIELD: self[api_settings.USER_ID_CLAIM]}
+        ).first()
+        if user is None:
+            # Deactivated or deleted since the refresh token was issued
+            raise TokenError("User not found or inactive")
+        return add_profile_claims(access, user)
+
+
+class ProfileTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = ProfileRefreshToken
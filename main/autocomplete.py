@@ -0,0 +1,318 @@
+# main/autocomplete.py
+
+"""
+Per-keystroke autocomplete for the timesheet entry screen: an in-process
+prefix index over job numbers and names, client names and task names.
+
+Every word of every label is a key in a sorted list of (word, (kind, pk),
+entry) tuples, one list per kind, so the entries with a word starting with a
+prefix are one contiguous slice found by bisect. At most SCAN_LIMIT keys of
+each wanted kind are ranked: a lookup is two bisects per kind plus a bounded
+loop, with no database access. The slice is in alphabetical order, so an
+exact word comes before its longer completions, but past that a short prefix
+can leave good matches beyond the limit. Tasks restricted to one job are
+looked up in that job's own (short) key list instead, so the limit never
+hides them.
+
+Admins search the whole index. Everyone else only sees the jobs they are
+assigned to (managers also the jobs they manage) and those jobs' tasks and
+clients, from per-user key lists built on first use and dropped whenever the
+index changes; users not linked to a staff record see nothing.
+
+Like the schedule index, it loads lazily and then follows the change log
+(assignment changes are logged as job updates), patching only the changed
+entries in place.
+"""
+
+import heapq
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict, namedtuple
+
+from django.conf import settings
+
+from .changelog import ChangeCursor
+from .models import Job, JobAssignedStaff, Task, Client
+from .search import tokenize
+
+# label: the text shown; phrase: its normalised tokens, joined; words: the distinct tokens;
+# parent: client pk for jobs, job pk for tasks
+Entry = namedtuple('Entry', 'kind pk uuid label phrase words parent')
+
+JobInfo = namedtuple('JobInfo', 'uuid job_number name client_id manager_uuid')
+
+# What a user may search: {kind: sorted keys}, and the job pks they see (None: all of them)
+UserScope = namedtuple('UserScope', 'keys jobs')
+
+KINDS = ('job', 'client', 'task')
+
+# Ranking tie-break: jobs first, then clients, then tasks
+_KIND_ORDER = {kind: i for i, kind in enumerate(KINDS)}
+
+# Most keys looked at per kind per lookup, taken in alphabetical order from the start of the slice
+SCAN_LIMIT = 1000
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+
+# More pending changes (of any model) than this and a full reload is cheaper
+MAX_INCREMENTAL_CHANGES = 20000
+
+
+def _job_rows(jobs):
+    return jobs.values_list('pk', 'uuid', 'job_id', 'name', 'client_id', 'manager_uuid')
+
+
+class AutocompleteIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.loaded = False
+        self.last_checked = 0.0
+
+    # Building
+
+    def _add(self, key, uuid, *labels, parent=None):
+        """Index an object under one entry per non-empty label (a job has its number and its name)"""
+        entries = []
+        for label in labels:
+            if label:
+                words = tokenize(label)
+                entries.append(Entry(key[0], key[1], uuid, label, ' '.join(words), tuple(dict.fromkeys(words)), parent))
+        self.entries[key] = entries
+        self.pks[(key[0], uuid)] = key[1]
+        if self.loaded:
+            for i, entry in enumerate(entries):
+                for word in entry.words:
+                    insort(self.keys[key[0]], (word, key, i))
+
+    def _remove(self, key):
+        entries = self.entries.pop(key, ())
+        keys = self.keys[key[0]]
+        for i, entry in enumerate(entries):
+            for word in entry.words:
+                position = bisect_left(keys, (word, key, i))
+                if position < len(keys) and keys[position] == (word, key, i):
+                    del keys[position]
+        if entries:
+            self.pks.pop((key[0], entries[0].uuid), None)
+
+    def _drop_job(self, pk):
+        self._remove(('job', pk))
+        info = self.jobs.pop(pk, None)
+        if info is not None and info.manager_uuid is not None:
+            self.managed[info.manager_uuid].discard(pk)
+        for staff_uuid in self.job_staff.pop(pk, ()):
+            self.assigned[staff_uuid].discard(pk)
+
+    def _set_job(self, pk, uuid, job_id, name, client_id, manager_uuid):
+        self._add(('job', pk), uuid, job_id, name, parent=client_id)
+        self.jobs[pk] = JobInfo(uuid, job_id, name, client_id, manager_uuid)
+        if manager_uuid is not None:
+            self.managed[manager_uuid].add(pk)
+
+    def _assign(self, job_id, staff_uuid):
+        self.assigned[staff_uuid].add(job_id)
+        self.job_staff[job_id].add(staff_uuid)
+
+    def _drop_task(self, pk):
+        for entry in self.entries.get(('task', pk), ()):
+            self.job_tasks[entry.parent].discard(pk)
+        self._remove(('task', pk))
+
+    def _set_task(self, pk, uuid, name, job_id):
+        self._add(('task', pk), uuid, name, parent=job_id)
+        self.job_tasks[job_id].add(pk)
+
+    def load(self):
+        with self._lock:
+            # Keys are built in one sort at the end rather than insorted one by one
+            self.loaded = False
+            self.user_cache = {}
+            self.changes = ChangeCursor()
+            self.entries = {}
+            self.pks = {}
+            self.jobs = {}
+            self.job_tasks = defaultdict(set)
+            self.job_staff = defaultdict(set)
+            self.assigned = defaultdict(set)
+            self.managed = defaultdict(set)
+            for row in _job_rows(Job.objects.all()).iterator():
+                self._set_job(*row)
+            for row in Task.objects.exclude(uuid__isnull=True).values_list('pk', 'uuid', 'name', 'job_id').iterator():
+                self._set_task(*row)
+            for pk, uuid, name in Client.objects.values_list('pk', 'uuid', 'name').iterator():
+                self._add(('client', pk), uuid, name)
+            for job_id, staff_uuid in JobAssignedStaff.objects.values_list('job_id', 'staff_uuid').iterator():
+                self._assign(job_id, staff_uuid)
+            self.keys = {kind: self._sorted_keys(key for key in self.entries if key[0] == kind) for kind in KINDS}
+            self.loaded = True
+            self.last_checked = time.monotonic()
+
+    def refresh(self):
+        """Patch the entries of the jobs, tasks and clients changed since the last load/refresh"""
+        with self._lock:
+            changes = self.changes.read(MAX_INCREMENTAL_CHANGES)
+            if changes is None:
+                self.load()
+                return
+            changed_uuids = defaultdict(set)
+            for _, model_name, object_uuid, *_ in changes:
+                if model_name in KINDS:
+                    changed_uuids[model_name].add(object_uuid)
+            if changed_uuids:
+                self.user_cache = {}
+                # Drop everything changed, then re-add what still exists
+                for kind, uuids in changed_uuids.items():
+                    for uuid in uuids:
+                        pk = self.pks.get((kind, uuid))
+                        if pk is None:
+                            continue
+                        if kind == 'job':
+                            self._drop_job(pk)
+                        elif kind == 'task':
+                            self._drop_task(pk)
+                        else:
+                            self._remove(('client', pk))
+
+                if changed_uuids['job']:
+                    jobs = Job.objects.filter(uuid__in=changed_uuids['job'])
+                    for row in _job_rows(jobs):
+                        self._drop_job(row[0])
+                        self._set_job(*row)
+                    for job_id, staff_uuid in JobAssignedStaff.objects.filter(
+                        job__in=jobs.values('pk')
+                    ).values_list('job_id', 'staff_uuid'):
+                        self._assign(job_id, staff_uuid)
+                if changed_uuids['task']:
+                    for row in Task.objects.filter(uuid__in=changed_uuids['task']).values_list(
+                        'pk', 'uuid', 'name', 'job_id'
+                    ):
+                        self._drop_task(row[0])
+                        self._set_task(*row)
+                if changed_uuids['client']:
+                    for pk, uuid, name in Client.objects.filter(uuid__in=changed_uuids['client']).values_list(
+                        'pk', 'uuid', 'name'
+                    ):
+                        self._remove(('client', pk))
+                        self._add(('client', pk), uuid, name)
+            self.last_checked = time.monotonic()
+
+    def ensure_fresh(self):
+        interval = getattr(settings, 'ANALYTICS_REFRESH_INTERVAL', 2.0)
+        with self._lock:
+            if not self.loaded:
+                self.load()
+            elif time.monotonic() - self.last_checked >= interval:
+                self.refresh()
+
+    # Lookups
+
+    def _sorted_keys(self, keys):
+        return sorted(
+            (word, key, i)
+            for key in keys
+            for i, entry in enumerate(self.entries.get(key, ()))
+            for word in entry.words
+        )
+
+    def user_scope(self, profile):
+        """
+        The keys a user may search: all of them for admins; otherwise those of
+        their jobs and those jobs' tasks and clients, cached until the index
+        next changes.
+        """
+        if profile.is_admin:
+            return UserScope(self.keys, None)
+        if profile.staff_uuid is None:
+            # Not linked to a staff record: assignments with no staff_uuid aren't theirs
+            return UserScope({}, frozenset())
+        cache_key = (profile.staff_uuid, profile.is_manager)
+        scope = self.user_cache.get(cache_key)
+        if scope is None:
+            jobs = set(self.assigned.get(profile.staff_uuid, ()))
+            if profile.is_manager:
+                jobs |= self.managed.get(profile.staff_uuid, set())
+            visible = set()
+            for job in jobs:
+                visible.add(('job', job))
+                visible.update(('task', task) for task in self.job_tasks.get(job, ()))
+                info = self.jobs.get(job)
+                if info is not None and info.client_id is not None:
+                    visible.add(('client', info.client_id))
+            scope = UserScope(
+                {kind: self._sorted_keys(key for key in visible if key[0] == kind) for kind in KINDS},
+                frozenset(jobs),
+            )
+            self.user_cache[cache_key] = scope
+        return scope
+
+    def lookup(self, query, profile, kinds=KINDS, job=None, limit=DEFAULT_LIMIT):
+        """
+        The best `limit` entries whose words start with the query's words.
+        Ranked by: whole label equal to the query, label starting with it,
+        any word starting with it; then jobs, clients, tasks; then shorter
+        labels. `job` (a Job pk) restricts tasks to that job's.
+        """
+        words = tokenize(query)
+        if not words:
+            return []
+        phrase = ' '.join(words)
+        # Seek on the longest word (the most selective slice); the others are checked per entry
+        seek = max(words, key=len)
+        others = [word for word in words if word != seek]
+        with self._lock:
+            scope = self.user_scope(profile)
+            ranked = {}
+            for kind in kinds:
+                if kind == 'task' and job is not None:
+                    if scope.jobs is not None and job not in scope.jobs:
+                        continue
+                    keys = self._sorted_keys(('task', task) for task in self.job_tasks.get(job, ()))
+                else:
+                    keys = scope.keys.get(kind, ())
+                lo = bisect_left(keys, (seek,))
+                hi = min(bisect_right(keys, (seek + '\U0010ffff',)), lo + SCAN_LIMIT)
+
+                for _, key, i in keys[lo:hi]:
+                    entry = self.entries[key][i]
+                    if others and not all(any(w.startswith(q) for w in entry.words) for q in others):
+                        continue
+                    match = 0 if entry.phrase == phrase else 1 if entry.phrase.startswith(phrase) else 2
+                    rank = (match, _KIND_ORDER[entry.kind], len(entry.label), entry.label, entry.pk)
+                    best = ranked.get(key)
+                    if best is None or rank < best[0]:
+                        ranked[key] = (rank, entry)
+            return [entry for _, entry in heapq.nsmallest(limit, ranked.values())]
+
+    def describe(self, entry):
+        """JSON for a lookup result, with the job / client it belongs to"""
+        if entry.kind == 'client':
+            return {'type': 'client', 'uuid': entry.uuid, 'name': entry.label}
+        if entry.kind == 'job':
+            job = self.jobs[entry.pk]
+            client = self.entries.get(('client', job.client_id))
+            return {
+                'type': 'job',
+                'uuid': entry.uuid,
+                'job_number': job.job_number,
+                'name': job.name,
+                'client_name': client[0].label if client else None,
+            }
+        job = self.jobs.get(entry.parent)
+        return {
+            'type': 'task',
+            'uuid': entry.uuid,
+            'name': entry.label,
+            'job_uuid': job.uuid if job else None,
+            'job_number': job.job_number if job else None,
+        }
+
+
+_index = AutocompleteIndex()
+
+
+def get_autocomplete():
+    """The process-wide autocomplete index, loaded on first use and kept up to date with the change log"""
+    _index.ensure_fresh()
+    return _index
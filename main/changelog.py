@@ -0,0 +1,79 @@
+# main/changelog.py
+
+"""
+Reading the ChangeLog without skipping changes.
+
+ChangeLog.seq is allocated when a row is inserted but the row only becomes
+visible when its transaction commits, so with concurrent writers a lower
+seq can appear after a higher one has been read: a reader that simply
+remembers the highest seq it has seen would never see that change. Readers
+therefore only move their cursor past rows older than
+settings.CHANGE_LOG_SETTLE_SECONDS, by which time every seq allocated before
+them has committed (or rolled back), provided no write transaction runs
+longer than that. Rows above the cursor are read again on the next call.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import ChangeLog
+
+COLUMNS = ('seq', 'model_name', 'object_uuid', 'action', 'staff_uuid', 'changed_at')
+
+
+def settle_cutoff():
+    """Rows logged at or before this have no uncommitted lower seqs"""
+    return timezone.now() - timedelta(seconds=settings.CHANGE_LOG_SETTLE_SECONDS)
+
+
+def settled_head():
+    """The highest seq a reader can move its cursor to now"""
+    return ChangeLog.objects.filter(changed_at__lte=settle_cutoff()).order_by('-seq').values_list(
+        'seq', flat=True
+    ).first() or 0
+
+
+def settled_seq(rows, since):
+    """The cursor after reading `rows` (COLUMNS tuples, in seq order) from `since`"""
+    cutoff = settle_cutoff()
+    return max([since] + [row[0] for row in rows if row[-1] <= cutoff])
+
+
+class ChangeCursor:
+    """
+    An in-process reader's position (see main.analytics, main.schedule,
+    main.autocomplete). `seq` is settled; `seen` holds the rows above it
+    already returned (seq -> changed_at), so each change is returned once.
+    Create it before loading: the changes logged by then are taken as loaded.
+    """
+
+    def __init__(self):
+        self.seq = settled_head()
+        self.seen = dict(ChangeLog.objects.filter(seq__gt=self.seq).values_list('seq', 'changed_at'))
+
+    def read(self, limit):
+        """
+        The changes not returned before, as COLUMNS tuples in seq order, or
+        None (with nothing consumed) if there are more than `limit`
+        """
+        top = max(self.seen, default=self.seq)
+        rows = list(ChangeLog.objects.filter(seq__gt=top).order_by('seq').values_list(*COLUMNS)[:limit + 1])
+        if self.seen:
+            window = ChangeLog.objects.filter(seq__gt=self.seq, seq__lte=top)
+            if window.count() > len(self.seen):
+                # Rows that committed after higher ones were read
+                late = [row for row in window.order_by('seq').values_list(*COLUMNS) if row[0] not in self.seen]
+                rows = late + rows
+        if len(rows) > limit:
+            return None
+
+        for row in rows:
+            self.seen[row[0]] = row[-1]
+        cutoff = settle_cutoff()
+        settled = [seq for seq, changed_at in self.seen.items() if changed_at <= cutoff]
+        if settled:
+            self.seq = max(settled)
+            self.seen = {seq: changed_at for seq, changed_at in self.seen.items() if seq > self.seq}
+        return rows
@@ -0,0 +1,21 @@
+# main/converters.py
+
+import uuid
+
+
+class FlexibleUUIDConverter:
+    """
+    Path converter for UUIDs with or without hyphens, in any case (Django's
+    built-in `uuid` converter only accepts the lower-case hyphenated form).
+    Views receive a uuid.UUID, so they never have to reformat strings.
+    """
+    regex = (
+        '[0-9a-fA-F]{8}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?'
+        '[0-9a-fA-F]{4}-?[0-9a-fA-F]{12}'
+    )
+
+    def to_python(self, value):
+        return uuid.UUID(value)
+
+    def to_url(self, value):
+        return str(value)
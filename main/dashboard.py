@@ -0,0 +1,252 @@
+# main/dashboard.py
+
+"""
+What the app loads after login, built outside a request so the single
+resource views and the batched bootstrap endpoint share the same code.
+
+bootstrap() assembles any of the SECTIONS in one go. The data versions for
+all of them are read with a single query and each section gets its own ETag,
+so a client keeps caching sections independently: the ones whose ETag it
+sends back are answered as not modified without being built, and the rest
+are built in turn on the request's own database connection (a few indexed
+queries each, cheaper than a new SQL Server login per section).
+"""
+
+import hashlib
+import logging
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+from .fieldsets import JOB_FIELDS, CLIENT_FIELDS, CONTACT_FIELDS
+from .models import Job, Client, Contact, Task, Timesheet, DataVersion
+from .renderers import FastJSONRenderer
+from .serializers import UserSerializer
+from .summaries import day_bounds, week_start_of
+from .utils import scoped_etag
+
+logger = logging.getLogger(__name__)
+
+# Days of timesheet history that make a job "recent" for the recent_tasks section
+RECENT_DAYS = 14
+
+
+def weekly_hours(staff_uuid, week_start, compact=False):
+    """
+    A staff member's week (from `week_start`), per day and per job/task.
+    `compact` lists the dates once, returns hours as 7-element arrays and
+    notes only for the days that have any.
+    """
+    week_end = week_start + timedelta(days=6)
+
+    # Make the datetime range timezone aware
+    week_start_dt = timezone.make_aware(datetime.combine(week_start, datetime.min.time()))
+    week_end_dt = timezone.make_aware(datetime.combine(week_end, datetime.max.time()))
+
+    # Get all timesheet entries for the week, joined to their task for the billable status
+    timesheet_entries = Timesheet.objects.filter(
+        staff_uuid=staff_uuid,
+        entry_date__range=[week_start_dt, week_end_dt]
+    ).values_list(
+        'entry_date', 'minutes', 'task__billable', 'job_number', 'job_name', 'task_uuid', 'task_name', 'note'
+    )
+
+    # Group by task and day
+    tasks = {}
+    daily_hours = [{'billable': 0, 'non_billable': 0} for _ in range(7)]
+
+    for entry_date, minutes, is_billable, job_number, job_name, task_uuid, task_name, note in timesheet_entries:
+        day_index = (entry_date.date() - week_start).days
+        hours = minutes / 60
+
+        # Add to daily totals based on billable status
+        if is_billable:
+            daily_hours[day_index]['billable'] += hours
+        else:
+            daily_hours[day_index]['non_billable'] += hours
+
+        # Create unique key for job+task combination
+        task_key = f"{job_number}_{task_uuid}"
+
+        if task_key not in tasks:
+            tasks[task_key] = {
+                'job_id': job_number,
+                'job_name': job_name,
+                'task_uuid': task_uuid,
+                'task_name': task_name,
+                'hours': [0] * 7,
+                'notes': [[] for _ in range(7)],
+            }
+
+        tasks[task_key]['hours'][day_index] += hours
+        if note:
+            tasks[task_key]['notes'][day_index].append(note)
+
+    dates = [(week_start + timedelta(days=i)).strftime('%Y-%m-%d') for i in range(7)]
+
+    if compact:
+        # Columnar: dates once, hours as 7-element arrays, notes only where there are any
+        for task in tasks.values():
+            notes = {i: day_notes for i, day_notes in enumerate(task.pop('notes')) if day_notes}
+            if notes:
+                task['notes'] = notes
+        return {
+            'week_start': dates[0],
+            'week_end': dates[-1],
+            'dates': dates,
+            'billable': [day['billable'] for day in daily_hours],
+            'non_billable': [day['non_billable'] for day in daily_hours],
+            'tasks': list(tasks.values()),
+        }
+
+    task_hours = {
+        task_key: {
+            'job_id': task['job_id'],
+            'job_name': task['job_name'],
+            'task_uuid': task['task_uuid'],
+            'task_name': task['task_name'],
+            'daily_hours': [{'date': dates[i],
+                           'hours': task['hours'][i],
+                           'notes': task['notes'][i]} for i in range(7)]
+        }
+        for task_key, task in tasks.items()
+    }
+
+    # Format daily summary
+    week_data = []
+    for i in range(7):
+        current_date = week_start + timedelta(days=i)
+        week_data.append({
+            'date': current_date.strftime('%Y-%m-%d'),
+            'day': current_date.strftime('%a'),
+            'billable': daily_hours[i]['billable'],
+            'non_billable': daily_hours[i]['non_billable'],
+            'total': daily_hours[i]['billable'] + daily_hours[i]['non_billable']
+        })
+
+    return {
+        'week_start': week_start.strftime('%Y-%m-%d'),
+        'week_end': week_end.strftime('%Y-%m-%d'),
+        'daily_hours': week_data,
+        'task_hours': task_hours
+    }
+
+
+def _jobs(user, staff_uuid, options):
+    # As my_jobs, every field
+    columns, transform = JOB_FIELDS.select_all()
+    jobs = Job.objects.filter(job_assigned_staff__staff_uuid=staff_uuid).order_by('due_date').values(*columns)
+    return [transform(job) for job in jobs]
+
+
+def _week(user, staff_uuid, options):
+    # As staff_weekly_hours
+    return weekly_hours(staff_uuid, options['week_start'], options['compact'])
+
+
+def _clients(user, staff_uuid, options):
+    # As client_list, unfiltered
+    columns, transform = CLIENT_FIELDS.select_all()
+    return [transform(client) for client in Client.objects.order_by('name').values(*columns)]
+
+
+def _contacts(user, staff_uuid, options):
+    # As all_contacts, unfiltered
+    columns, transform = CONTACT_FIELDS.select_all()
+    return [transform(contact) for contact in Contact.objects.order_by('name').values(*columns)]
+
+
+def _recent_tasks(user, staff_uuid, options):
+    """job_tasks for every job the user has logged time on in the last RECENT_DAYS days, by job number"""
+    # Whole days, so the result only changes with the data and the date (the section's ETag)
+    since = day_bounds(options['today'] - timedelta(days=RECENT_DAYS))[0]
+    recent_jobs = Timesheet.objects.filter(staff_uuid=staff_uuid, entry_date__gte=since).values('job')
+    tasks = Task.objects.filter(job__in=recent_jobs).order_by('job__job_id', 'name').values_list(
+        'job__job_id', 'id', 'uuid', 'name', 'estimated_minutes'
+    )
+    by_job = {}
+    for job_number, pk, task_uuid, name, estimated_minutes in tasks:
+        by_job.setdefault(job_number, []).append(
+            {'id': pk, 'uuid': task_uuid, 'name': name, 'estimated_minutes': estimated_minutes}
+        )
+    return by_job
+
+
+def _user(user, staff_uuid, options):
+    # As djoser's /auth/users/me/. request.user only has what the token carries, so load the rest at once
+    return UserSerializer(User.objects.get(pk=user.pk)).data
+
+
+# models: the data versions a section is built from, or None to tag it by content
+# options: the bootstrap options its content depends on
+# staff_only: empty (None) for users without a linked staff record
+Section = namedtuple('Section', 'build models options staff_only')
+
+SECTIONS = {
+    'user': Section(_user, None, (), False),
+    'jobs': Section(_jobs, ('jobassignedstaff', 'job', 'client', 'task', 'timesheet'), (), True),
+    'week': Section(_week, ('timesheet', 'task'), ('week_start', 'compact'), True),
+    'clients': Section(_clients, ('client',), (), False),
+    'contacts': Section(_contacts, ('contact', 'client'), (), False),
+    'recent_tasks': Section(_recent_tasks, ('timesheet', 'job', 'task'), ('today',), True),
+}
+
+
+def _build(name, user, staff_uuid, options):
+    section = SECTIONS[name]
+    if section.staff_only and staff_uuid is None:
+        return None
+    return section.build(user, staff_uuid, options)
+
+
+def _outcome(name, user, staff_uuid, options):
+    """(data, None), or (None, exception) if the section failed to build"""
+    try:
+        return _build(name, user, staff_uuid, options), None
+    except Exception as e:
+        logger.exception("Error building bootstrap section %s: %s", name, e)
+        return None, e
+
+
+def bootstrap(user, names, known_etags=(), week_start=None, compact=False):
+    """
+    {section: {'etag', 'data'}} for the sections in `names`, with
+    {'etag', 'not_modified': True} instead for those whose current ETag is in
+    `known_etags` (quoted, as sent in If-None-Match). A section that fails to
+    build comes back as {'etag', 'error'} without failing the others.
+    """
+    staff_uuid = user.profile.staff_uuid
+    today = timezone.localdate()
+    options = {'week_start': week_start or week_start_of(today), 'compact': compact, 'today': today}
+    known_etags = set(known_etags)
+    versions = DataVersion.current({model for name in names for model in SECTIONS[name].models or ()})
+
+    result, content_tagged, pending = {}, {}, []
+    for name in names:
+        section = SECTIONS[name]
+        scope = ':'.join(['bootstrap', name, str(staff_uuid), *(str(options[key]) for key in section.options)])
+        if section.models is None:
+            # Cheap and unversioned: build it and tag the content
+            content_tagged[name] = _build(name, user, staff_uuid, options)
+            etag = hashlib.sha1(scope.encode() + FastJSONRenderer().render(content_tagged[name])).hexdigest()
+        else:
+            etag = scoped_etag(user, scope, {model: versions[model] for model in section.models})
+        result[name] = {'etag': f'"{etag}"'}
+        if section.models is not None and result[name]['etag'] not in known_etags:
+            pending.append(name)
+
+    outcomes = {name: _outcome(name, user, staff_uuid, options) for name in pending}
+    outcomes.update((name, (data, None)) for name, data in content_tagged.items())
+
+    for name, entry in result.items():
+        if entry['etag'] in known_etags:
+            entry['not_modified'] = True
+            continue
+        data, error = outcomes[name]
+        if error is not None:
+            entry['error'] = str(error)
+        else:
+            entry['data'] = data
+    return result
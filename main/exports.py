@@ -0,0 +1,114 @@
+# main/exports.py
+
+"""
+Streaming timesheet exports. Rows are read with a chunked .iterator() and
+encoded a batch at a time, so memory stays flat however many rows are
+exported. Under ASGI the same streams come from async generators over
+.aiterator(): Django reads a sync iterator into memory before sending it
+from an async handler.
+"""
+
+import csv
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F
+
+
+EXPORT_COLUMNS = (
+    'uuid', 'entry_date', 'staff_uuid', 'staff_name', 'payroll_code', 'job_number', 'job_name',
+    'task_uuid', 'task_name', 'minutes', 'billable', 'note',
+)
+
+# Rows fetched per database round trip / encoded per yielded chunk
+FETCH_CHUNK_SIZE = 2000
+ROWS_PER_CHUNK = 500
+
+
+def export_rows(timesheets):
+    """Export columns for `timesheets`, joined to the staff payroll code, oldest first"""
+    return timesheets.order_by('entry_date', 'uuid').values_list(
+        'uuid', 'entry_date', 'staff_uuid', 'staff_name', F('staff__payroll_code'), 'job_number', 'job_name',
+        'task_uuid', 'task_name', 'minutes', 'billable', 'note',
+    ).iterator(chunk_size=FETCH_CHUNK_SIZE)
+
+
+async def aexport_rows(timesheets):
+    """
+    export_rows() for async code. Read through .values(): in Django 5.0,
+    values_list().aiterator() runs its query on the event loop, which the
+    ORM refuses.
+    """
+    rows = timesheets.order_by('entry_date', 'uuid').values(
+        *(column for column in EXPORT_COLUMNS if column != 'payroll_code'),
+        payroll_code=F('staff__payroll_code'),
+    ).aiterator(chunk_size=FETCH_CHUNK_SIZE)
+    async for row in rows:
+        yield tuple(row[column] for column in EXPORT_COLUMNS)
+
+
+class _LineBuffer:
+    """File-like object for csv.writer that hands back what was written"""
+
+    def write(self, value):
+        return value
+
+
+def _batched(lines):
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= ROWS_PER_CHUNK:
+            yield ''.join(batch)
+            batch = []
+    if batch:
+        yield ''.join(batch)
+
+
+async def _abatched(lines):
+    batch = []
+    async for line in lines:
+        batch.append(line)
+        if len(batch) >= ROWS_PER_CHUNK:
+            yield ''.join(batch)
+            batch = []
+    if batch:
+        yield ''.join(batch)
+
+
+def _csv_line(writer, row):
+    return writer.writerow([value.isoformat() if hasattr(value, 'isoformat') else value for value in row])
+
+
+def _ndjson_line(encoder, row):
+    return encoder.encode(dict(zip(EXPORT_COLUMNS, row))) + '\n'
+
+
+def stream_csv(timesheets):
+    writer = csv.writer(_LineBuffer())
+    yield writer.writerow(EXPORT_COLUMNS)
+    yield from _batched(_csv_line(writer, row) for row in export_rows(timesheets))
+
+
+def stream_ndjson(timesheets):
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    yield from _batched(_ndjson_line(encoder, row) for row in export_rows(timesheets))
+
+
+async def astream_csv(timesheets):
+    writer = csv.writer(_LineBuffer())
+    yield writer.writerow(EXPORT_COLUMNS)
+    async for chunk in _abatched(_csv_line(writer, row) async for row in aexport_rows(timesheets)):
+        yield chunk
+
+
+async def astream_ndjson(timesheets):
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    async for chunk in _abatched(_ndjson_line(encoder, row) async for row in aexport_rows(timesheets)):
+        yield chunk
+
+
+# format -> (stream, async stream, content type)
+EXPORT_FORMATS = {
+    'csv': (stream_csv, astream_csv, 'text/csv'),
+    'ndjson': (stream_ndjson, astream_ndjson, 'application/x-ndjson'),
+}
@@ -0,0 +1,31 @@
+# main/fields.py
+
+import uuid
+
+from django.db import models
+
+
+class NativeUUIDField(models.UUIDField):
+    """
+    UUIDField stored as a 16-byte uniqueidentifier on SQL Server, where the mssql
+    backends otherwise fall back to char(32). Other backends keep Django's own
+    UUID handling (native uuid on PostgreSQL, char(32) elsewhere).
+    """
+
+    def db_type(self, connection):
+        if connection.vendor == 'microsoft':
+            return 'uniqueidentifier'
+        return super().db_type(connection)
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        if connection.vendor == 'microsoft':
+            if not prepared:
+                value = self.get_prep_value(value)
+            return str(value) if value is not None else None
+        return super().get_db_prep_value(value, connection, prepared)
+
+    def from_db_value(self, value, expression, connection):
+        # pyodbc hands uniqueidentifier back as an upper-case string
+        if value is None or isinstance(value, uuid.UUID):
+            return value
+        return uuid.UUID(str(value))
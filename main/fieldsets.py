@@ -0,0 +1,88 @@
+# main/fieldsets.py
+
+"""
+Sparse fieldsets for the list endpoints: `?fields=name,due_date` returns
+only those keys, and only the columns they are built from are selected.
+
+Each list declares its output fields once, as either a source column (copied
+as is) or (source columns, function of the .values() row).
+"""
+
+from operator import itemgetter
+
+
+class Fieldset:
+    def __init__(self, **fields):
+        self.fields = {}
+        for name, spec in fields.items():
+            if isinstance(spec, str):
+                spec = ((spec,), itemgetter(spec))
+            self.fields[name] = spec
+
+    def select(self, request):
+        """
+        (columns to pass to .values(), row -> response dict) for the request's
+        `fields` parameter (default: every field). ValueError on unknown names.
+        """
+        raw = request.query_params.get('fields', '')
+        names = list(dict.fromkeys(name.strip() for name in raw.split(',') if name.strip())) or list(self.fields)
+        unknown = [name for name in names if name not in self.fields]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(self.fields)}")
+        return self._selection(names)
+
+    def select_all(self):
+        return self._selection(list(self.fields))
+
+    def _selection(self, names):
+        columns = list(dict.fromkeys(column for name in names for column in self.fields[name][0]))
+        getters = [(name, self.fields[name][1]) for name in names]
+        return columns, lambda row: {name: getter(row) for name, getter in getters}
+
+
+# all_jobs / my_jobs
+JOB_FIELDS = Fieldset(
+    id='id',
+    job_number=(('job_id',), itemgetter('job_id')),
+    name='name',
+    client_name=(('client__name',), lambda row: row['client__name'] or 'Unknown Client'),
+    status=(('state',), itemgetter('state')),
+    due_date='due_date',
+    # Burn-down columns from the JobProgress rollup
+    budget='budget',
+    estimated_minutes=(('progress__estimated_minutes',), lambda row: row['progress__estimated_minutes'] or 0),
+    actual_minutes=(('progress__actual_minutes',), lambda row: row['progress__actual_minutes'] or 0),
+    billable_minutes=(('progress__billable_minutes',), lambda row: row['progress__billable_minutes'] or 0),
+    last_entry_date=(('progress__last_entry_date',), itemgetter('progress__last_entry_date')),
+)
+
+_ADDRESS_COLUMNS = ('address', 'city', 'region', 'post_code', 'country')
+
+CLIENT_FIELDS = Fieldset(
+    uuid='uuid',
+    name='name',
+    status=(('is_archived',), lambda row: 'Archived' if row['is_archived'] else 'Active'),
+    phone='phone',
+    # The default address, formatted on one line
+    address=(_ADDRESS_COLUMNS, lambda row: ', '.join(filter(None, (row[column] for column in _ADDRESS_COLUMNS)))),
+    email='email',
+    website='website',
+    type=(('type_name',), itemgetter('type_name')),
+    account_manager=(('account_manager_name',), itemgetter('account_manager_name')),
+    job_manager=(('job_manager_name',), itemgetter('job_manager_name')),
+)
+
+CONTACT_FIELDS = Fieldset(
+    uuid='uuid',
+    name='name',
+    client=(('client__name',), itemgetter('client__name')),
+    phone='phone',
+    email='email',
+)
+
+TIMESHEET_FIELDS = Fieldset(**{
+    column: column for column in (
+        'uuid', 'entry_date', 'staff_uuid', 'staff_name', 'job_number', 'job_name',
+        'task_uuid', 'task_name', 'minutes', 'billable', 'note',
+    )
+})
@@ -0,0 +1,65 @@
+# main/linking.py
+
+"""
+Set-based repair of the foreign keys that the syncs cannot fill in at write time,
+because the referenced row is synced by a different script (e.g. a timesheet whose
+job has not been synced yet). Each sync calls link_foreign_keys() when it finishes.
+"""
+
+from django.db.models import Exists, OuterRef, Q, Subquery
+
+from . import rollups
+from .models import Staff, Client, Job, Task, JobAssignedStaff, Timesheet, DataVersion
+
+# Keys per rollup rebuild, well below SQL Server's 2100 parameter limit
+REBUILD_CHUNK_SIZE = 1000
+
+
+def staff_pk_map():
+    """Return {UUID: Staff pk}"""
+    return dict(Staff.objects.values_list('uuid', 'pk'))
+
+
+def _link(queryset, field, target):
+    """
+    Point `field` at the matching `target` row, for the rows that have one.
+    Orphans are left out of the UPDATE, so they are not rewritten (or counted)
+    on every sync while their target is still missing.
+    """
+    return queryset.filter(Exists(target)).update(**{field: Subquery(target.values('pk')[:1])})
+
+
+def link_foreign_keys():
+    """Fill in null FKs from the inline UUID / job number columns"""
+    # Newly linked timesheets bypass the rollup signals, so note which tasks/jobs they hit
+    unlinked = Timesheet.objects.filter(
+        Q(task__isnull=True, task_uuid__isnull=False) | Q(job__isnull=True, job_number__isnull=False)
+    )
+    task_keys = list(Task.objects.filter(uuid__in=unlinked.values('task_uuid')).values_list('pk', flat=True))
+    job_keys = list(Job.objects.filter(job_id__in=unlinked.values('job_number')).values_list('pk', flat=True))
+
+    jobs_linked = _link(Job.objects.filter(client__isnull=True, client_uuid__isnull=False),
+                       'client', Client.objects.filter(uuid=OuterRef('client_uuid')))
+    timesheets_linked = _link(Timesheet.objects.filter(job__isnull=True, job_number__isnull=False),
+                             'job', Job.objects.filter(job_id=OuterRef('job_number')))
+    timesheets_linked += _link(Timesheet.objects.filter(task__isnull=True, task_uuid__isnull=False),
+                              'task', Task.objects.filter(uuid=OuterRef('task_uuid')))
+    timesheets_linked += _link(Timesheet.objects.filter(staff__isnull=True, staff_uuid__isnull=False),
+                              'staff', Staff.objects.filter(uuid=OuterRef('staff_uuid')))
+    assignments_linked = _link(JobAssignedStaff.objects.filter(staff__isnull=True),
+                              'staff', Staff.objects.filter(uuid=OuterRef('staff_uuid')))
+
+    for start in range(0, len(task_keys), REBUILD_CHUNK_SIZE):
+        rollups.rebuild_progress(task_keys=task_keys[start:start + REBUILD_CHUNK_SIZE], job_keys=[])
+    for start in range(0, len(job_keys), REBUILD_CHUNK_SIZE):
+        rollups.rebuild_progress(task_keys=[], job_keys=job_keys[start:start + REBUILD_CHUNK_SIZE])
+
+    # queryset.update() bypasses the signals, so invalidate ETags by hand
+    if jobs_linked:
+        DataVersion.bump('job')
+    if timesheets_linked:
+        DataVersion.bump('timesheet')
+    if assignments_linked:
+        DataVersion.bump('jobassignedstaff')
+
+    return jobs_linked + timesheets_linked + assignments_linked
@@ -0,0 +1,247 @@
+# main/loadtest.py
+
+"""
+HTTP load test against a running server (see `manage.py load_test`).
+
+Each virtual user logs in through djoser's JWT endpoint as one of the
+accounts `manage.py generate_synthetic_data` creates, looks up its jobs and
+a task to log time against, then sends requests back to back, picking each
+from a weighted mix of the endpoints the app calls on a working day:
+my jobs, job detail, the weekly timesheet (GET and POST) and the lists.
+`concurrency` virtual users run at once for `duration` seconds, after
+`warmup` seconds whose requests aren't counted.
+
+The result is plain JSON (see run()), so runs can be saved and compared
+with compare(). With the server's QUERY_METRICS on, its Server-Timing
+header adds the database time and query count per endpoint.
+"""
+
+import base64
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import requests
+from django.utils import timezone
+
+from .metrics import percentile
+from .summaries import week_start_of
+
+# url name -> relative weight
+DEFAULT_MIX = {
+    'my-jobs': 25,
+    'job-detail': 20,
+    'staff-weekly-hours-date': 25,
+    'staff-weekly-hours-date (POST)': 5,
+    'all_jobs': 5,
+    'client-list': 5,
+    'all-contacts': 5,
+    'timesheet-list': 5,
+    'bootstrap': 5,
+}
+
+# Weeks back from the current one that the weekly timesheet is read for
+WEEKS_BACK = 4
+
+# Compared by compare(): lower is better for all but throughput
+COMPARED = ('p50_ms', 'p95_ms', 'p99_ms', 'throughput_rps', 'error_rate')
+
+_SERVER_TIMING_DB = re.compile(r'db;dur=([\d.]+);desc="(\d+) queries"')
+
+
+class LoadTestError(Exception):
+    pass
+
+
+def _claims(token):
+    payload = token.split('.')[1]
+    return json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))
+
+
+class VirtualUser:
+    """One logged-in account, with the jobs and task its requests refer to"""
+
+    def __init__(self, base_url, username, password, timeout):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.etags = {}
+
+        response = self.session.post(
+            f'{self.base_url}/auth/jwt/create/', json={'username': username, 'password': password}, timeout=timeout
+        )
+        if response.status_code != 200:
+            raise LoadTestError(f"Login as {username} failed: HTTP {response.status_code} {response.text[:200]}")
+        access = response.json()['access']
+        self.staff_uuid = _claims(access).get('staff_uuid')
+        if not self.staff_uuid:
+            raise LoadTestError(f"{username} isn't linked to a staff member")
+        self.session.headers['Authorization'] = f'JWT {access}'
+
+        jobs = self._get(f'/api/jobs/my-jobs/{self.staff_uuid}/?fields=job_number')
+        if not jobs:
+            jobs = self._get('/api/jobs/all/?fields=job_number&limit=50')['results']
+        self.job_numbers = [job['job_number'] for job in jobs if job['job_number']]
+        if not self.job_numbers:
+            raise LoadTestError("There are no jobs to request")
+        self.tasks = []
+        for job_number in self.job_numbers[:5]:
+            self.tasks += [(job_number, task['uuid']) for task in self._get(f'/api/jobs/{job_number}/')['tasks']]
+
+    def _get(self, path):
+        response = self.session.get(f'{self.base_url}{path}', timeout=self.timeout)
+        if response.status_code != 200:
+            raise LoadTestError(f"GET {path} failed: HTTP {response.status_code} {response.text[:200]}")
+        return response.json()
+
+    def request(self, name, rng, use_etags=False):
+        """Send one `name` request; returns (status, seconds, bytes, (db ms, queries) or None)"""
+        this_week = week_start_of(timezone.localdate())
+        week_start = this_week - timedelta(weeks=rng.randrange(WEEKS_BACK))
+        method, body = 'GET', None
+
+        if name == 'my-jobs':
+            path = f'/api/jobs/my-jobs/{self.staff_uuid}/'
+        elif name == 'job-detail':
+            path = f'/api/jobs/{rng.choice(self.job_numbers)}/'
+        elif name == 'staff-weekly-hours-date':
+            path = f'/api/staff/{self.staff_uuid}/weekly-hours/{week_start:%Y-%m-%d}/'
+        elif name == 'staff-weekly-hours-date (POST)':
+            method, path = 'POST', f'/api/staff/{self.staff_uuid}/weekly-hours/{this_week:%Y-%m-%d}/'
+            job_number, task_uuid = rng.choice(self.tasks)
+            day = this_week + timedelta(days=rng.randrange(5))
+            body = {'entries': [{'task_uuid': task_uuid, 'job_id': job_number, 'entries': [
+                {'date': f'{day:%Y-%m-%d}', 'hours': rng.choice([0.25, 0.5, 1, 2]), 'notes': ['Load test']}
+            ]}]}
+        elif name == 'all_jobs':
+            path = f'/api/jobs/all/'
+        elif name == 'client-list':
+            path = f'/api/clients/'
+        elif name == 'all-contacts':
+            path = f'/api/contacts/'
+        elif name == 'timesheet-list':
+            path = f'/api/timesheets/?staff={self.staff_uuid}&limit=50'
+        elif name == 'bootstrap':
+            path = f'/api/bootstrap/?week_start={this_week:%Y-%m-%d}'
+        else:
+            raise LoadTestError(f"Unknown endpoint {name!r}")
+
+        headers = {}
+        if use_etags and method == 'GET' and path in self.etags:
+            headers['If-None-Match'] = self.etags[path]
+        started = time.perf_counter()
+        try:
+            response = self.session.request(method, f'{self.base_url}{path}', json=body, headers=headers,
+                                            timeout=self.timeout)
+            size = len(response.content)
+        except requests.RequestException:
+            return None, time.perf_counter() - started, 0, None
+        elapsed = time.perf_counter() - started
+
+        if use_etags and 'ETag' in response.headers:
+            self.etags[path] = response.headers['ETag']
+        match = _SERVER_TIMING_DB.search(response.headers.get('Server-Timing', ''))
+        return response.status_code, elapsed, size, (float(match[1]), int(match[2])) if match else None
+
+
+def _summary(samples, elapsed):
+    """Figures for a list of (status, seconds, bytes, server timing) samples over `elapsed` seconds"""
+    ordered = sorted(seconds for _, seconds, _, _ in samples)
+    ms = lambda seconds: round(seconds * 1000, 2) if seconds is not None else None
+    errors = sum(1 for status, _, _, _ in samples if status is None or status >= 400)
+    timed = [timing for _, _, _, timing in samples if timing]
+    return {
+        'requests': len(samples),
+        'errors': errors,
+        'error_rate': round(errors / len(samples), 4) if samples else 0,
+        'throughput_rps': round(len(samples) / elapsed, 2) if elapsed else None,
+        'mean_ms': ms(sum(ordered) / len(ordered)) if ordered else None,
+        'p50_ms': ms(percentile(ordered, 0.5)),
+        'p95_ms': ms(percentile(ordered, 0.95)),
+        'p99_ms': ms(percentile(ordered, 0.99)),
+        'max_ms': ms(ordered[-1]) if ordered else None,
+        'avg_bytes': round(sum(size for _, _, size, _ in samples) / len(samples)) if samples else None,
+        'statuses': {str(status or 'error'): count for status, count in sorted(
+            Counter(status for status, _, _, _ in samples).items(), key=lambda item: item[0] or 0
+        )},
+        'server_db_ms': round(sum(db for db, _ in timed) / len(timed), 2) if timed else None,
+        'server_queries': round(sum(queries for _, queries in timed) / len(timed), 2) if timed else None,
+    }
+
+
+def run(base_url, usernames, password, concurrency=10, duration=60, warmup=5, mix=None,
+        use_etags=False, timeout=30, seed=1, log=None):
+    """
+    Run the load test and return {'config', 'started_at', 'elapsed_s',
+    'total', 'endpoints': {name: figures}}. Virtual users take the
+    `usernames` in turn.
+    """
+    log = log or (lambda message: None)
+    mix = mix or DEFAULT_MIX
+    unknown = set(mix) - set(DEFAULT_MIX)
+    if unknown:
+        raise LoadTestError(f"Unknown endpoints in the mix: {', '.join(sorted(unknown))}")
+    names, weights = zip(*mix.items())
+
+    log(f"Logging in {concurrency} virtual users")
+    users = [VirtualUser(base_url, usernames[i % len(usernames)], password, timeout) for i in range(concurrency)]
+
+    samples = {name: [] for name in names}
+    lock = threading.Lock()
+    started_at = timezone.now()
+    measure_from = time.monotonic() + warmup
+    stop_at = measure_from + duration
+
+    def virtual_user(index):
+        rng = random.Random(seed * 1000 + index)
+        user = users[index]
+        while True:
+            now = time.monotonic()
+            if now >= stop_at:
+                return
+            name = rng.choices(names, weights)[0]
+            sample = user.request(name, rng, use_etags)
+            if now >= measure_from:
+                with lock:
+                    samples[name].append(sample)
+
+    log(f"Running for {warmup}s warm-up + {duration}s")
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for future in [executor.submit(virtual_user, i) for i in range(concurrency)]:
+            future.result()
+
+    return {
+        'config': {
+            'base_url': base_url, 'users': len(set(usernames[:concurrency])), 'concurrency': concurrency,
+            'duration_s': duration, 'warmup_s': warmup, 'mix': dict(mix), 'etags': use_etags,
+            'seed': seed,
+        },
+        'started_at': started_at.isoformat(),
+        'elapsed_s': duration,
+        'total': _summary([sample for endpoint in samples.values() for sample in endpoint], duration),
+        'endpoints': {name: _summary(samples[name], duration) for name in names if samples[name]},
+    }
+
+
+def compare(baseline, current):
+    """
+    {endpoint: {figure: {'baseline', 'current', 'change_pct'}}} for the
+    endpoints (and 'total') in both results
+    """
+    pairs = [('total', baseline['total'], current['total'])] + [
+        (name, figures, current['endpoints'][name])
+        for name, figures in baseline['endpoints'].items() if name in current['endpoints']
+    ]
+    comparison = {}
+    for name, before, after in pairs:
+        comparison[name] = {}
+        for figure in COMPARED:
+            old, new = before.get(figure), after.get(figure)
+            change = round((new - old) / old * 100, 1) if old and new is not None else None
+            comparison[name][figure] = {'baseline': old, 'current': new, 'change_pct': change}
+    return comparison
@@ -0,0 +1,102 @@
+import json
+import statistics
+import time
+
+import orjson
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import resolve
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+
+from main.authentication import ProfileTokenObtainPairSerializer
+from main.middleware import brotli, compress
+from main.models import UserProfile
+from main.renderers import FastJSONRenderer
+from main.summaries import week_start_of
+
+# The large list endpoints, formatted with the user's staff UUID and the current week
+ENDPOINTS = (
+    '/api/jobs/all/',
+    '/api/jobs/my-jobs/{staff_uuid}/',
+    '/api/clients/',
+    '/api/contacts/',
+    '/api/timesheets/?limit=1000',
+    '/api/staff/{staff_uuid}/weekly-hours/{week_start}/',
+)
+
+
+def _median_ms(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare serialisation time (DRF JSONRenderer vs FastJSONRenderer) and bytes on the wire "
+        "(identity, gzip, brotli) for the large list endpoints, against the current database"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help="Username to call the endpoints as (default: the first admin)")
+        parser.add_argument('--repeat', type=int, default=20, help="Renders per endpoint and renderer")
+        parser.add_argument('--json', action='store_true', help="Print the results as JSON")
+
+    def handle(self, *args, **options):
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+        else:
+            profile = UserProfile.objects.filter(role='ADMIN').select_related('user').first()
+            user = profile.user if profile else None
+        if user is None:
+            raise CommandError("No such user (or no admin to default to)")
+
+        factory = APIRequestFactory()
+        # A token rather than force_authenticate(), which only DRF's views honour
+        auth = {'HTTP_AUTHORIZATION': f'JWT {ProfileTokenObtainPairSerializer.get_token(user).access_token}'}
+        week_start = week_start_of(timezone.localdate()).strftime('%Y-%m-%d')
+        stock, fast = JSONRenderer(), FastJSONRenderer()
+        results = []
+        for endpoint in ENDPOINTS:
+            path = endpoint.format(staff_uuid=user.profile.staff_uuid, week_start=week_start)
+            match = resolve(path.split('?')[0])
+            view = async_to_sync(match.func) if iscoroutinefunction(match.func) else match.func
+            response = view(factory.get(path, **auth), *match.args, **match.kwargs)
+            if response.status_code >= 400:
+                self.stderr.write(f"{path}: HTTP {response.status_code}, skipped")
+                continue
+
+            # The async views (main.async_views) return their body already rendered
+            data = response.data if hasattr(response, 'data') else orjson.loads(response.content)
+            body = stock.render(data, 'application/json')
+            results.append({
+                'endpoint': path,
+                'identical': fast.render(data, 'application/json') == body,
+                'stock_ms': round(_median_ms(lambda: stock.render(data, 'application/json'), options['repeat']), 3),
+                'fast_ms': round(_median_ms(lambda: fast.render(data, 'application/json'), options['repeat']), 3),
+                'bytes': len(body),
+                'gzip_bytes': len(compress(body, 'gzip')),
+                'br_bytes': len(compress(body, 'br')) if brotli is not None else None,
+            })
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        width = max([len('endpoint')] + [len(row['endpoint']) for row in results])
+        self.stdout.write(
+            f"{'endpoint':<{width}} {'stock ms':>9} {'fast ms':>8} {'speed-up':>8} {'bytes':>10} {'gzip':>9} {'br':>9}"
+        )
+        for row in results:
+            speed_up = row['stock_ms'] / row['fast_ms'] if row['fast_ms'] else float('inf')
+            self.stdout.write(
+                f"{row['endpoint']:<{width}} {row['stock_ms']:>9.2f} {row['fast_ms']:>8.2f} {speed_up:>7.1f}x "
+                f"{row['bytes']:>10} {row['gzip_bytes']:>9} {row['br_bytes'] if row['br_bytes'] is not None else '-':>9}"
+                + ('' if row['identical'] else '  (output differs)')
+            )
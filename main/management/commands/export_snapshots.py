@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Write columnar (Parquet or Arrow IPC) snapshots of Timesheet, partitioned by month, "
+        "and of the Job, Task, Client and Staff tables. Only new or changed months are rewritten."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('output_dir', help="Directory to write the snapshot to")
+        parser.add_argument(
+            '--format', dest='file_format', choices=['parquet', 'arrow'], default='parquet',
+            help="parquet (zstd compressed, default) or arrow (Arrow IPC, memory-mappable)",
+        )
+        parser.add_argument(
+            '--compression', choices=['zstd', 'lz4', 'snappy', 'gzip'],
+            help="Override the compression codec (Arrow IPC supports zstd and lz4 only)",
+        )
+        parser.add_argument('--full', action='store_true', help="Rewrite every partition")
+
+    def handle(self, *args, **options):
+        try:
+            from main.snapshots import export_snapshots
+        except ImportError:
+            raise CommandError("Snapshots need pyarrow: pip install pyarrow")
+
+        if options['file_format'] == 'arrow' and options['compression'] not in (None, 'zstd', 'lz4'):
+            raise CommandError("Arrow IPC files can only be compressed with zstd or lz4")
+
+        written = export_snapshots(
+            options['output_dir'], file_format=options['file_format'], compression=options['compression'],
+            full=options['full'], log=self.stdout.write,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {len(written['dimensions'])} tables and {len(written['partitions'])} timesheet partitions"
+        ))
@@ -0,0 +1,65 @@
+from datetime import datetime, time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from main.models import Staff, Client, Job, Timesheet, DataVersion
+from main.signals import VERSIONED_MODELS
+from main.synthetic import generate, create_users
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill an empty database with synthetic staff, clients, contacts, jobs, tasks, assignments and "
+        "timesheets up to today, plus a login per staff member (username: their email), for load tests"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--staff', type=int, default=50, help="Staff members")
+        parser.add_argument('--clients', type=int, default=200, help="Clients")
+        parser.add_argument('--contacts-per-client', type=int, default=3)
+        parser.add_argument('--jobs-per-client', type=int, default=4)
+        parser.add_argument('--tasks-per-job', type=int, default=5)
+        parser.add_argument('--staff-per-job', type=int, default=3, help="Staff assigned to each job")
+        parser.add_argument('--managers', type=int, default=5, help="Staff who manage the jobs (role MANAGER)")
+        parser.add_argument('--years', type=float, default=2, help="Years of timesheet history, ending today")
+        parser.add_argument('--entries-per-day', type=int, default=3, help="Most timesheet entries a day")
+        parser.add_argument(
+            '--absence-rate', type=float, default=0.05, help="Chance a staff member logs nothing on a weekday",
+        )
+        parser.add_argument('--seed', type=int, default=1, help="Random seed: the same seed gives the same data")
+        parser.add_argument('--password', default='password', help="Password for the generated logins")
+        parser.add_argument('--no-users', action='store_true', help="Don't create logins")
+
+    def handle(self, *args, **options):
+        if any(model.objects.exists() for model in (Staff, Client, Job, Timesheet)):
+            raise CommandError(
+                "The database already has data; generate into an empty one (e.g. after manage.py flush)"
+            )
+        if options['managers'] >= options['staff']:
+            raise CommandError("--managers must be less than --staff")
+
+        days = round(options['years'] * 365)
+        today = timezone.localdate()
+        start = timezone.make_aware(datetime.combine(today - timedelta(days=days - 1), time()))
+        staff = generate(
+            staff_count=options['staff'], client_count=options['clients'],
+            contacts_per_client=options['contacts_per_client'], jobs_per_client=options['jobs_per_client'],
+            tasks_per_job=options['tasks_per_job'], staff_per_job=options['staff_per_job'],
+            days_of_history=days, entries_per_day=options['entries_per_day'],
+            absence_rate=options['absence_rate'], start=start, manager_count=options['managers'],
+            seed=options['seed'], log=self.stdout.write,
+        )
+        # The rows were bulk-inserted without the signals: invalidate cached responses
+        for model in VERSIONED_MODELS:
+            DataVersion.bump(model._meta.model_name)
+
+        if not options['no_users']:
+            create_users(staff, options['password'], manager_count=options['managers'])
+            self.stdout.write(
+                f"{len(staff)} logins: {staff[0].email} .. {staff[-1].email} "
+                f"(the first {options['managers']} managers, then an admin)"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            "Synthetic data generated; restart running servers to reload their in-process indexes"
+        ))
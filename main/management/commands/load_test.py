@@ -0,0 +1,92 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main.loadtest import DEFAULT_MIX, COMPARED, LoadTestError, run, compare
+
+
+def _mix(value):
+    try:
+        return {name: int(weight) for name, weight in (item.split('=') for item in value.split(','))}
+    except ValueError:
+        raise ValueError(f"expected name=weight,..., got {value!r}")
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test a running server as the generate_synthetic_data logins: a weighted mix of my jobs, "
+        "job detail, weekly hours (GET and POST) and list requests at a given concurrency. Reports "
+        "p50/p95/p99 latency and throughput per endpoint, as JSON that can be compared between runs."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://localhost:8000', help="Server to test")
+        parser.add_argument('--users', type=int, default=20, help="Logins to spread the virtual users over")
+        parser.add_argument(
+            '--username-format', default='staff{}@example.com',
+            help="Username of login n (from 0); the default matches generate_synthetic_data",
+        )
+        parser.add_argument('--password', default='password')
+        parser.add_argument('--concurrency', type=int, default=10, help="Virtual users sending requests at once")
+        parser.add_argument('--duration', type=int, default=60, help="Seconds measured")
+        parser.add_argument('--warmup', type=int, default=5, help="Seconds run before measuring")
+        parser.add_argument(
+            '--mix', type=_mix,
+            help=f"Weights as name=weight,... (default {','.join(f'{k}={v}' for k, v in DEFAULT_MIX.items())})",
+        )
+        parser.add_argument('--etags', action='store_true', help="Send If-None-Match, as the app does")
+        parser.add_argument('--timeout', type=float, default=30, help="Seconds before a request counts as failed")
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--output', help="Write the results to this JSON file")
+        parser.add_argument('--baseline', help="Compare with the results in this JSON file (from --output)")
+        parser.add_argument('--json', action='store_true', help="Print the results as JSON")
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1 or options['users'] < 1:
+            raise CommandError("--concurrency and --users must be at least 1")
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+
+        usernames = [options['username_format'].format(n) for n in range(options['users'])]
+        try:
+            results = run(
+                options['base_url'], usernames, options['password'], concurrency=options['concurrency'],
+                duration=options['duration'], warmup=options['warmup'], mix=options['mix'],
+                use_etags=options['etags'], timeout=options['timeout'], seed=options['seed'], log=self.stderr.write,
+            )
+        except LoadTestError as e:
+            raise CommandError(str(e))
+        if baseline is not None:
+            results['comparison'] = compare(baseline, results)
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        rows = [('total', results['total'])] + list(results['endpoints'].items())
+        width = max(len(name) for name, _ in rows)
+        optional = lambda value, spec: format(value, spec) if value is not None else '-'
+        self.stdout.write(
+            f"{'endpoint':<{width}} {'requests':>8} {'errors':>6} {'req/s':>8} "
+            f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'db ms':>7} {'queries':>7}"
+        )
+        for name, row in rows:
+            self.stdout.write(
+                f"{name:<{width}} {row['requests']:>8} {row['errors']:>6} {row['throughput_rps']:>8.1f} "
+                f"{optional(row['p50_ms'], '8.1f'):>8} {optional(row['p95_ms'], '8.1f'):>8} "
+                f"{optional(row['p99_ms'], '8.1f'):>8} {optional(row['server_db_ms'], '7.1f'):>7} "
+                f"{optional(row['server_queries'], '7.1f'):>7}"
+            )
+
+        if baseline is not None:
+            self.stdout.write(f"\nChange from {options['baseline']} (%):")
+            self.stdout.write(f"{'endpoint':<{width}} " + ' '.join(f'{figure:>14}' for figure in COMPARED))
+            for name, figures in results['comparison'].items():
+                self.stdout.write(f"{name:<{width}} " + ' '.join(
+                    f"{optional(figures[figure]['change_pct'], '+.1f'):>14}" for figure in COMPARED
+                ))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from main.models import DataVersion
+from main.rollups import rebuild_progress
+from main.summaries import rebuild_summaries
+
+
+class Command(BaseCommand):
+    help = (
+        "Verify the task/job progress rollups and the daily/weekly timesheet summaries "
+        "against the Timesheet table and repair (or backfill) them"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help="Only report mismatches (exit status 1 if there are any), don't repair",
+        )
+
+    def handle(self, *args, **options):
+        repair = not options['check']
+        progress_mismatches = rebuild_progress(repair=repair)
+        summary_mismatches = rebuild_summaries(repair=repair)
+
+        if options['check']:
+            if progress_mismatches or summary_mismatches:
+                raise CommandError(
+                    f"{progress_mismatches} progress rows and {summary_mismatches} summary rows are out of date"
+                )
+            self.stdout.write(self.style.SUCCESS("Progress rollups and timesheet summaries are consistent"))
+            return
+
+        if progress_mismatches or summary_mismatches:
+            # Job lists and reports are built from these tables, so invalidate their ETags
+            DataVersion.bump('timesheet')
+        self.stdout.write(self.style.SUCCESS(
+            f"Repaired {progress_mismatches} progress rows and {summary_mismatches} summary rows"
+        ))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from main.search import SEARCH_KINDS, rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the search index (SearchTerm) for jobs, clients, contacts and staff from their tables"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'kinds', nargs='*', choices=SEARCH_KINDS,
+            help="Only rebuild these kinds (default: all)",
+        )
+
+    def handle(self, *args, **options):
+        written = rebuild_search_index(options['kinds'] or SEARCH_KINDS)
+        for kind, rows in written.items():
+            self.stdout.write(f"{kind}: {rows} terms")
+        self.stdout.write(self.style.SUCCESS("Search index rebuilt"))
@@ -0,0 +1,45 @@
+import json
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main.models import Staff
+from main.reports import timesheet_gaps, last_week, DEFAULT_DAILY_MINUTES
+
+
+def _date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+class Command(BaseCommand):
+    help = "List staff with missing or under-filled weekdays in a period (default: last week)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=_date, help="First day, YYYY-MM-DD")
+        parser.add_argument('--end', type=_date, help="Last day, YYYY-MM-DD")
+        parser.add_argument(
+            '--min-hours', type=float, default=DEFAULT_DAILY_MINUTES / 60,
+            help="Days with less than this are reported as under-filled",
+        )
+        parser.add_argument('--json', action='store_true', help="Print the report as JSON")
+
+    def handle(self, *args, **options):
+        default_start, default_end = last_week()
+        start = options['start'] or default_start
+        end = options['end'] or default_end
+        if start > end:
+            raise CommandError("--start must not be after --end")
+
+        gaps = timesheet_gaps(Staff.objects.all(), start, end, min_minutes=round(options['min_hours'] * 60))
+
+        if options['json']:
+            self.stdout.write(json.dumps(gaps, default=str, indent=2))
+            return
+
+        for row in gaps:
+            under_filled = ', '.join(f"{day['date']} ({day['hours']:g}h)" for day in row['under_filled_days'])
+            self.stdout.write(
+                f"{row['name']} <{row['email'] or '-'}>: {row['logged_hours']:g}/{row['expected_hours']:g}h"
+                f"; missing: {', '.join(row['missing_days']) or '-'}; under-filled: {under_filled or '-'}"
+            )
+        self.stdout.write(self.style.SUCCESS(f"{len(gaps)} staff with gaps between {start} and {end}"))
@@ -0,0 +1,248 @@
+# main/metrics.py
+
+"""
+Per-request database and latency instrumentation.
+
+install_query_recorder() (connected to connection_created, see
+main.signals) puts an execute wrapper on every database connection. While
+QueryMetricsMiddleware is handling a request, that wrapper times each query
+the request runs: in its own thread, in the async ORM's threads and in
+threads it hands work to with its context (the bootstrap sections). Per
+request the middleware then:
+
+- adds a Server-Timing header: db (time, with the query count), app (the
+  rest) and total;
+- logs a warning when one SQL shape (the statement with literals and IN
+  lists collapsed) runs more than settings.QUERY_REPEAT_THRESHOLD times,
+  the signature of an N+1;
+- logs queries slower than settings.SLOW_QUERY_MS with their EXPLAIN plan,
+  on the backends Django can EXPLAIN on;
+- adds the figures to the per-endpoint aggregates behind /api/metrics/.
+  These are per process, since the last reset.
+
+Streamed responses (exports) are measured up to the first byte, and their
+size isn't known. The middleware is async-capable: under ASGI the request
+runs on the event loop, with the EXPLAINs of slow queries done in a thread.
+"""
+
+import contextvars
+import logging
+import re
+import threading
+import time
+from collections import Counter, deque
+from functools import lru_cache
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Slow queries EXPLAINed per request; the rest are logged without a plan
+MAX_EXPLAINS = 3
+
+_request_stats = contextvars.ContextVar('request_stats', default=None)
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r'\bIN \((?:%s, )*%s\)')
+
+
+@lru_cache(maxsize=1024)
+def sql_shape(sql):
+    """`sql` with literals replaced by ? and IN lists of any length collapsed"""
+    return _IN_LISTS.sub('IN (...)', _LITERALS.sub('?', sql))
+
+
+class RequestStats:
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.shapes = Counter()
+        self.slow = []
+        self.lock = threading.Lock()
+
+    def add(self, alias, sql, params, duration):
+        with self.lock:
+            self.queries += 1
+            self.db_time += duration
+            self.shapes[sql_shape(sql)] += 1
+            if duration * 1000 >= settings.SLOW_QUERY_MS:
+                self.slow.append((alias, sql, params, duration))
+
+
+def _record(execute, sql, params, many, context):
+    stats = _request_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.add(context['connection'].alias, sql, params, time.perf_counter() - started)
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    if _record not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record)
+
+
+def _explain(alias, sql, params):
+    connection = connections[alias]
+    if not connection.features.supports_explaining_query_execution or not sql.lstrip().upper().startswith('SELECT'):
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}', params)
+        return '\n'.join(' '.join(str(column) for column in row) for row in cursor.fetchall())
+
+
+def explain_slow(slow):
+    """An EXPLAIN plan (or None) for each of the `slow` queries, the first MAX_EXPLAINS of them"""
+    plans = []
+    for i, (alias, sql, params, duration) in enumerate(slow):
+        plan = None
+        if i < MAX_EXPLAINS:
+            try:
+                plan = _explain(alias, sql, params)
+            except Exception as e:
+                plan = f'(EXPLAIN failed: {e})'
+        plans.append(plan)
+    return plans
+
+
+def percentile(ordered, fraction):
+    """The value at `fraction` (0-1) of the way through the sorted list `ordered`"""
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] if ordered else None
+
+
+class EndpointMetrics:
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.total_time = 0.0
+        self.db_time = 0.0
+        self.queries = 0
+        self.max_queries = 0
+        self.bytes = 0
+        self.repeated_queries = 0
+        # Recent durations, for the percentiles
+        self.durations = deque(maxlen=settings.QUERY_METRICS_SAMPLES)
+
+    def add(self, status, total_time, stats, size, repeated):
+        self.requests += 1
+        self.errors += status >= 500
+        self.total_time += total_time
+        self.db_time += stats.db_time
+        self.queries += stats.queries
+        self.max_queries = max(self.max_queries, stats.queries)
+        self.bytes += size or 0
+        self.repeated_queries += bool(repeated)
+        self.durations.append(total_time)
+
+    def summary(self):
+        ordered = sorted(self.durations)
+        ms = lambda seconds: round(seconds * 1000, 2) if seconds is not None else None
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'avg_ms': ms(self.total_time / self.requests),
+            'p50_ms': ms(percentile(ordered, 0.5)),
+            'p95_ms': ms(percentile(ordered, 0.95)),
+            'p99_ms': ms(percentile(ordered, 0.99)),
+            'max_ms': ms(ordered[-1]) if ordered else None,
+            'avg_db_ms': ms(self.db_time / self.requests),
+            'avg_queries': round(self.queries / self.requests, 2),
+            'max_queries': self.max_queries,
+            'avg_bytes': round(self.bytes / self.requests),
+            'repeated_query_requests': self.repeated_queries,
+        }
+
+
+_endpoints = {}
+_endpoints_lock = threading.Lock()
+_since = timezone.now()
+
+
+def snapshot():
+    """{'since', 'endpoints': {"METHOD route": figures}} for this process"""
+    with _endpoints_lock:
+        return {
+            'since': _since,
+            'endpoints': {key: metrics.summary() for key, metrics in sorted(_endpoints.items())},
+        }
+
+
+def reset():
+    global _since
+    with _endpoints_lock:
+        _endpoints.clear()
+        _since = timezone.now()
+
+
+class QueryMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not settings.QUERY_METRICS:
+            return self.get_response(request)
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_stats.reset(token)
+        total_time = time.perf_counter() - started
+        return self.finish(request, response, stats, total_time, explain_slow(stats.slow))
+
+    async def __acall__(self, request):
+        if not settings.QUERY_METRICS:
+            return await self.get_response(request)
+
+        # The async ORM's threads run with a copy of this context, so they record into `stats` too
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_stats.reset(token)
+        total_time = time.perf_counter() - started
+        plans = await sync_to_async(explain_slow)(stats.slow) if stats.slow else []
+        return self.finish(request, response, stats, total_time, plans)
+
+    def finish(self, request, response, stats, total_time, plans):
+        """Add the Server-Timing header, log N+1s and slow queries, and update the aggregates"""
+        app_time = max(total_time - stats.db_time, 0)
+        response.headers['Server-Timing'] = (
+            f'db;dur={stats.db_time * 1000:.1f};desc="{stats.queries} queries", '
+            f'app;dur={app_time * 1000:.1f}, total;dur={total_time * 1000:.1f}'
+        )
+
+        match = request.resolver_match
+        endpoint = f'{request.method} {match.route if match else "(unmatched)"}'
+        repeated = {shape: count for shape, count in stats.shapes.items() if count > settings.QUERY_REPEAT_THRESHOLD}
+        for shape, count in repeated.items():
+            logger.warning("Possible N+1 in %s (%s): query ran %d times: %s", endpoint, request.path, count, shape)
+        for (alias, sql, params, duration), plan in zip(stats.slow, plans):
+            logger.warning(
+                "Slow query in %s (%s): %.1f ms\n%s\nparams: %r%s",
+                endpoint, request.path, duration * 1000, sql, params, f'\nplan:\n{plan}' if plan else '',
+            )
+
+        size = None if response.streaming else len(response.content)
+        with _endpoints_lock:
+            _endpoints.setdefault(endpoint, EndpointMetrics()).add(
+                response.status_code, total_time, stats, size, repeated
+            )
+        return response
@@ -0,0 +1,92 @@
+# main/middleware.py
+
+"""
+Response compression negotiated from Accept-Encoding: brotli when the client
+accepts it and the brotli package is installed, else gzip. Responses smaller
+than settings.COMPRESSION_MIN_SIZE go out as they are; streamed responses
+(exports) are gzipped chunk by chunk as Django's GZipMiddleware does.
+
+Both codings get a random amount of padding, as Django pads gzip, so that
+the compressed length of a response that reflects input alongside a secret
+doesn't give the secret away (BREACH).
+"""
+
+import os
+import secrets
+
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
+
+try:
+    import brotli
+except ImportError:  # optional, gzip only without it
+    brotli = None
+
+# Fast levels: API payloads are compressed per request, not ahead of time
+BROTLI_QUALITY = 5
+
+
+def accepted_encodings(header):
+    """Content codings a client accepts (q > 0) from its Accept-Encoding header"""
+    accepted = set()
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        q = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding and q > 0:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+def brotli_padding(size):
+    """
+    A brotli metadata meta-block skipping `size` (1-256) random bytes, then
+    an empty last meta-block: appended to a flushed (byte-aligned) stream,
+    they pad it without changing what it decompresses to (RFC 7932 9.2).
+    """
+    # ISLAST=0, MNIBBLES=0 (metadata), reserved bit, MSKIPBYTES=1, then MSKIPLEN-1
+    header = ((size - 1) << 6 | 0b010110).to_bytes(2, 'little')
+    # ISLAST=1, ISLASTEMPTY=1
+    return header + os.urandom(size) + b'\x03'
+
+
+def compress(content, encoding):
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        padding = brotli_padding(secrets.randbelow(GZipMiddleware.max_random_bytes) + 1)
+        return compressor.process(content) + compressor.flush() + padding
+    return compress_string(content, max_random_bytes=GZipMiddleware.max_random_bytes)
+
+
+class CompressionMiddleware(GZipMiddleware):
+    def process_response(self, request, response):
+        if not response.streaming and len(response.content) < getattr(settings, 'COMPRESSION_MIN_SIZE', 1024):
+            return response
+        if response.has_header('Content-Encoding'):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        accepted = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if brotli is None or response.streaming or 'br' not in accepted:
+            # GZipMiddleware only looks for the word "gzip", so honour an explicit gzip;q=0 here
+            return super().process_response(request, response) if 'gzip' in accepted else response
+
+        compressed = compress(response.content, 'br')
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response.headers['Content-Length'] = str(len(compressed))
+        # A strong ETag must become weak once the representation is re-encoded (RFC 9110 8.8.1)
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = 'br'
+        return response
@@ -0,0 +1,88 @@
+# Generated by Django 5.0.1 on 2026-10-18 23:55
+
+import uuid
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_foreign_keys(apps, schema_editor):
+    Staff = apps.get_model('main', 'Staff')
+    Client = apps.get_model('main', 'Client')
+    Job = apps.get_model('main', 'Job')
+    Task = apps.get_model('main', 'Task')
+    JobAssignedStaff = apps.get_model('main', 'JobAssignedStaff')
+    Timesheet = apps.get_model('main', 'Timesheet')
+
+    Job.objects.filter(client_uuid__isnull=False).update(
+        client=Subquery(Client.objects.filter(uuid=OuterRef('client_uuid')).values('pk')[:1])
+    )
+    Timesheet.objects.filter(job_number__isnull=False).update(
+        job=Subquery(Job.objects.filter(job_id=OuterRef('job_number')).values('pk')[:1])
+    )
+    Timesheet.objects.filter(task_uuid__isnull=False).update(
+        task=Subquery(Task.objects.filter(uuid=OuterRef('task_uuid')).values('pk')[:1])
+    )
+
+    # Staff.uuid is a hyphenated CharField while the other columns are UUIDFields,
+    # so match in Python (the staff table is small) and update per staff member.
+    for staff_pk, staff_uuid in Staff.objects.values_list('pk', 'uuid'):
+        try:
+            staff_uuid = uuid.UUID(staff_uuid)
+        except ValueError:
+            continue
+        Timesheet.objects.filter(staff_uuid=staff_uuid).update(staff=staff_pk)
+        JobAssignedStaff.objects.filter(staff_uuid=staff_uuid).update(staff=staff_pk)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0009_changelog'),
+    ]
+
+    operations = [
+        # Timesheet.job_id holds the job number; free the name for the FK
+        # without touching the column.
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.RenameField(
+                    model_name='timesheet',
+                    old_name='job_id',
+                    new_name='job_number',
+                ),
+                migrations.AlterField(
+                    model_name='timesheet',
+                    name='job_number',
+                    field=models.CharField(blank=True, db_column='job_id', max_length=50, null=True),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='client',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='jobs', to='main.client'),
+        ),
+        migrations.AddField(
+            model_name='jobassignedstaff',
+            name='staff',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='job_assignments', to='main.staff'),
+        ),
+        migrations.AddField(
+            model_name='timesheet',
+            name='job',
+            field=models.ForeignKey(blank=True, db_column='job_pk', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='timesheets', to='main.job'),
+        ),
+        migrations.AddField(
+            model_name='timesheet',
+            name='staff',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='timesheets', to='main.staff'),
+        ),
+        migrations.AddField(
+            model_name='timesheet',
+            name='task',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='timesheets', to='main.task'),
+        ),
+        migrations.RunPython(backfill_foreign_keys, migrations.RunPython.noop),
+    ]
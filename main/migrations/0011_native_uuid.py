@@ -0,0 +1,282 @@
+# Generated by Django 5.0.1 on 2026-10-19 00:20
+
+import uuid
+
+import main.fields
+from django.db import migrations, models
+
+# Every UUID column, as (model_name, field_name). Before this migration they were a mix of
+# UUIDField (char(32) hex on SQL Server/SQLite) and CharField(36) (hyphenated).
+UUID_COLUMNS = [
+    ('changelog', 'object_uuid'),
+    ('client', 'account_manager_uuid'),
+    ('client', 'billing_client_uuid'),
+    ('client', 'job_manager_uuid'),
+    ('client', 'uuid'),
+    ('contact', 'uuid'),
+    ('job', 'client_uuid'),
+    ('job', 'manager_uuid'),
+    ('job', 'partner_uuid'),
+    ('job', 'uuid'),
+    ('jobassignedstaff', 'staff_uuid'),
+    ('staff', 'uuid'),
+    ('task', 'uuid'),
+    ('taskassignedstaff', 'staff_uuid'),
+    ('timeentry', 'staff_uuid'),
+    ('timeentry', 'task_uuid'),
+    ('timesheet', 'invoice_task_uuid'),
+    ('timesheet', 'staff_uuid'),
+    ('timesheet', 'task_uuid'),
+    ('timesheet', 'uuid'),
+    ('userprofile', 'staff_uuid'),
+]
+
+
+def fix_invalid_uuid_values(apps, schema_editor):
+    """Clear out text values that no UUID column would accept"""
+    Staff = apps.get_model('main', 'Staff')
+    UserProfile = apps.get_model('main', 'UserProfile')
+
+    # Staff.uuid used to default to '1234567890'
+    for staff in Staff.objects.all().only('pk', 'uuid'):
+        try:
+            uuid.UUID(str(staff.uuid))
+        except ValueError:
+            Staff.objects.filter(pk=staff.pk).update(uuid=str(uuid.uuid4()))
+
+    for profile in UserProfile.objects.filter(staff_uuid__isnull=False).only('pk', 'staff_uuid'):
+        try:
+            uuid.UUID(profile.staff_uuid)
+        except ValueError:
+            UserProfile.objects.filter(pk=profile.pk).update(staff_uuid=None)
+
+
+def normalise_uuid_text(apps, schema_editor):
+    """
+    At this point every UUID column is text. Rewrite the values into the form the
+    final column type expects: hyphenated for SQL Server's uniqueidentifier, bare
+    lower-case hex for backends without a native UUID type. PostgreSQL casts
+    either form itself.
+    """
+    connection = schema_editor.connection
+    quote = schema_editor.quote_name
+    for model_name, field_name in UUID_COLUMNS:
+        model = apps.get_model('main', model_name)
+        table = quote(model._meta.db_table)
+        column = quote(model._meta.get_field(field_name).column)
+        if connection.vendor == 'microsoft':
+            schema_editor.execute(
+                f"UPDATE {table} SET {column} = "
+                f"STUFF(STUFF(STUFF(STUFF({column}, 9, 0, '-'), 14, 0, '-'), 19, 0, '-'), 24, 0, '-') "
+                f"WHERE LEN({column}) = 32"
+            )
+        elif not connection.features.has_native_uuid_field:
+            schema_editor.execute(
+                f"UPDATE {table} SET {column} = LOWER(REPLACE({column}, '-', '')) "
+                f"WHERE {column} IS NOT NULL"
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0010_foreign_keys'),
+    ]
+
+    operations = [
+        migrations.RunPython(fix_invalid_uuid_values, migrations.RunPython.noop),
+        # 1) Widen the UUIDField columns to text so they can hold hyphens
+        migrations.AlterField(
+            model_name='client',
+            name='account_manager_uuid',
+            field=models.CharField(blank=True, null=True, max_length=36),
+        ),
+        migrations.AlterField(
+            model_name='client',
+            name='billing_client_uuid',
+            field=models.CharField(blank=True, null=True, max_length=36),
+        ),
+        migrations.AlterField(
+            model_name='client',
+            name='job_manager_uuid',
+            field=models.CharField(blank=True, null=True, max_length=36),
+        ),
+        migrations.AlterField(
+            model_name='client',
+            name='uuid',
+            field=models.CharField(unique=True, max_length=36),
+        ),
+        migrations.AlterField(
+            model_name='contact',
+            name='uuid',
+            field=models.CharField(unique=True, max_length=36),
+        ),
+        migrations.AlterField(
+            model_name='job',
+            name='client_uuid',
+            field=models.CharField(blank=True, null=True, max_length=36),
+        ),
+        migrations.AlterField(
+            model_name='job',
+            name='manager_uuid',
+            field=models.CharField(blank=True, null=True, max_length=36),
+        ),
+        migrations.AlterField(
+            model_name='job',
+            name='partner_uuid',
+            field=models.CharField(blank=True, null=True, max_length=36),
+        ),
+        migrations.AlterField(
+            model_name='jobassignedstaff',
+            name='staff_uuid',
+            field=models.CharField(max_length=36),
+        ),
+        migrations.AlterField(
+            model_name='task',
+            name='uuid',
+            field=models.CharField(blank=True, null=True, unique=True, max_length=36),
+        ),
+        migrations.AlterField(
+            model_name='taskassignedstaff',
+            name='staff_uuid',
+            field=models.CharField(max_length=36),
+        ),
+        migrations.AlterField(
+            model_name='timeentry',
+            name='staff_uuid',
+            field=models.CharField(max_length=36),
+        ),
+        migrations.AlterField(
+            model_name='timeentry',
+            name='task_uuid',
+            field=models.CharField(max_length=36),
+        ),
+        migrations.AlterField(
+            model_name='timesheet',
+            name='invoice_task_uuid',
+            field=models.CharField(blank=True, null=True, max_length=36),
+        ),
+        migrations.AlterField(
+            model_name='timesheet',
+            name='staff_uuid',
+            field=models.CharField(blank=True, null=True, max_length=36),
+        ),
+        migrations.AlterField(
+            model_name='timesheet',
+            name='task_uuid',
+            field=models.CharField(blank=True, null=True, max_length=36),
+        ),
+        migrations.AlterField(
+            model_name='timesheet',
+            name='uuid',
+            field=models.CharField(editable=False, primary_key=True, serialize=False, max_length=36),
+        ),
+        # 2) Bring all values into the target representation
+        migrations.RunPython(normalise_uuid_text, migrations.RunPython.noop),
+        # 3) Convert everything to the native UUID type
+        migrations.AlterField(
+            model_name='changelog',
+            name='object_uuid',
+            field=main.fields.NativeUUIDField(),
+        ),
+        migrations.AlterField(
+            model_name='client',
+            name='account_manager_uuid',
+            field=main.fields.NativeUUIDField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='client',
+            name='billing_client_uuid',
+            field=main.fields.NativeUUIDField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='client',
+            name='job_manager_uuid',
+            field=main.fields.NativeUUIDField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='client',
+            name='uuid',
+            field=main.fields.NativeUUIDField(unique=True),
+        ),
+        migrations.AlterField(
+            model_name='contact',
+            name='uuid',
+            field=main.fields.NativeUUIDField(unique=True),
+        ),
+        migrations.AlterField(
+            model_name='job',
+            name='client_uuid',
+            field=main.fields.NativeUUIDField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='job',
+            name='manager_uuid',
+            field=main.fields.NativeUUIDField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='job',
+            name='partner_uuid',
+            field=main.fields.NativeUUIDField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='job',
+            name='uuid',
+            field=main.fields.NativeUUIDField(unique=True),
+        ),
+        migrations.AlterField(
+            model_name='jobassignedstaff',
+            name='staff_uuid',
+            field=main.fields.NativeUUIDField(),
+        ),
+        migrations.AlterField(
+            model_name='staff',
+            name='uuid',
+            field=main.fields.NativeUUIDField(default=uuid.uuid4, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='task',
+            name='uuid',
+            field=main.fields.NativeUUIDField(blank=True, null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='taskassignedstaff',
+            name='staff_uuid',
+            field=main.fields.NativeUUIDField(),
+        ),
+        migrations.AlterField(
+            model_name='timeentry',
+            name='staff_uuid',
+            field=main.fields.NativeUUIDField(),
+        ),
+        migrations.AlterField(
+            model_name='timeentry',
+            name='task_uuid',
+            field=main.fields.NativeUUIDField(),
+        ),
+        migrations.AlterField(
+            model_name='timesheet',
+            name='invoice_task_uuid',
+            field=main.fields.NativeUUIDField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='timesheet',
+            name='staff_uuid',
+            field=main.fields.NativeUUIDField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='timesheet',
+            name='task_uuid',
+            field=main.fields.NativeUUIDField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='timesheet',
+            name='uuid',
+            field=main.fields.NativeUUIDField(editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='userprofile',
+            name='staff_uuid',
+            field=main.fields.NativeUUIDField(blank=True, null=True),
+        ),
+    ]
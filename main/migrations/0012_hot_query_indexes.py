@@ -0,0 +1,37 @@
+# Generated by Django 5.0.1 on 2026-10-18 23:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0011_native_uuid'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contact',
+            index=models.Index(fields=['client', 'name'], name='contact_client_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['client_uuid', 'due_date'], name='job_client_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='jobassignedstaff',
+            index=models.Index(fields=['staff_uuid', 'job'], name='jobstaff_staff_job_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='staff',
+            index=models.Index(fields=['email'], name='staff_email_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timesheet',
+            index=models.Index(fields=['staff_uuid', 'entry_date'], include=('minutes', 'billable', 'task'), name='timesheet_staff_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timesheet',
+            index=models.Index(fields=['task_uuid'], name='timesheet_task_uuid_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.0.1 on 2026-10-18 23:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0012_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobProgress',
+            fields=[
+                ('job', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='progress', serialize=False, to='main.job')),
+                ('estimated_minutes', models.IntegerField(default=0)),
+                ('actual_minutes', models.IntegerField(default=0)),
+                ('billable_minutes', models.IntegerField(default=0)),
+                ('entry_count', models.IntegerField(default=0)),
+                ('last_entry_date', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TaskProgress',
+            fields=[
+                ('task', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='progress', serialize=False, to='main.task')),
+                ('actual_minutes', models.IntegerField(default=0)),
+                ('billable_minutes', models.IntegerField(default=0)),
+                ('entry_count', models.IntegerField(default=0)),
+                ('last_entry_date', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.0.1 on 2026-10-18 23:38
+
+import main.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0013_progress_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StaffWeekJobSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('staff_uuid', main.fields.NativeUUIDField()),
+                ('week_start', models.DateField()),
+                ('job_number', models.CharField(blank=True, default='', max_length=50)),
+                ('minutes', models.IntegerField(default=0)),
+                ('billable_minutes', models.IntegerField(default=0)),
+                ('entry_count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StaffDaySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('staff_uuid', main.fields.NativeUUIDField()),
+                ('day', models.DateField()),
+                ('billable', models.BooleanField()),
+                ('minutes', models.IntegerField(default=0)),
+                ('entry_count', models.IntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day', 'staff_uuid'], name='staffday_day_staff_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='staffdaysummary',
+            constraint=models.UniqueConstraint(fields=('staff_uuid', 'day', 'billable'), name='staffday_unique'),
+        ),
+        migrations.AddIndex(
+            model_name='staffweekjobsummary',
+            index=models.Index(fields=['week_start', 'job_number'], name='staffweekjob_week_job_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='staffweekjobsummary',
+            constraint=models.UniqueConstraint(fields=('staff_uuid', 'week_start', 'job_number'), name='staffweekjob_unique'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.1 on 2026-10-18 23:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0014_timesheet_summaries'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['manager_uuid'], name='job_manager_idx'),
+        ),
+    ]
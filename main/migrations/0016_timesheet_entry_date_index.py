@@ -0,0 +1,17 @@
+# Generated by Django 5.0.1 on 2026-10-18 23:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0015_job_manager_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='timesheet',
+            index=models.Index(fields=['entry_date'], name='timesheet_entry_date_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.1 on 2026-10-18 23:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0016_timesheet_entry_date_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='taskassignedstaff',
+            index=models.Index(fields=['staff_uuid', 'task'], name='taskstaff_staff_task_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.0.1 on 2026-10-18 23:52
+
+import main.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0017_task_staff_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('kind', models.CharField(max_length=10)),
+                ('object_uuid', main.fields.NativeUUIDField()),
+                ('weight', models.IntegerField(default=1)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['term', 'kind'], name='searchterm_term_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='searchterm',
+            constraint=models.UniqueConstraint(fields=('kind', 'object_uuid', 'term'), name='searchterm_unique'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.0.1 on 2026-10-19 00:38
+
+import main.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0019_list_sort_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='changelog',
+            name='staff_uuid',
+            field=main.fields.NativeUUIDField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.0.1 on 2026-10-19 09:10
+
+from django.db import migrations
+from django.db.models import Count, Max, Q, Sum
+from django.db.models.functions import Coalesce
+
+
+def backfill_progress(apps, schema_editor):
+    """
+    Fill TaskProgress / JobProgress for the timesheets logged before the
+    rollups existed, with one grouped aggregate per source table. Rows the
+    timesheet signals have created since are already complete and are kept.
+    """
+    Task = apps.get_model('main', 'Task')
+    Timesheet = apps.get_model('main', 'Timesheet')
+    TaskProgress = apps.get_model('main', 'TaskProgress')
+    JobProgress = apps.get_model('main', 'JobProgress')
+
+    def totals(group_field):
+        return {
+            row[group_field]: {
+                'actual_minutes': row['actual_minutes'],
+                'billable_minutes': row['billable_minutes'],
+                'entry_count': row['entry_count'],
+                'last_entry_date': row['last_entry_date'],
+            }
+            for row in Timesheet.objects.filter(**{f'{group_field}__isnull': False}).values(group_field).annotate(
+                actual_minutes=Coalesce(Sum('minutes'), 0),
+                billable_minutes=Coalesce(Sum('minutes', filter=Q(billable=True)), 0),
+                entry_count=Count('pk'),
+                last_entry_date=Max('entry_date'),
+            ).order_by()
+        }
+
+    tasks = totals('task')
+    existing = set(TaskProgress.objects.values_list('pk', flat=True))
+    TaskProgress.objects.bulk_create(
+        [TaskProgress(pk=key, **values) for key, values in tasks.items() if key not in existing],
+        batch_size=500,
+    )
+
+    jobs = totals('job')
+    for row in Task.objects.filter(job__isnull=False).values('job').annotate(
+        estimate=Coalesce(Sum('estimated_minutes'), 0)
+    ).order_by():
+        jobs.setdefault(row['job'], {})['estimated_minutes'] = row['estimate']
+    existing = set(JobProgress.objects.values_list('pk', flat=True))
+    JobProgress.objects.bulk_create(
+        [JobProgress(pk=key, **values) for key, values in jobs.items() if key not in existing],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0020_changelog_staff_uuid'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_progress, migrations.RunPython.noop),
+    ]
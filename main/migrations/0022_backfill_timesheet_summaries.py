@@ -0,0 +1,60 @@
+# Generated by Django 5.0.1 on 2026-10-19 09:25
+
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import migrations
+from django.db.models import Count, Sum
+from django.db.models.functions import Coalesce, TruncDate
+
+
+def backfill_summaries(apps, schema_editor):
+    """
+    Fill StaffDaySummary / StaffWeekJobSummary for the timesheets logged
+    before the summaries existed, from one grouped aggregate over Timesheet.
+    Buckets the timesheet signals have created since are complete and kept.
+    """
+    Timesheet = apps.get_model('main', 'Timesheet')
+    StaffDaySummary = apps.get_model('main', 'StaffDaySummary')
+    StaffWeekJobSummary = apps.get_model('main', 'StaffWeekJobSummary')
+
+    grouped = Timesheet.objects.filter(staff_uuid__isnull=False, entry_date__isnull=False).annotate(
+        day=TruncDate('entry_date')
+    ).values('staff_uuid', 'day', 'billable', 'job_number').annotate(
+        total_minutes=Coalesce(Sum('minutes'), 0),
+        entries=Count('pk'),
+    ).order_by()
+
+    days = defaultdict(lambda: {'minutes': 0, 'entry_count': 0})
+    weeks = defaultdict(lambda: {'minutes': 0, 'billable_minutes': 0, 'entry_count': 0})
+    for row in grouped.iterator():
+        day_totals = days[(row['staff_uuid'], row['day'], row['billable'])]
+        day_totals['minutes'] += row['total_minutes']
+        day_totals['entry_count'] += row['entries']
+
+        week_start = row['day'] - timedelta(days=row['day'].weekday())
+        week_totals = weeks[(row['staff_uuid'], week_start, row['job_number'] or '')]
+        week_totals['minutes'] += row['total_minutes']
+        week_totals['billable_minutes'] += row['total_minutes'] if row['billable'] else 0
+        week_totals['entry_count'] += row['entries']
+
+    for model, key_fields, expected in (
+        (StaffDaySummary, ('staff_uuid', 'day', 'billable'), days),
+        (StaffWeekJobSummary, ('staff_uuid', 'week_start', 'job_number'), weeks),
+    ):
+        existing = set(model.objects.values_list(*key_fields))
+        model.objects.bulk_create(
+            [model(**dict(zip(key_fields, key)), **totals) for key, totals in expected.items() if key not in existing],
+            batch_size=500,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0021_backfill_progress_rollups'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_summaries, migrations.RunPython.noop),
+    ]
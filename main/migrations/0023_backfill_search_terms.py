@@ -0,0 +1,44 @@
+# Generated by Django 5.0.1 on 2026-10-19 09:40
+
+from django.db import migrations
+
+# The tokenizer, so the backfilled terms are the ones the signals would write
+from main.search import BATCH_SIZE, SEARCH_FIELDS, document_terms
+
+
+def backfill_search_terms(apps, schema_editor):
+    """
+    Index the jobs, clients, contacts and staff that existed before
+    SearchTerm, reading and writing BATCH_SIZE rows at a time. Objects the
+    signals have indexed since are skipped.
+    """
+    SearchTerm = apps.get_model('main', 'SearchTerm')
+    for kind, (_, weights) in SEARCH_FIELDS.items():
+        model = apps.get_model('main', kind)
+        names = ['uuid', *weights]
+        indexed = set(SearchTerm.objects.filter(kind=kind).values_list('object_uuid', flat=True).distinct())
+        batch = []
+        for row in model.objects.exclude(uuid__isnull=True).values_list(*names).iterator(chunk_size=BATCH_SIZE):
+            values = dict(zip(names, row))
+            if values['uuid'] in indexed:
+                continue
+            indexed.add(values['uuid'])
+            batch.extend(
+                SearchTerm(term=term, kind=kind, object_uuid=values['uuid'], weight=weight)
+                for term, weight in document_terms(kind, values).items()
+            )
+            if len(batch) >= BATCH_SIZE:
+                SearchTerm.objects.bulk_create(batch)
+                batch = []
+        SearchTerm.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0022_backfill_timesheet_summaries'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_search_terms, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.1 on 2026-10-19 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0023_backfill_search_terms'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='timesheet',
+            index=models.Index(fields=['job_number', 'entry_date'], name='timesheet_job_date_idx'),
+        ),
+    ]
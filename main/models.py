@@ -1,16 +1,19 @@
 # main/models.py
 
-from django.db import models
+from django.db import models, transaction, IntegrityError
+from django.db.models import F
 import uuid
 from django.contrib.auth.models import AbstractUser, User
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 
+from .fields import NativeUUIDField
+
 # main/models.py
 
 
 class Staff(models.Model):
-    uuid = models.CharField(max_length=36, unique=True, default="1234567890")  # to store the 'UUID'
+    uuid = NativeUUIDField(unique=True, default=uuid.uuid4)
     name = models.CharField(max_length=255, default="Bob")
     email = models.EmailField(null=True, blank=True)
     mobile = models.CharField(max_length=50, null=True, blank=True)
@@ -18,13 +21,19 @@ class Staff(models.Model):
     payroll_code = models.CharField(max_length=50, null=True, blank=True)
     web_url = models.URLField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # check_staff_email / registration lookups
+            models.Index(fields=['email'], name='staff_email_idx'),
+        ]
+
     def __str__(self):
-        return self.name or self.uuid
+        return self.name or str(self.uuid)
 
 
 class Job(models.Model):
     job_id = models.CharField(max_length=50, unique=True, null=True, blank=True)
-    uuid = models.CharField(max_length=36, unique=True)  # Changed to CharField
+    uuid = NativeUUIDField(unique=True)
 
     name = models.CharField(max_length=255, null=True, blank=True)
     description = models.TextField(null=True, blank=True)
@@ -46,18 +55,32 @@ class Job(models.Model):
     date_modified_utc = models.DateTimeField(null=True, blank=True)
 
     # Additional fields
-    client_uuid = models.UUIDField(null=True, blank=True)
-    manager_uuid = models.UUIDField(null=True, blank=True)
-    partner_uuid = models.UUIDField(null=True, blank=True)
+    client_uuid = NativeUUIDField(null=True, blank=True)
+    client = models.ForeignKey(
+        'Client', on_delete=models.SET_NULL, null=True, blank=True, related_name='jobs'
+    )  # Linked from client_uuid by the syncs
+    manager_uuid = NativeUUIDField(null=True, blank=True)
+    partner_uuid = NativeUUIDField(null=True, blank=True)
 
     web_url = models.URLField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # client_jobs: filter by client, newest due date first
+            models.Index(fields=['client_uuid', 'due_date'], name='job_client_due_idx'),
+            # Team reports: the jobs a manager runs
+            models.Index(fields=['manager_uuid'], name='job_manager_idx'),
+            # Job lists: sorted by due date, optionally filtered by state
+            models.Index(fields=['due_date'], name='job_due_idx'),
+            models.Index(fields=['state', 'due_date'], name='job_state_due_idx'),
+        ]
+
     def __str__(self):
         return f"{self.job_id or self.uuid} - {self.name}"
     
 
 class Task(models.Model):
-    uuid = models.UUIDField(unique=True, null=True, blank=True)
+    uuid = NativeUUIDField(unique=True, null=True, blank=True)
     name = models.CharField(max_length=255, null=True, blank=True)
     description = models.TextField(null=True, blank=True)
 
@@ -77,13 +100,20 @@ class JobAssignedStaff(models.Model):
     # Link back to the Job
     job = models.ForeignKey(Job, on_delete=models.CASCADE, related_name="job_assigned_staff")
 
-    # Staff info stored inline (or link to a Staff model if you have one)
-    staff_uuid = models.UUIDField()
+    # Staff info stored inline, plus the link to Staff when it has been synced
+    staff_uuid = NativeUUIDField()
     staff_name = models.CharField(max_length=255, null=True, blank=True)
+    staff = models.ForeignKey(
+        Staff, on_delete=models.SET_NULL, null=True, blank=True, related_name='job_assignments'
+    )
 
     class Meta:
         # If you don't want duplicates, you can enforce uniqueness:
         unique_together = ("job", "staff_uuid")
+        indexes = [
+            # my_jobs: the unique constraint leads with job, so it can't serve staff lookups
+            models.Index(fields=['staff_uuid', 'job'], name='jobstaff_staff_job_idx'),
+        ]
 
     def __str__(self):
         return f"{self.staff_name} assigned to {self.job}"
@@ -93,19 +123,23 @@ class TaskAssignedStaff(models.Model):
     task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name="task_assigned_staff")
 
     # Staff info
-    staff_uuid = models.UUIDField()
+    staff_uuid = NativeUUIDField()
     staff_name = models.CharField(max_length=255, null=True, blank=True)
     allocated_minutes = models.IntegerField(null=True, blank=True)
 
     class Meta:
         unique_together = ("task", "staff_uuid")
+        indexes = [
+            # Capacity report: a staff member's allocations
+            models.Index(fields=['staff_uuid', 'task'], name='taskstaff_staff_task_idx'),
+        ]
 
     def __str__(self):
         return f"{self.staff_name} on {self.task.name} (Allocated: {self.allocated_minutes})"
     
 
 class Client(models.Model):
-    uuid = models.UUIDField(unique=True)
+    uuid = NativeUUIDField(unique=True)
     name = models.CharField(max_length=255)
     
     email = models.EmailField(null=True, blank=True)
@@ -132,10 +166,10 @@ class Client(models.Model):
 
     # AccountManager and JobManager might reference your Staff model by UUID 
     # or just store them inline like:
-    account_manager_uuid = models.UUIDField(null=True, blank=True)
+    account_manager_uuid = NativeUUIDField(null=True, blank=True)
     account_manager_name = models.CharField(max_length=255, null=True, blank=True)
 
-    job_manager_uuid = models.UUIDField(null=True, blank=True)
+    job_manager_uuid = NativeUUIDField(null=True, blank=True)
     job_manager_name = models.CharField(max_length=255, null=True, blank=True)
 
     # Info from <Type> block, if needed
@@ -145,19 +179,25 @@ class Client(models.Model):
     payment_day = models.CharField(max_length=100, null=True, blank=True)
 
     # Possibly store <BillingClient> here or link to another record
-    billing_client_uuid = models.UUIDField(null=True, blank=True)
+    billing_client_uuid = NativeUUIDField(null=True, blank=True)
     billing_client_name = models.CharField(max_length=255, null=True, blank=True)
 
     web_url = models.URLField(null=True, blank=True)
 
     notes = models.TextField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # client_list: ordered by name
+            models.Index(fields=['name'], name='client_name_idx'),
+        ]
+
     def __str__(self):
         return f"{self.name} ({self.uuid})"
 
 
 class Contact(models.Model):
-    uuid = models.UUIDField(unique=True)
+    uuid = NativeUUIDField(unique=True)
     is_primary = models.BooleanField(default=False)
     name = models.CharField(max_length=255, null=True, blank=True)
     salutation = models.CharField(max_length=50, null=True, blank=True)
@@ -170,6 +210,14 @@ class Contact(models.Model):
     # Link back to the parent Client
     client = models.ForeignKey(Client, on_delete=models.CASCADE, related_name="contacts")
 
+    class Meta:
+        indexes = [
+            # client_contacts: filter by client, ordered by name
+            models.Index(fields=['client', 'name'], name='contact_client_name_idx'),
+            # all_contacts: ordered by name
+            models.Index(fields=['name'], name='contact_name_idx'),
+        ]
+
     def __str__(self):
         return f"{self.name} ({'Primary' if self.is_primary else 'Secondary'})"
     
@@ -179,19 +227,30 @@ class Timesheet(models.Model):
     Represents a single time entry (Times > Time) from WorkflowMax2 XML.
     """
     # The main UUID from <Time><UUID> (unique for each entry)
-    uuid = models.UUIDField(primary_key=True, editable=False)
+    uuid = NativeUUIDField(primary_key=True, editable=False)
 
-    # Job fields (inline)
-    job_id = models.CharField(max_length=50, null=True, blank=True)
+    # Job fields (inline). job_number is the job's ID (e.g. J001516), kept in the
+    # original job_id column; `job` links to the Job row once it has been synced.
+    job_number = models.CharField(max_length=50, null=True, blank=True, db_column='job_id')
     job_name = models.CharField(max_length=255, null=True, blank=True)
+    job = models.ForeignKey(
+        Job, on_delete=models.SET_NULL, null=True, blank=True, related_name='timesheets',
+        db_column='job_pk'
+    )
 
     # Task fields (inline)
-    task_uuid = models.UUIDField(null=True, blank=True)
+    task_uuid = NativeUUIDField(null=True, blank=True)
     task_name = models.CharField(max_length=255, null=True, blank=True)
+    task = models.ForeignKey(
+        Task, on_delete=models.SET_NULL, null=True, blank=True, related_name='timesheets'
+    )
 
     # Staff fields (inline)
-    staff_uuid = models.UUIDField(null=True, blank=True)
+    staff_uuid = NativeUUIDField(null=True, blank=True)
     staff_name = models.CharField(max_length=255, null=True, blank=True)
+    staff = models.ForeignKey(
+        Staff, on_delete=models.SET_NULL, null=True, blank=True, related_name='timesheets'
+    )
 
     # The date/time of the entry, e.g. <Date>2025-01-01T00:00:00</Date>
     # Typically, we'd parse to a DateTimeField (or just a DateField if time is always 00:00:00)
@@ -207,11 +266,27 @@ class Timesheet(models.Model):
     billable = models.BooleanField(default=False)
 
     # InvoiceTaskUUID (optional; only appears if <InvoiceTaskUUID> is present)
-    invoice_task_uuid = models.UUIDField(null=True, blank=True)
+    invoice_task_uuid = NativeUUIDField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Weekly hours and per-staff reports: one staff member over a date range.
+            # The included columns cover the daily totals where the backend supports it.
+            models.Index(
+                fields=['staff_uuid', 'entry_date'], name='timesheet_staff_date_idx',
+                include=['minutes', 'billable', 'task'],
+            ),
+            # Entries by task UUID (sync and submit lookups)
+            models.Index(fields=['task_uuid'], name='timesheet_task_uuid_idx'),
+            # Date-range exports, in date order
+            models.Index(fields=['entry_date'], name='timesheet_entry_date_idx'),
+            # Entries by job number (the timesheet list's and the exports' job filter)
+            models.Index(fields=['job_number', 'entry_date'], name='timesheet_job_date_idx'),
+        ]
 
     def __str__(self):
         # e.g. "9dbfa398-6c8b-4a2b-adc0-242427f9194a - J001516 - 2025-01-01"
-        return f"{self.uuid} - {self.job_id} - {self.entry_date.date() if self.entry_date else 'NoDate'}"
+        return f"{self.uuid} - {self.job_number} - {self.entry_date.date() if self.entry_date else 'NoDate'}"
 
 class UserProfile(models.Model):
     """
@@ -224,7 +299,7 @@ class UserProfile(models.Model):
     ]
 
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
-    staff_uuid = models.CharField(max_length=36, null=True, blank=True)  # To store Staff UUID
+    staff_uuid = NativeUUIDField(null=True, blank=True)  # To store Staff UUID
     role = models.CharField(
         max_length=20, 
         choices=ROLE_CHOICES,
@@ -254,11 +329,14 @@ def create_user_profile(sender, instance, created, **kwargs):
 
 @receiver(post_save, sender=User)
 def save_user_profile(sender, instance, **kwargs):
-    instance.profile.save()
+    # A profile built by main.authentication holds only the role and staff_uuid read as
+    # the request began; saving it would write them back over any change made since
+    if not getattr(instance.profile, 'from_token', False):
+        instance.profile.save()
 
 class TimeEntry(models.Model):
-    staff_uuid = models.UUIDField()
-    task_uuid = models.UUIDField()
+    staff_uuid = NativeUUIDField()
+    task_uuid = NativeUUIDField()
     job_id = models.CharField(max_length=50)
     date = models.DateField()
     hours = models.DecimalField(max_digits=4, decimal_places=2)
@@ -276,3 +354,161 @@ class TimeEntry(models.Model):
         return f"{self.staff_uuid} - {self.job_id} - {self.date}"
 
 
+
+
+class DataVersion(models.Model):
+    """
+    Monotonic write counter per model, bumped by signals on every save/delete.
+    Lets views build ETags without touching the (much bigger) data tables.
+    """
+    name = models.CharField(max_length=50, unique=True)  # model_name, e.g. 'timesheet'
+    version = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} v{self.version}"
+
+    @classmethod
+    def bump(cls, name):
+        updated = cls.objects.filter(name=name).update(version=F('version') + 1)
+        if not updated:
+            try:
+                with transaction.atomic():
+                    cls.objects.create(name=name, version=1)
+            except IntegrityError:
+                # Another writer created the row first
+                cls.objects.filter(name=name).update(version=F('version') + 1)
+
+    @classmethod
+    def current(cls, names):
+        """Return {name: version} for the given model names (missing ones are 0)"""
+        versions = dict(cls.objects.filter(name__in=names).values_list('name', 'version'))
+        return {name: versions.get(name, 0) for name in names}
+
+
+class ChangeLog(models.Model):
+    """
+    Append-only log of writes to the synced models, appended by signals from
+    both the sync scripts and the write views. `seq` is the cursor handed to
+    clients by the changes feed; it is allocated before commit, so read it
+    through main.changelog. Timesheet rows carry the entry's staff_uuid, for
+    scoping deletions.
+    """
+    ACTION_CHOICES = [
+        ('CREATE', 'Create'),
+        ('UPDATE', 'Update'),
+        ('DELETE', 'Delete'),
+    ]
+
+    seq = models.BigAutoField(primary_key=True)
+    model_name = models.CharField(max_length=50)  # e.g. 'job', 'timesheet'
+    object_uuid = NativeUUIDField()
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    staff_uuid = NativeUUIDField(null=True, blank=True)
+    changed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['seq']
+
+    def __str__(self):
+        return f"#{self.seq} {self.action} {self.model_name} {self.object_uuid}"
+
+
+class TaskProgress(models.Model):
+    """
+    Running totals of the timesheets logged against a task. Maintained
+    incrementally by main.rollups; `manage.py rebuild_rollups` verifies/repairs.
+    """
+    task = models.OneToOneField(Task, on_delete=models.CASCADE, primary_key=True, related_name='progress')
+    actual_minutes = models.IntegerField(default=0)
+    billable_minutes = models.IntegerField(default=0)
+    entry_count = models.IntegerField(default=0)
+    last_entry_date = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.task_id}: {self.actual_minutes} min over {self.entry_count} entries"
+
+
+class JobProgress(models.Model):
+    """
+    Running totals of the timesheets logged against a job, plus the sum of its
+    task estimates, so job lists can show burn-down without touching Timesheet.
+    """
+    job = models.OneToOneField(Job, on_delete=models.CASCADE, primary_key=True, related_name='progress')
+    estimated_minutes = models.IntegerField(default=0)
+    actual_minutes = models.IntegerField(default=0)
+    billable_minutes = models.IntegerField(default=0)
+    entry_count = models.IntegerField(default=0)
+    last_entry_date = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.job_id}: {self.actual_minutes}/{self.estimated_minutes} min"
+
+
+class StaffDaySummary(models.Model):
+    """
+    Minutes logged per staff member per (local) day, split by billable flag.
+    Maintained incrementally by main.summaries alongside the progress rollups.
+    """
+    staff_uuid = NativeUUIDField()
+    day = models.DateField()
+    billable = models.BooleanField()
+    minutes = models.IntegerField(default=0)
+    entry_count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['staff_uuid', 'day', 'billable'], name='staffday_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['day', 'staff_uuid'], name='staffday_day_staff_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.staff_uuid} {self.day} ({'billable' if self.billable else 'non-billable'}): {self.minutes} min"
+
+
+class StaffWeekJobSummary(models.Model):
+    """
+    Minutes logged per staff member per ISO week (keyed by its Monday) per job.
+    Entries without a job number are grouped under ''.
+    """
+    staff_uuid = NativeUUIDField()
+    week_start = models.DateField()
+    job_number = models.CharField(max_length=50, blank=True, default='')
+    minutes = models.IntegerField(default=0)
+    billable_minutes = models.IntegerField(default=0)
+    entry_count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['staff_uuid', 'week_start', 'job_number'], name='staffweekjob_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['week_start', 'job_number'], name='staffweekjob_week_job_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.staff_uuid} w/c {self.week_start} {self.job_number or '-'}: {self.minutes} min"
+
+
+class SearchTerm(models.Model):
+    """
+    Inverted index for the search endpoint: one row per distinct token of a
+    searchable object, weighted by the most important field it appears in.
+    Maintained by main.search from the model signals.
+    """
+    term = models.CharField(max_length=64)
+    kind = models.CharField(max_length=10)  # 'job', 'client', 'contact' or 'staff'
+    object_uuid = NativeUUIDField()
+    weight = models.IntegerField(default=1)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_uuid', 'term'], name='searchterm_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['term', 'kind'], name='searchterm_term_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.term} -> {self.kind} {self.object_uuid} ({self.weight})"
@@ -0,0 +1,66 @@
+# main/renderers.py
+
+"""
+JSON rendering with orjson. Output matches DRF's JSONRenderer (compact,
+UTF-8, \\u2028/\\u2029 escaped): dicts, lists, strings, numbers and UUIDs are
+encoded natively in C, and everything else, including datetimes/dates
+(passed through so they keep DRF's "Z" suffix) and Decimals, goes through
+DRF's own encoder. Indented output (the browsable API, `; indent=` media
+types), payloads orjson rejects, and installs without orjson fall back to
+the stock renderer.
+
+Floats in exponent notation are spelt orjson's way (1e-7, not 1e-07), which
+parses to the same value. Two inputs DRF refuses are rendered instead:
+- NaN and infinite floats come out as null, where JSONRenderer (with
+  STRICT_JSON) raises ValueError.
+- Dict keys are converted to strings as the stdlib does for int, float,
+  bool and None keys, and UUID, date and datetime keys are accepted too
+  (UTC datetimes with "+00:00", not "Z"); JSONRenderer raises TypeError
+  for those.
+"""
+
+import datetime
+import decimal
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # optional speed-up
+    orjson = None
+
+_ORJSON_OPTIONS = (orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+_LINE_SEPARATOR = '\u2028'.encode()
+_PARAGRAPH_SEPARATOR = '\u2029'.encode()
+
+_drf_default = JSONEncoder().default
+
+
+def _default(obj):
+    """DRF's encoding, with the two types list payloads are full of checked first"""
+    obj_type = type(obj)
+    if obj_type is datetime.datetime:
+        representation = obj.isoformat()
+        return representation[:-6] + 'Z' if representation.endswith('+00:00') else representation
+    if obj_type is decimal.Decimal:
+        return float(obj)
+    return _drf_default(obj)
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if orjson is None or self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=_default, option=_ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            # e.g. integers beyond 64 bits, which the stdlib encoder handles
+            return super().render(data, accepted_media_type, renderer_context)
+        # Keep the output a strict JavaScript subset, as JSONRenderer does
+        if _LINE_SEPARATOR in ret or _PARAGRAPH_SEPARATOR in ret:
+            ret = ret.replace(_LINE_SEPARATOR, b'\\u2028').replace(_PARAGRAPH_SEPARATOR, b'\\u2029')
+        return ret
@@ -0,0 +1,250 @@
+# main/reports.py
+
+"""
+Multi-staff reports. Each report fetches its data with a fixed number of
+grouped queries no matter how many staff are in scope; the staff set is
+passed to the database as a subquery, or as a literal list when the report
+has loaded it anyway and it is small enough (see staff_keys).
+"""
+
+from datetime import timedelta
+
+import numpy as np
+from django.db.models import Q, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .models import Staff, JobAssignedStaff, TaskAssignedStaff, Timesheet, StaffDaySummary
+from .summaries import day_bounds, week_start_of
+
+
+def team_staff(profile):
+    """
+    The staff a user may report on: everyone for admins; for managers the
+    staff assigned to the jobs they manage, plus themselves (nobody for a
+    manager not linked to a staff record yet). None for anyone else.
+    """
+    if profile.is_admin:
+        return Staff.objects.all()
+    if profile.is_manager:
+        if profile.staff_uuid is None:
+            # Matching manager_uuid against None would select every unmanaged job
+            return Staff.objects.none()
+        # A team is at most a few hundred people, well inside the parameter limit
+        team = set(
+            JobAssignedStaff.objects.filter(job__manager_uuid=profile.staff_uuid)
+            .values_list('staff_uuid', flat=True)
+        )
+        team.add(profile.staff_uuid)
+        return Staff.objects.filter(uuid__in=team)
+    return None
+
+
+def team_weekly_grid(staff, week_start, weeks=1):
+    """
+    Per-day billable / non-billable hours for every member of `staff` (a Staff
+    queryset) over `weeks` weeks from `week_start` (a Monday), with the
+    weekdays nobody logged time flagged as missing. Billable status comes from
+    the task, as in the single-staff weekly-hours view.
+    """
+    dates = [week_start + timedelta(days=i) for i in range(7 * weeks)]
+    start, end = day_bounds(week_start, days=len(dates))
+
+    members = list(staff.order_by('name').values_list('uuid', 'name'))
+
+    # One grouped query for the whole team
+    totals = {}
+    rows = Timesheet.objects.filter(
+        staff_uuid__in=staff.values('uuid'), entry_date__gte=start, entry_date__lt=end
+    ).annotate(day=TruncDate('entry_date')).values('staff_uuid', 'day').annotate(
+        total_minutes=Coalesce(Sum('minutes'), 0),
+        billable_minutes=Coalesce(Sum('minutes', filter=Q(task__billable=True)), 0),
+    ).order_by()
+    for row in rows:
+        totals[(row['staff_uuid'], row['day'])] = (row['billable_minutes'], row['total_minutes'])
+
+    today = timezone.localdate()
+    grid = []
+    for staff_uuid, name in members:
+        days = []
+        missing = []
+        billable_total = non_billable_total = 0
+        for day in dates:
+            billable, total = totals.get((staff_uuid, day), (0, 0))
+            billable_total += billable
+            non_billable_total += total - billable
+            days.append({
+                'date': day.strftime('%Y-%m-%d'),
+                'billable': billable / 60,
+                'non_billable': (total - billable) / 60,
+                'total': total / 60,
+            })
+            # Weekdays up to today with nothing logged
+            if not total and day.weekday() < 5 and day <= today:
+                missing.append(day.strftime('%Y-%m-%d'))
+        grid.append({
+            'staff_uuid': staff_uuid,
+            'name': name,
+            'days': days,
+            'billable': billable_total / 60,
+            'non_billable': non_billable_total / 60,
+            'total': (billable_total + non_billable_total) / 60,
+            'missing_days': missing,
+        })
+    return grid
+
+
+# Largest staff list sent as literal parameters (SQL Server allows 2100 per query)
+MAX_INLINE_STAFF = 2000
+
+
+def staff_keys(staff, uuids):
+    """
+    What to filter staff_uuid__in by: the already-loaded `uuids` if they fit in
+    the parameter limit (lets the planner seek the staff_uuid indexes), else
+    the `staff` queryset as a subquery.
+    """
+    return list(uuids) if len(uuids) <= MAX_INLINE_STAFF else staff.values('uuid')
+
+
+# A full working day, for the under-filled check
+DEFAULT_DAILY_MINUTES = 450
+
+
+def last_week():
+    """(Monday, Friday) of the previous week"""
+    monday = week_start_of(timezone.localdate()) - timedelta(weeks=1)
+    return monday, monday + timedelta(days=4)
+
+
+def timesheet_gaps(staff, start, end, min_minutes=DEFAULT_DAILY_MINUTES):
+    """
+    Staff in `staff` (a Staff queryset) with weekdays between `start` and
+    `end` (inclusive, capped at today) that have no time logged, or less than
+    `min_minutes`. Two queries: the staff list and the daily totals from
+    StaffDaySummary; staff with no rows at all come out with every day missing.
+    """
+    today = timezone.localdate()
+    workdays = [
+        start + timedelta(days=i) for i in range((min(end, today) - start).days + 1)
+        if (start + timedelta(days=i)).weekday() < 5
+    ]
+
+    members = list(staff.order_by('name').values_list('uuid', 'name', 'email'))
+
+    daily = {}
+    rows = StaffDaySummary.objects.filter(
+        staff_uuid__in=staff.values('uuid'), day__range=[start, end]
+    ).values('staff_uuid', 'day').annotate(total_minutes=Sum('minutes')).order_by()
+    for row in rows:
+        daily[(row['staff_uuid'], row['day'])] = row['total_minutes']
+
+    gaps = []
+    for staff_uuid, name, email in members:
+        missing = []
+        under_filled = []
+        logged = 0
+        for day in workdays:
+            minutes = daily.get((staff_uuid, day), 0)
+            logged += minutes
+            if not minutes:
+                missing.append(day.strftime('%Y-%m-%d'))
+            elif minutes < min_minutes:
+                under_filled.append({'date': day.strftime('%Y-%m-%d'), 'hours': minutes / 60})
+        if missing or under_filled:
+            gaps.append({
+                'staff_uuid': staff_uuid,
+                'name': name,
+                'email': email,
+                'logged_hours': logged / 60,
+                'expected_hours': len(workdays) * min_minutes / 60,
+                'missing_days': missing,
+                'under_filled_days': under_filled,
+            })
+    return gaps
+
+
+def open_allocations(staff_uuids, start, end):
+    """
+    TaskAssignedStaff rows of `staff_uuids` (a list or subquery) on tasks that
+    are still open during the window: the task isn't completed, its job wasn't
+    completed before `start` and didn't start after `end`.
+    """
+    window_start, window_end = day_bounds(start)[0], day_bounds(end)[1]
+    return TaskAssignedStaff.objects.filter(
+        Q(task__job__completed_date__isnull=True) | Q(task__job__completed_date__gte=window_start),
+        Q(task__job__start_date__isnull=True) | Q(task__job__start_date__lt=window_end),
+        staff_uuid__in=staff_uuids,
+        task__completed=False,
+        allocated_minutes__gt=0,
+    )
+
+
+def staff_capacity(staff, start, end, daily_minutes=DEFAULT_DAILY_MINUTES):
+    """
+    Allocated vs logged minutes for every member of `staff` over a window,
+    computed for the whole set at once: one aggregated query per dimension
+    (staff, allocations, time logged against them, time logged in the window),
+    combined with NumPy.
+
+    - allocated_minutes: allocations on open tasks
+    - logged_on_allocated_minutes: what the staff member has logged on those
+      tasks up to the end of the window
+    - remaining_minutes: allocation still to be worked, clamped at zero per
+      task so overruns on one task don't hide work left on another
+    - logged_minutes: everything logged inside the window
+    - capacity_minutes: weekdays in the window x `daily_minutes`
+    """
+    window_start, window_end = day_bounds(start)[0], day_bounds(end)[1]
+    members = list(staff.order_by('name').values_list('uuid', 'name'))
+    index = {staff_uuid: i for i, (staff_uuid, _) in enumerate(members)}
+    count = len(members)
+    staff_uuids = staff_keys(staff, index)
+
+    allocations = open_allocations(staff_uuids, start, end)
+    allocation_rows = list(allocations.values_list('staff_uuid', 'task_id', 'allocated_minutes'))
+
+    logged_on_tasks = Timesheet.objects.filter(
+        staff_uuid__in=staff_uuids,
+        task__in=allocations.values('task'),
+        entry_date__lt=window_end,
+    ).values('staff_uuid', 'task').annotate(total_minutes=Sum('minutes')).order_by()
+    logged_pairs = {(row['staff_uuid'], row['task']): row['total_minutes'] or 0 for row in logged_on_tasks}
+
+    logged_in_window = Timesheet.objects.filter(
+        staff_uuid__in=staff_uuids, entry_date__gte=window_start, entry_date__lt=window_end,
+    ).values('staff_uuid').annotate(total_minutes=Sum('minutes')).order_by()
+
+    # Per-allocation arrays, then scatter-add into per-staff totals
+    alloc_staff = np.fromiter((index[row[0]] for row in allocation_rows), dtype=np.int64, count=len(allocation_rows))
+    allocated = np.fromiter((row[2] for row in allocation_rows), dtype=np.int64, count=len(allocation_rows))
+    logged = np.fromiter(
+        (logged_pairs.get((row[0], row[1]), 0) for row in allocation_rows), dtype=np.int64, count=len(allocation_rows)
+    )
+    allocated_total = np.bincount(alloc_staff, weights=allocated, minlength=count)
+    logged_on_allocated = np.bincount(alloc_staff, weights=logged, minlength=count)
+    remaining = np.bincount(alloc_staff, weights=np.maximum(allocated - logged, 0), minlength=count)
+    open_tasks = np.bincount(alloc_staff, minlength=count)
+
+    window_logged = np.zeros(count, dtype=np.int64)
+    for row in logged_in_window:
+        window_logged[index[row['staff_uuid']]] = row['total_minutes'] or 0
+
+    workdays = sum(1 for i in range((end - start).days + 1) if (start + timedelta(days=i)).weekday() < 5)
+    capacity = workdays * daily_minutes
+
+    return [
+        {
+            'staff_uuid': staff_uuid,
+            'name': name,
+            'open_tasks': int(open_tasks[i]),
+            'allocated_minutes': int(allocated_total[i]),
+            'logged_on_allocated_minutes': int(logged_on_allocated[i]),
+            'remaining_minutes': int(remaining[i]),
+            'logged_minutes': int(window_logged[i]),
+            'capacity_minutes': capacity,
+            'utilisation': round(window_logged[i] / capacity, 4) if capacity else None,
+            'over_allocated': bool(remaining[i] > capacity),
+        }
+        for i, (staff_uuid, name) in enumerate(members)
+    ]
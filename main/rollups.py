@@ -0,0 +1,200 @@
+# main/rollups.py
+
+"""
+Incremental maintenance of the TaskProgress / JobProgress rollups.
+
+Every timesheet write is turned into a delta: the old row's contribution is
+taken out and the new row's put in, with F() expressions so concurrent writers
+don't lose updates. Rows are created lazily from a scratch aggregate the first
+time a task/job is touched. rebuild_progress() recomputes everything (or a
+subset) set-based and is used by `manage.py rebuild_rollups` and the syncs.
+"""
+
+from collections import namedtuple
+
+from django.db import IntegrityError, transaction
+from django.db.models import (
+    Case, Count, DateTimeField, F, Max, OuterRef, Q, Subquery, Sum, Value, When,
+)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Task, Timesheet, TaskProgress, JobProgress
+
+# What a single timesheet row adds to the rollups
+Contribution = namedtuple(
+    'Contribution', 'task_id job_id minutes billable entry_date staff_uuid job_number'
+)
+
+TOTAL_FIELDS = ('actual_minutes', 'billable_minutes', 'entry_count', 'last_entry_date')
+
+
+def contribution(timesheet):
+    # Writers may assign a date string (submit_timesheet does); coerce like the field would
+    entry_date = Timesheet._meta.get_field('entry_date').to_python(timesheet.entry_date)
+    if entry_date is not None and timezone.is_naive(entry_date):
+        entry_date = timezone.make_aware(entry_date)
+    staff_uuid = Timesheet._meta.get_field('staff_uuid').to_python(timesheet.staff_uuid)
+    return Contribution(
+        timesheet.task_id, timesheet.job_id, int(timesheet.minutes or 0),
+        timesheet.billable, entry_date, staff_uuid, timesheet.job_number,
+    )
+
+
+def stored_contribution(pk):
+    """The contribution of the row currently in the database (before an update)"""
+    row = Timesheet.objects.filter(pk=pk).values_list(
+        'task_id', 'job_id', 'minutes', 'billable', 'entry_date', 'staff_uuid', 'job_number'
+    ).first()
+    if row is None:
+        return None
+    task_id, job_id, minutes, billable, entry_date, staff_uuid, job_number = row
+    return Contribution(task_id, job_id, minutes or 0, billable, entry_date, staff_uuid, job_number)
+
+
+def apply_timesheet_change(before, after):
+    """Move `before` out of the rollups and `after` in; either may be None"""
+    for model, key in ((TaskProgress, 'task_id'), (JobProgress, 'job_id')):
+        old_key = getattr(before, key) if before else None
+        new_key = getattr(after, key) if after else None
+        if old_key is not None and old_key == new_key:
+            _adjust(model, old_key, added=after, removed=before)
+        else:
+            if old_key is not None:
+                _adjust(model, old_key, removed=before)
+            if new_key is not None:
+                _adjust(model, new_key, added=after)
+
+
+def refresh_job_estimate(job_id):
+    """Re-sum the task estimates of a job (called when one of its tasks changes)"""
+    estimate = Task.objects.filter(job_id=job_id).aggregate(
+        total=Coalesce(Sum('estimated_minutes'), 0)
+    )['total']
+    if not JobProgress.objects.filter(pk=job_id).update(estimated_minutes=estimate):
+        _create_from_scratch(JobProgress, job_id)
+
+
+def _adjust(model, key, added=None, removed=None):
+    minutes = (added.minutes if added else 0) - (removed.minutes if removed else 0)
+    billable_minutes = (
+        (added.minutes if added and added.billable else 0)
+        - (removed.minutes if removed and removed.billable else 0)
+    )
+    count = (1 if added else 0) - (1 if removed else 0)
+
+    changes = {
+        'actual_minutes': F('actual_minutes') + minutes,
+        'billable_minutes': F('billable_minutes') + billable_minutes,
+        'entry_count': F('entry_count') + count,
+    }
+    if added and added.entry_date:
+        changes['last_entry_date'] = Case(
+            When(Q(last_entry_date__isnull=True) | Q(last_entry_date__lt=added.entry_date),
+                 then=Value(added.entry_date, output_field=DateTimeField())),
+            default=F('last_entry_date'),
+        )
+
+    if not model.objects.filter(pk=key).update(**changes):
+        # First entry for this task/job; the aggregate already includes the new row
+        _create_from_scratch(model, key)
+        return
+
+    if removed and removed.entry_date and not (added and added.entry_date and added.entry_date >= removed.entry_date):
+        # The removed entry may have been the latest one
+        group_field = 'task' if model is TaskProgress else 'job'
+        latest = Timesheet.objects.filter(
+            **{group_field: OuterRef('pk')}, entry_date__isnull=False
+        ).order_by('-entry_date').values('entry_date')[:1]
+        model.objects.filter(pk=key, last_entry_date__lte=removed.entry_date).update(
+            last_entry_date=Subquery(latest)
+        )
+
+
+def _zero_totals(model):
+    totals = {'actual_minutes': 0, 'billable_minutes': 0, 'entry_count': 0, 'last_entry_date': None}
+    if model is JobProgress:
+        totals['estimated_minutes'] = 0
+    return totals
+
+
+def _expected_totals(model, keys=None):
+    """{pk: totals} computed from the raw tables with one grouped query per source"""
+    group_field = 'task' if model is TaskProgress else 'job'
+    timesheets = Timesheet.objects.filter(**{f'{group_field}__isnull': False})
+    if keys is not None:
+        timesheets = timesheets.filter(**{f'{group_field}__in': keys})
+
+    expected = {}
+    for row in timesheets.values(group_field).annotate(
+        actual_minutes=Coalesce(Sum('minutes'), 0),
+        billable_minutes=Coalesce(Sum('minutes', filter=Q(billable=True)), 0),
+        entry_count=Count('pk'),
+        last_entry_date=Max('entry_date'),
+    ):
+        totals = _zero_totals(model)
+        totals.update({field: row[field] for field in TOTAL_FIELDS})
+        expected[row[group_field]] = totals
+
+    if model is JobProgress:
+        tasks = Task.objects.all()
+        if keys is not None:
+            tasks = tasks.filter(job__in=keys)
+        for row in tasks.values('job').annotate(estimate=Coalesce(Sum('estimated_minutes'), 0)):
+            expected.setdefault(row['job'], _zero_totals(model))['estimated_minutes'] = row['estimate']
+    return expected
+
+
+def _create_from_scratch(model, key):
+    totals = _expected_totals(model, [key]).get(key, _zero_totals(model))
+    try:
+        with transaction.atomic():
+            model.objects.create(pk=key, **totals)
+    except IntegrityError:
+        # Created concurrently (or the task/job is being deleted, and there is
+        # nothing to update). That writer may have read its aggregate before
+        # our row committed, while our delta found no row to go into: recount
+        # the row instead of dropping the delta. Adding the delta instead would
+        # count our row twice whenever their aggregate did include it.
+        _recount(model, key)
+
+
+def _recount(model, key):
+    """Reset an existing rollup row to the totals of the rows behind it"""
+    with transaction.atomic():
+        if model.objects.select_for_update().filter(pk=key).exists():
+            totals = _expected_totals(model, [key]).get(key, _zero_totals(model))
+            model.objects.filter(pk=key).update(**totals)
+
+
+def rebuild_progress(task_keys=None, job_keys=None, repair=True):
+    """
+    Compare the rollups against the raw tables and (optionally) fix them.
+    `task_keys`/`job_keys` restrict the check to some tasks/jobs; they can be
+    lists of pks or pk querysets. Returns the number of rows that were wrong.
+    """
+    mismatches = 0
+    for model, keys in ((TaskProgress, task_keys), (JobProgress, job_keys)):
+        expected = _expected_totals(model, keys)
+        existing = model.objects.all()
+        if keys is not None:
+            existing = existing.filter(pk__in=keys)
+        existing = {row.pk: row for row in existing}
+
+        to_create, to_update = [], []
+        for key in expected.keys() | existing.keys():
+            totals = expected.get(key, _zero_totals(model))
+            current = existing.get(key)
+            if current is None:
+                if any(totals.values()):
+                    to_create.append(model(pk=key, **totals))
+            elif any(getattr(current, field) != value for field, value in totals.items()):
+                for field, value in totals.items():
+                    setattr(current, field, value)
+                to_update.append(current)
+
+        mismatches += len(to_create) + len(to_update)
+        if repair:
+            model.objects.bulk_create(to_create, batch_size=500)
+            model.objects.bulk_update(to_update, list(_zero_totals(model)), batch_size=500)
+    return mismatches
@@ -0,0 +1,238 @@
+# main/schedule.py
+
+"""
+Who is booked when: an in-process interval index over job date ranges and
+staff assignments, for the availability and conflict endpoints.
+
+Every JobAssignedStaff row with a dated job becomes an interval
+[start_date, due_date] (or completed_date, if earlier) for that staff
+member. Each staff member gets an IntervalIndex: the intervals sorted by
+start with an implicit max-end tree on top, so "what overlaps [a, b]" is
+answered in O(log n + k) without comparing pairs of jobs.
+
+Like the analytics cube, the index loads lazily and then follows the change
+log. Assignment changes are logged as updates of their job, so re-reading the
+changed jobs and rebuilding only the affected staff members' indexes keeps it
+current after every sync.
+"""
+
+import heapq
+import threading
+import time
+from bisect import bisect_right
+from collections import defaultdict, namedtuple
+
+from django.conf import settings
+from django.utils import timezone
+
+from .changelog import ChangeCursor
+from .models import Job, JobAssignedStaff
+
+Booking = namedtuple('Booking', 'start end job_uuid job_number job_name')
+
+# More pending changes (of any model) than this and a full reload is cheaper
+MAX_INCREMENTAL_CHANGES = 20000
+# Changed jobs re-read per query (keeps the IN list within SQL Server's parameter limit)
+REFRESH_CHUNK_SIZE = 1000
+
+
+class IntervalIndex:
+    """
+    Static interval index: bookings sorted by start, plus a max-end segment
+    tree over that order. An overlap query restricts to the prefix that
+    starts on/before the window end (bisect), then walks only the subtrees
+    whose max end reaches the window start.
+    """
+
+    def __init__(self, bookings):
+        self.bookings = sorted(bookings)
+        self.starts = [booking.start for booking in self.bookings]
+        self.size = 1
+        while self.size < len(self.bookings):
+            self.size *= 2
+        # Leaves at [size, 2 * size); unused leaves hold None
+        self.max_end = [None] * (2 * self.size)
+        for i, booking in enumerate(self.bookings):
+            self.max_end[self.size + i] = booking.end
+        for node in range(self.size - 1, 0, -1):
+            children = [end for end in (self.max_end[2 * node], self.max_end[2 * node + 1]) if end is not None]
+            self.max_end[node] = max(children) if children else None
+
+    def __len__(self):
+        return len(self.bookings)
+
+    def overlapping(self, start, end):
+        """Bookings with booking.start <= end and booking.end >= start, in start order"""
+        limit = bisect_right(self.starts, end)
+        if not limit:
+            return []
+        found = []
+        stack = [(1, 0, self.size)]
+        while stack:
+            node, lo, hi = stack.pop()
+            if lo >= limit or self.max_end[node] is None or self.max_end[node] < start:
+                continue
+            if hi - lo == 1:
+                found.append(self.bookings[lo])
+                continue
+            mid = (lo + hi) // 2
+            # Right child first so results pop out in start order
+            stack.append((2 * node + 1, mid, hi))
+            stack.append((2 * node, lo, mid))
+        return found
+
+
+def conflicts(bookings):
+    """
+    Overlapping pairs among `bookings`, by a sweep over start dates with a
+    heap of the bookings still running: O(n log n + k).
+    """
+    pairs = []
+    running = []
+    for booking in sorted(bookings):
+        while running and running[0][0] < booking.start:
+            heapq.heappop(running)
+        for _, _, other in running:
+            pairs.append((other, booking))
+        heapq.heappush(running, (booking.end, booking.job_uuid, booking))
+    return pairs
+
+
+def _job_booking(job_uuid, job_number, name, start_date, due_date, completed_date):
+    """The date range a job books its staff for, or None if it isn't dated"""
+    ends = [d for d in (due_date, completed_date) if d is not None]
+    if start_date is None or not ends:
+        return None
+    start, end = timezone.localdate(start_date), timezone.localdate(min(ends))
+    if end < start:
+        return None
+    return Booking(start, end, job_uuid, job_number, name)
+
+
+class ScheduleIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.loaded = False
+        self.last_checked = 0.0
+        self.caught_up_to = None
+
+    def _read_jobs(self, jobs):
+        """{job uuid: (Booking or None, {staff_uuid, ...})} for a Job queryset"""
+        bookings = {}
+        for row in jobs.values_list('uuid', 'job_id', 'name', 'start_date', 'due_date', 'completed_date'):
+            bookings[row[0]] = (_job_booking(*row), set())
+        assignments = JobAssignedStaff.objects.filter(job__in=jobs.values('pk')).values_list('job__uuid', 'staff_uuid')
+        for job_uuid, staff_uuid in assignments:
+            if job_uuid in bookings:
+                bookings[job_uuid][1].add(staff_uuid)
+        return bookings
+
+    def _rebuild_staff(self, staff_uuids):
+        for staff_uuid in staff_uuids:
+            bookings = [
+                self.jobs[job_uuid][0] for job_uuid in self.staff_jobs.get(staff_uuid, ())
+                if self.jobs[job_uuid][0] is not None
+            ]
+            if bookings:
+                self.by_staff[staff_uuid] = IntervalIndex(bookings)
+            else:
+                self.by_staff.pop(staff_uuid, None)
+
+    def load(self):
+        with self._lock:
+            self.changes = ChangeCursor()
+            self.jobs = self._read_jobs(Job.objects.all())
+            self.staff_jobs = defaultdict(set)
+            for job_uuid, (_, staff_uuids) in self.jobs.items():
+                for staff_uuid in staff_uuids:
+                    self.staff_jobs[staff_uuid].add(job_uuid)
+            self.by_staff = {}
+            self._rebuild_staff(list(self.staff_jobs))
+            self.loaded = True
+            self.last_checked = time.monotonic()
+
+    def refresh(self):
+        """Re-read the jobs changed (or re-assigned) since the last load/refresh"""
+        with self._lock:
+            changes = self.changes.read(MAX_INCREMENTAL_CHANGES)
+            if changes is None:
+                self.load()
+                return
+            changed_uuids = {row[2] for row in changes if row[1] == 'job'}
+            if changed_uuids:
+                # Changed jobs missing from `fresh` were deleted
+                fresh = {}
+                uuids = sorted(changed_uuids)
+                for start in range(0, len(uuids), REFRESH_CHUNK_SIZE):
+                    chunk = uuids[start:start + REFRESH_CHUNK_SIZE]
+                    fresh.update(self._read_jobs(Job.objects.filter(uuid__in=chunk)))
+
+                affected = set()
+                for job_uuid in changed_uuids:
+                    for staff_uuid in self.jobs.pop(job_uuid, (None, set()))[1]:
+                        self.staff_jobs[staff_uuid].discard(job_uuid)
+                        affected.add(staff_uuid)
+                for job_uuid, (booking, staff_uuids) in fresh.items():
+                    self.jobs[job_uuid] = (booking, staff_uuids)
+                    for staff_uuid in staff_uuids:
+                        self.staff_jobs[staff_uuid].add(job_uuid)
+                        affected.add(staff_uuid)
+                self._rebuild_staff(affected)
+            self.last_checked = time.monotonic()
+
+    def ensure_fresh(self):
+        interval = getattr(settings, 'ANALYTICS_REFRESH_INTERVAL', 2.0)
+        with self._lock:
+            if not self.loaded:
+                self.load()
+            elif time.monotonic() - self.last_checked >= interval:
+                self.refresh()
+
+    def catch_up(self, versions):
+        """Refresh now if the DataVersion `versions` moved (see TimesheetCube.catch_up)"""
+        with self._lock:
+            if not self.loaded:
+                self.load()
+            elif versions != self.caught_up_to:
+                self.refresh()
+            self.caught_up_to = versions
+
+    def availability(self, staff_uuids, start, end):
+        """(free, busy) for `staff_uuids` in [start, end]; busy maps staff_uuid -> overlapping bookings"""
+        with self._lock:
+            free, busy = [], {}
+            for staff_uuid in staff_uuids:
+                index = self.by_staff.get(staff_uuid)
+                bookings = index.overlapping(start, end) if index else []
+                if bookings:
+                    busy[staff_uuid] = bookings
+                else:
+                    free.append(staff_uuid)
+            return free, busy
+
+    def conflicts(self, staff_uuids, start, end):
+        """{staff_uuid: [(booking, booking), ...]} for overlapping assignments within [start, end]"""
+        with self._lock:
+            found = {}
+            for staff_uuid in staff_uuids:
+                index = self.by_staff.get(staff_uuid)
+                if index is None or len(index) < 2:
+                    continue
+                pairs = conflicts(index.overlapping(start, end))
+                if pairs:
+                    found[staff_uuid] = pairs
+            return found
+
+
+_schedule = ScheduleIndex()
+
+
+def get_schedule():
+    """The process-wide schedule index, loaded on first use and kept up to date with the change log"""
+    _schedule.ensure_fresh()
+    return _schedule
+
+
+def catch_up(versions):
+    """Bring the process-wide schedule index up to the DataVersion `versions`"""
+    _schedule.catch_up(versions)
@@ -0,0 +1,248 @@
+# main/search.py
+
+"""
+Server-side search over jobs, clients, contacts and staff, backed by the
+SearchTerm inverted index.
+
+Each searchable object is split into lower-case word tokens; every distinct
+token becomes one SearchTerm row weighted by the most important field it
+appears in (a job number outranks a word in the description). Phone numbers
+are also indexed as a single digits-only token and e-mail addresses whole, so
+"0215551234" and "jo@example.com" find what they look like.
+
+The index is kept current by the model signals (index_object /
+remove_object, which only write the tokens that changed, so a sync re-saving
+unchanged rows costs one read each) and can be rebuilt from scratch with
+`manage.py rebuild_search_index`.
+
+A query matches objects that have every query token as a prefix of one of
+their terms. The score adds up the best weight per query token, counting
+exact matches twice; it is computed with one grouped query that seeks the
+(term, kind) index.
+"""
+
+import re
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Max, Q, Value, When
+
+from .models import Job, Client, Contact, Staff, SearchTerm
+
+# Fields indexed per kind and the weight of a token found in each
+SEARCH_FIELDS = {
+    'job': (Job, {'job_id': 10, 'name': 6, 'description': 1}),
+    'client': (Client, {
+        'name': 8, 'email': 4, 'phone': 4,
+        'address': 2, 'city': 2, 'region': 2, 'post_code': 2, 'country': 1,
+        'postal_address': 1, 'postal_city': 1, 'postal_region': 1, 'postal_post_code': 1, 'postal_country': 1,
+    }),
+    'contact': (Contact, {'name': 8, 'email': 5, 'phone': 5, 'mobile': 5, 'position': 1}),
+    'staff': (Staff, {'name': 8, 'email': 5, 'phone': 5, 'mobile': 5}),
+}
+
+SEARCH_KINDS = tuple(SEARCH_FIELDS)
+
+PHONE_FIELDS = {'phone', 'mobile', 'fax'}
+
+MAX_TERM_LENGTH = SearchTerm._meta.get_field('term').max_length
+
+# Query tokens beyond this are ignored
+MAX_QUERY_TERMS = 6
+
+BATCH_SIZE = 1000
+
+_TOKEN = re.compile(r'\w+')
+
+
+def tokenize(text):
+    """Lower-case word tokens of `text`, in order, truncated to the indexed length"""
+    if not text:
+        return []
+    return [token[:MAX_TERM_LENGTH] for token in _TOKEN.findall(str(text).lower())]
+
+
+def document_terms(kind, values):
+    """{term: weight} for an object of `kind` given its {field: value}"""
+    terms = {}
+    for field, weight in SEARCH_FIELDS[kind][1].items():
+        value = values.get(field)
+        if not value:
+            continue
+        tokens = tokenize(value)
+        if field in PHONE_FIELDS:
+            digits = ''.join(ch for ch in str(value) if ch.isdigit())
+            if digits:
+                tokens.append(digits[:MAX_TERM_LENGTH])
+        elif field == 'email':
+            tokens.append(str(value).strip().lower()[:MAX_TERM_LENGTH])
+        for token in tokens:
+            if weight > terms.get(token, 0):
+                terms[token] = weight
+    return terms
+
+
+def _object_uuid(model, instance):
+    # Normalise whatever the sync assigned (hyphenless, upper case, ...)
+    return model._meta.get_field('uuid').to_python(instance.uuid)
+
+
+def index_object(instance):
+    """Bring the index rows of a saved Job/Client/Contact/Staff in line with its fields"""
+    kind = instance._meta.model_name
+    model, fields = SEARCH_FIELDS[kind]
+    if instance.uuid is None:
+        return
+    object_uuid = _object_uuid(model, instance)
+    terms = document_terms(kind, {field: getattr(instance, field) for field in fields})
+
+    with transaction.atomic():
+        existing = dict(
+            SearchTerm.objects.filter(kind=kind, object_uuid=object_uuid).values_list('term', 'weight')
+        )
+        stale = [term for term in existing if term not in terms]
+        if stale:
+            SearchTerm.objects.filter(kind=kind, object_uuid=object_uuid, term__in=stale).delete()
+        for term, weight in terms.items():
+            if term in existing and existing[term] != weight:
+                SearchTerm.objects.filter(kind=kind, object_uuid=object_uuid, term=term).update(weight=weight)
+        SearchTerm.objects.bulk_create(
+            [
+                SearchTerm(term=term, kind=kind, object_uuid=object_uuid, weight=weight)
+                for term, weight in terms.items() if term not in existing
+            ],
+            batch_size=BATCH_SIZE,
+        )
+
+
+def remove_object(instance):
+    kind = instance._meta.model_name
+    if instance.uuid is not None:
+        SearchTerm.objects.filter(kind=kind, object_uuid=_object_uuid(SEARCH_FIELDS[kind][0], instance)).delete()
+
+
+def rebuild_search_index(kinds=SEARCH_KINDS):
+    """Re-create the index rows of `kinds` from their tables; returns {kind: rows written}"""
+    written = {}
+    for kind in kinds:
+        model, fields = SEARCH_FIELDS[kind]
+        names = ['uuid', *fields]
+        with transaction.atomic():
+            SearchTerm.objects.filter(kind=kind).delete()
+            batch = []
+            written[kind] = 0
+            rows = model.objects.exclude(uuid__isnull=True).values_list(*names).iterator(chunk_size=BATCH_SIZE)
+            for row in rows:
+                values = dict(zip(names, row))
+                for term, weight in document_terms(kind, values).items():
+                    batch.append(SearchTerm(term=term, kind=kind, object_uuid=values['uuid'], weight=weight))
+                if len(batch) >= BATCH_SIZE:
+                    SearchTerm.objects.bulk_create(batch)
+                    written[kind] += len(batch)
+                    batch = []
+            SearchTerm.objects.bulk_create(batch)
+            written[kind] += len(batch)
+    return written
+
+
+def ranked_matches(query, kinds=SEARCH_KINDS):
+    """
+    (kind, object_uuid, score) rows of the objects matching every token of
+    `query`, best first, as a queryset to slice for paging. None if the query
+    has no tokens.
+    """
+    terms = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+    if not terms:
+        return None
+
+    matches = SearchTerm.objects.filter(kind__in=kinds)
+    any_term = Q()
+    for term in terms:
+        any_term |= Q(term__startswith=term)
+    matches = matches.filter(any_term).values('kind', 'object_uuid')
+
+    # Best weight per query token (prefix and exact), per object
+    aggregates = {}
+    for i, term in enumerate(terms):
+        aggregates[f'prefix_{i}'] = Max(Case(
+            When(term__startswith=term, then=F('weight')), default=Value(0), output_field=IntegerField(),
+        ))
+        aggregates[f'exact_{i}'] = Max(Case(
+            When(term=term, then=F('weight')), default=Value(0), output_field=IntegerField(),
+        ))
+    matches = matches.annotate(**aggregates).filter(**{f'prefix_{i}__gt': 0 for i in range(len(terms))})
+
+    score = Value(0)
+    for name in aggregates:
+        score = score + F(name)
+    return matches.annotate(score=score).values_list('kind', 'object_uuid', 'score').order_by(
+        '-score', 'kind', 'object_uuid'
+    )
+
+
+def _full_address(*parts):
+    return ', '.join(filter(None, parts))
+
+
+def describe(matches):
+    """
+    Search results for a page of (kind, object_uuid, score) rows, in the same
+    order: one query per kind present on the page.
+    """
+    by_kind = {}
+    for kind, object_uuid, _ in matches:
+        by_kind.setdefault(kind, []).append(object_uuid)
+
+    found = {}
+    if 'job' in by_kind:
+        for job in Job.objects.filter(uuid__in=by_kind['job']).values(
+            'uuid', 'id', 'job_id', 'name', 'client__name', 'state', 'due_date'
+        ):
+            found[('job', job['uuid'])] = {
+                'id': job['id'],
+                'job_number': job['job_id'],
+                'name': job['name'],
+                'client_name': job['client__name'] or 'Unknown Client',
+                'status': job['state'],
+                'due_date': job['due_date'],
+            }
+    if 'client' in by_kind:
+        for client in Client.objects.filter(uuid__in=by_kind['client']).values(
+            'uuid', 'name', 'is_archived', 'phone', 'email', 'address', 'city', 'region', 'post_code', 'country'
+        ):
+            found[('client', client['uuid'])] = {
+                'name': client['name'],
+                'status': 'Archived' if client['is_archived'] else 'Active',
+                'phone': client['phone'],
+                'email': client['email'],
+                'address': _full_address(
+                    client['address'], client['city'], client['region'], client['post_code'], client['country']
+                ),
+            }
+    if 'contact' in by_kind:
+        for contact in Contact.objects.filter(uuid__in=by_kind['contact']).values(
+            'uuid', 'name', 'client__uuid', 'client__name', 'phone', 'mobile', 'email'
+        ):
+            found[('contact', contact['uuid'])] = {
+                'name': contact['name'],
+                'client_uuid': contact['client__uuid'],
+                'client': contact['client__name'],
+                'phone': contact['phone'],
+                'mobile': contact['mobile'],
+                'email': contact['email'],
+            }
+    if 'staff' in by_kind:
+        for staff in Staff.objects.filter(uuid__in=by_kind['staff']).values('uuid', 'name', 'email', 'phone', 'mobile'):
+            found[('staff', staff['uuid'])] = {
+                'name': staff['name'],
+                'email': staff['email'],
+                'phone': staff['phone'],
+                'mobile': staff['mobile'],
+            }
+
+    results = []
+    for kind, object_uuid, score in matches:
+        # Rows deleted since they were indexed are skipped
+        details = found.get((kind, object_uuid))
+        if details is not None:
+            results.append({'type': kind, 'uuid': object_uuid, 'score': score, **details})
+    return results
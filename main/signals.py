@@ -0,0 +1,125 @@
+# main/signals.py
+
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import pre_save, post_save, post_delete
+
+from . import metrics, rollups, search, summaries
+from .models import (
+    Staff, Job, Task, JobAssignedStaff, TaskAssignedStaff, Client, Contact, Timesheet,
+    DataVersion, ChangeLog,
+)
+
+# Models whose writes invalidate cached API responses (see utils.conditional_on)
+VERSIONED_MODELS = (
+    Staff, Job, Task, JobAssignedStaff, TaskAssignedStaff, Client, Contact, Timesheet,
+)
+
+# Models exposed through the changes feed
+LOGGED_MODELS = (Job, Task, Client, Contact, Timesheet)
+
+# Models indexed for the search endpoint (see main.search)
+SEARCHED_MODELS = (Job, Client, Contact, Staff)
+
+
+def bump_data_version(sender, **kwargs):
+    DataVersion.bump(sender._meta.model_name)
+
+
+def log_change(sender, instance, created=False, **kwargs):
+    if instance.uuid is None:
+        return
+    if kwargs.get('signal') is post_delete:
+        action = 'DELETE'
+    else:
+        action = 'CREATE' if created else 'UPDATE'
+    ChangeLog.objects.create(
+        model_name=sender._meta.model_name,
+        # Normalise whatever the sync assigned (hyphenless, upper case, ...)
+        object_uuid=str(sender._meta.get_field('uuid').to_python(instance.uuid)),
+        action=action,
+        staff_uuid=instance.staff_uuid if sender is Timesheet else None,
+    )
+
+
+def log_assignment_change(sender, instance, **kwargs):
+    """Staff assignments are part of their job/task, so log them as an update of the parent"""
+    parent_model = Job if sender is JobAssignedStaff else Task
+    parent_id = instance.job_id if sender is JobAssignedStaff else instance.task_id
+    parent_uuid = parent_model.objects.filter(pk=parent_id).values_list('uuid', flat=True).first()
+    if parent_uuid is not None:
+        ChangeLog.objects.create(
+            model_name=parent_model._meta.model_name,
+            object_uuid=str(parent_uuid),
+            action='UPDATE',
+        )
+
+
+def update_search_index(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_object(instance)
+
+
+def remove_from_search_index(sender, instance, **kwargs):
+    search.remove_object(instance)
+
+
+def snapshot_timesheet(sender, instance, raw=False, **kwargs):
+    """Remember what an existing row contributed before it is overwritten"""
+    if not raw:
+        instance._rollup_before = None if instance._state.adding else rollups.stored_contribution(instance.pk)
+
+
+def update_rollups_on_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        before, after = getattr(instance, '_rollup_before', None), rollups.contribution(instance)
+        rollups.apply_timesheet_change(before, after)
+        summaries.apply_timesheet_change(before, after)
+        instance._rollup_before = None
+
+
+def update_rollups_on_delete(sender, instance, **kwargs):
+    before = rollups.contribution(instance)
+    rollups.apply_timesheet_change(before, None)
+    summaries.apply_timesheet_change(before, None)
+
+
+def update_job_estimate(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    job_id = instance.job_id
+
+    def refresh():
+        if Job.objects.filter(pk=job_id).exists():
+            rollups.refresh_job_estimate(job_id)
+
+    # Deferred so a task deleted as part of deleting its job doesn't recreate the job's rollup
+    transaction.on_commit(refresh)
+
+
+for model in LOGGED_MODELS:
+    post_save.connect(log_change, sender=model, dispatch_uid=f'change_log_save_{model.__name__}')
+    post_delete.connect(log_change, sender=model, dispatch_uid=f'change_log_delete_{model.__name__}')
+
+for model in (JobAssignedStaff, TaskAssignedStaff):
+    post_save.connect(log_assignment_change, sender=model, dispatch_uid=f'change_log_save_{model.__name__}')
+    post_delete.connect(log_assignment_change, sender=model, dispatch_uid=f'change_log_delete_{model.__name__}')
+
+# After the change log: a version bump can then only be seen once the change
+# it counts can be read from the log (see TimesheetCube.catch_up)
+for model in VERSIONED_MODELS:
+    post_save.connect(bump_data_version, sender=model, dispatch_uid=f'data_version_save_{model.__name__}')
+    post_delete.connect(bump_data_version, sender=model, dispatch_uid=f'data_version_delete_{model.__name__}')
+
+for model in SEARCHED_MODELS:
+    post_save.connect(update_search_index, sender=model, dispatch_uid=f'search_save_{model.__name__}')
+    post_delete.connect(remove_from_search_index, sender=model, dispatch_uid=f'search_delete_{model.__name__}')
+
+pre_save.connect(snapshot_timesheet, sender=Timesheet, dispatch_uid='rollups_snapshot_timesheet')
+post_save.connect(update_rollups_on_save, sender=Timesheet, dispatch_uid='rollups_save_timesheet')
+post_delete.connect(update_rollups_on_delete, sender=Timesheet, dispatch_uid='rollups_delete_timesheet')
+post_save.connect(update_job_estimate, sender=Task, dispatch_uid='rollups_save_task')
+post_delete.connect(update_job_estimate, sender=Task, dispatch_uid='rollups_delete_task')
+
+# Per-request query timing (see main.metrics)
+connection_created.connect(metrics.install_query_recorder, dispatch_uid='query_metrics_recorder')
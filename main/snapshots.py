@@ -0,0 +1,218 @@
+# main/snapshots.py
+
+"""
+Columnar snapshots of the timesheet history and its dimension tables for the
+BI team, so analytics can run on files instead of the production database.
+
+Layout under the output directory:
+
+    timesheet/month=YYYY-MM/part-0.<ext>   one partition per month of entry_date
+    timesheet/month=unknown/part-0.<ext>   entries without a date
+    job.<ext>, task.<ext>, client.<ext>, staff.<ext>
+    _manifest.json                         what each partition was written from
+
+Parquet files are zstd compressed; Arrow IPC files are uncompressed by
+default so they can be memory-mapped without a copy. Dimension tables are
+small and rewritten on every run. Timesheet partitions are only rewritten
+when new, when their row count / minute total changed, or when one of their
+rows shows up in the change log since the previous run.
+
+Requires pyarrow (an optional dependency, only needed for this export).
+"""
+
+import json
+import os
+from datetime import datetime
+
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+from django.db.models import Count, Sum
+from django.db.models.functions import Coalesce, TruncMonth
+from django.utils import timezone
+
+from .models import Timesheet, Job, Task, Client, Staff, ChangeLog
+
+DIMENSION_MODELS = (Job, Task, Client, Staff)
+
+FORMATS = ('parquet', 'arrow')
+
+# Rows per record batch written (bounds memory per partition)
+BATCH_SIZE = 50000
+
+UNKNOWN_MONTH = 'unknown'
+
+_ARROW_TYPES = {
+    'AutoField': pa.int64(),
+    'BigAutoField': pa.int64(),
+    'IntegerField': pa.int64(),
+    'BigIntegerField': pa.int64(),
+    'BooleanField': pa.bool_(),
+    'FloatField': pa.float64(),
+    'DateField': pa.date32(),
+    'DateTimeField': pa.timestamp('us', tz='UTC'),
+    'UUIDField': pa.string(),
+}
+
+
+def _arrow_type(field):
+    if field.is_relation:
+        field = field.target_field
+    internal_type = field.get_internal_type()
+    if internal_type == 'DecimalField':
+        return pa.decimal128(field.max_digits, field.decimal_places)
+    return _ARROW_TYPES.get(internal_type, pa.string())
+
+
+def table_schema(model):
+    """Arrow schema with one column per concrete model field"""
+    return pa.schema([
+        pa.field(field.attname, _arrow_type(field), nullable=True)
+        for field in model._meta.concrete_fields
+    ])
+
+
+def _batches(queryset, schema):
+    """Record batches of at most BATCH_SIZE rows, read with a chunked iterator"""
+    names = schema.names
+    # UUIDs come back from the ORM as uuid.UUID
+    string_columns = {i for i, field in enumerate(schema) if field.type == pa.string()}
+
+    def to_batch(rows):
+        columns = list(zip(*rows))
+        arrays = []
+        for i, field in enumerate(schema):
+            values = columns[i]
+            if i in string_columns:
+                values = [None if value is None else str(value) for value in values]
+            arrays.append(pa.array(values, type=field.type))
+        return pa.record_batch(arrays, schema=schema)
+
+    rows = []
+    for row in queryset.values_list(*names).iterator(chunk_size=5000):
+        rows.append(row)
+        if len(rows) >= BATCH_SIZE:
+            yield to_batch(rows)
+            rows = []
+    if rows:
+        yield to_batch(rows)
+
+
+def write_table(path, queryset, schema, file_format, compression=None):
+    """Write `queryset` to `path` batch by batch, atomically replacing any previous file"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    rows = 0
+    if file_format == 'parquet':
+        with pq.ParquetWriter(tmp_path, schema, compression=compression or 'zstd') as writer:
+            for batch in _batches(queryset, schema):
+                writer.write_batch(batch)
+                rows += batch.num_rows
+    else:
+        options = ipc.IpcWriteOptions(compression=compression)
+        with pa.OSFile(tmp_path, 'wb') as sink, ipc.new_file(sink, schema, options=options) as writer:
+            for batch in _batches(queryset, schema):
+                writer.write_batch(batch)
+                rows += batch.num_rows
+    os.replace(tmp_path, path)
+    return rows
+
+
+def read_table(path):
+    """Load a snapshot file memory-mapped (zero-copy for uncompressed Arrow IPC)"""
+    if path.endswith('.parquet'):
+        return pq.read_table(path, memory_map=True)
+    with pa.memory_map(path, 'r') as source:
+        return ipc.open_file(source).read_all()
+
+
+def _month_key(month):
+    return month.strftime('%Y-%m') if month else UNKNOWN_MONTH
+
+
+def _month_bounds(key):
+    start = timezone.make_aware(datetime.strptime(key, '%Y-%m'))
+    end = start.replace(year=start.year + 1, month=1) if start.month == 12 else start.replace(month=start.month + 1)
+    return start, end
+
+
+def month_fingerprints():
+    """{month key: [row count, minute total]} for the whole Timesheet table, in one query"""
+    rows = Timesheet.objects.annotate(month=TruncMonth('entry_date')).values('month').annotate(
+        rows=Count('pk'), total_minutes=Coalesce(Sum('minutes'), 0),
+    ).order_by()
+    return {_month_key(row['month']): [row['rows'], row['total_minutes']] for row in rows}
+
+
+def changed_months(since_seq):
+    """Months containing timesheets created or updated after change-log position `since_seq`"""
+    changed = ChangeLog.objects.filter(seq__gt=since_seq, model_name='timesheet').exclude(action='DELETE')
+    months = Timesheet.objects.filter(uuid__in=changed.values('object_uuid')).annotate(
+        month=TruncMonth('entry_date')
+    ).values_list('month', flat=True).distinct()
+    return {_month_key(month) for month in months}
+
+
+def export_snapshots(output_dir, file_format='parquet', compression=None, full=False, log=print):
+    """
+    Write the dimension tables and the new/changed timesheet partitions to
+    `output_dir`. Returns {'dimensions': {...}, 'partitions': {...}} with the
+    row counts written.
+    """
+    extension = file_format
+    manifest_path = os.path.join(output_dir, '_manifest.json')
+    manifest = {}
+    if not full and os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest.get('format') != file_format:
+            manifest = {}
+
+    # Note the change-log head first, so anything written during the export is picked up next time
+    head_seq = ChangeLog.objects.order_by('-seq').values_list('seq', flat=True).first() or 0
+
+    written = {'dimensions': {}, 'partitions': {}}
+    for model in DIMENSION_MODELS:
+        name = model._meta.model_name
+        path = os.path.join(output_dir, f'{name}.{extension}')
+        written['dimensions'][name] = write_table(
+            path, model.objects.order_by('pk'), table_schema(model), file_format, compression
+        )
+        log(f"{name}: {written['dimensions'][name]} rows")
+
+    schema = table_schema(Timesheet)
+    fingerprints = month_fingerprints()
+    previous = manifest.get('partitions', {})
+    stale = changed_months(manifest['change_seq']) if 'change_seq' in manifest else set(fingerprints)
+
+    for month, fingerprint in sorted(fingerprints.items()):
+        path = os.path.join(output_dir, 'timesheet', f'month={month}', f'part-0.{extension}')
+        if previous.get(month) == fingerprint and month not in stale and os.path.exists(path):
+            continue
+        if month == UNKNOWN_MONTH:
+            rows = Timesheet.objects.filter(entry_date__isnull=True)
+        else:
+            start, end = _month_bounds(month)
+            rows = Timesheet.objects.filter(entry_date__gte=start, entry_date__lt=end)
+        written['partitions'][month] = write_table(
+            path, rows.order_by('entry_date', 'uuid'), schema, file_format, compression
+        )
+        log(f"timesheet month={month}: {written['partitions'][month]} rows")
+
+    # Months that no longer have any timesheets
+    for month in set(previous) - set(fingerprints):
+        path = os.path.join(output_dir, 'timesheet', f'month={month}', f'part-0.{extension}')
+        if os.path.exists(path):
+            os.remove(path)
+        log(f"timesheet month={month}: removed")
+
+    manifest = {
+        'format': file_format,
+        'change_seq': head_seq,
+        'exported_at': timezone.now().isoformat(),
+        'partitions': fingerprints,
+    }
+    with open(f'{manifest_path}.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(f'{manifest_path}.tmp', manifest_path)
+    return written
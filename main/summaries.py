@@ -0,0 +1,212 @@
+# main/summaries.py
+
+"""
+Materialized timesheet summaries for reports and dashboards.
+
+StaffDaySummary holds minutes per (staff, local day, billable) and
+StaffWeekJobSummary minutes per (staff, ISO week, job). They are keyed on the
+inline staff_uuid / job_number columns, which the syncs always fill in, so
+they don't depend on the foreign keys being linked yet.
+
+Like main.rollups, every timesheet write is applied as a delta from the
+timesheet signals; rebuild_summaries() recomputes them from the raw table and
+backs `manage.py rebuild_rollups`.
+"""
+
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .models import Timesheet, StaffDaySummary, StaffWeekJobSummary
+
+
+def week_start_of(day):
+    """Monday of the ISO week containing `day`"""
+    return day - timedelta(days=day.weekday())
+
+
+def day_bounds(first_day, days=1):
+    """[start, end) datetimes covering `days` local days from `first_day`"""
+    start = timezone.make_aware(datetime.combine(first_day, time.min))
+    return start, start + timedelta(days=days)
+
+
+def _keys(contribution):
+    """(day key, week key) a contribution is counted under, or None if it isn't summarised"""
+    if contribution is None or contribution.staff_uuid is None or contribution.entry_date is None:
+        return None
+    day = timezone.localdate(contribution.entry_date)
+    return (
+        (contribution.staff_uuid, day, bool(contribution.billable)),
+        (contribution.staff_uuid, week_start_of(day), contribution.job_number or ''),
+    )
+
+
+def apply_timesheet_change(before, after):
+    """Move `before` out of the summaries and `after` in; either may be None"""
+    day_deltas = defaultdict(lambda: [0, 0])
+    week_deltas = defaultdict(lambda: [0, 0, 0])
+    for contribution, sign in ((before, -1), (after, 1)):
+        keys = _keys(contribution)
+        if keys is None:
+            continue
+        day_key, week_key = keys
+        minutes = contribution.minutes * sign
+        day_deltas[day_key][0] += minutes
+        day_deltas[day_key][1] += sign
+        week_deltas[week_key][0] += minutes
+        week_deltas[week_key][1] += minutes if contribution.billable else 0
+        week_deltas[week_key][2] += sign
+
+    for (staff_uuid, day, billable), (minutes, count) in day_deltas.items():
+        if minutes or count:
+            _adjust(
+                StaffDaySummary, {'staff_uuid': staff_uuid, 'day': day, 'billable': billable},
+                {'minutes': minutes, 'entry_count': count},
+            )
+    for (staff_uuid, week_start, job_number), (minutes, billable_minutes, count) in week_deltas.items():
+        if minutes or billable_minutes or count:
+            _adjust(
+                StaffWeekJobSummary, {'staff_uuid': staff_uuid, 'week_start': week_start, 'job_number': job_number},
+                {'minutes': minutes, 'billable_minutes': billable_minutes, 'entry_count': count},
+            )
+
+
+def _adjust(model, key, deltas):
+    rows = model.objects.filter(**key)
+    if not rows.update(**{field: F(field) + delta for field, delta in deltas.items()}):
+        # No row: the first entry in this bucket, or a bucket the summaries never
+        # had (e.g. rows written before a backfill). Count it from the timesheets,
+        # which already reflect this change; nothing is created for an empty one
+        _create_from_scratch(model, key)
+        return
+    if deltas['entry_count'] < 0:
+        rows.filter(entry_count__lte=0).delete()
+
+
+def _source_rows(model, key):
+    """The timesheets that make up one summary row"""
+    if model is StaffDaySummary:
+        start, end = day_bounds(key['day'])
+        return Timesheet.objects.filter(
+            staff_uuid=key['staff_uuid'], entry_date__gte=start, entry_date__lt=end, billable=key['billable'],
+        )
+    start, end = day_bounds(key['week_start'], days=7)
+    rows = Timesheet.objects.filter(staff_uuid=key['staff_uuid'], entry_date__gte=start, entry_date__lt=end)
+    if key['job_number']:
+        return rows.filter(job_number=key['job_number'])
+    return rows.filter(Q(job_number__isnull=True) | Q(job_number=''))
+
+
+def _totals(model, key):
+    """A summary row's totals computed from the timesheets behind it"""
+    aggregate = _source_rows(model, key).aggregate(
+        total_minutes=Coalesce(Sum('minutes'), 0),
+        total_billable=Coalesce(Sum('minutes', filter=Q(billable=True)), 0),
+        entries=Count('pk'),
+    )
+    totals = {'minutes': aggregate['total_minutes'], 'entry_count': aggregate['entries']}
+    if model is StaffWeekJobSummary:
+        totals['billable_minutes'] = aggregate['total_billable']
+    return totals
+
+
+def _create_from_scratch(model, key):
+    totals = _totals(model, key)
+    if not totals['entry_count']:
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**key, **totals)
+    except IntegrityError:
+        # Created concurrently. That writer may have read its aggregate before
+        # our row committed, while our delta found no row to go into: recount
+        # the row (see main.rollups._create_from_scratch)
+        _recount(model, key)
+
+
+def _recount(model, key):
+    """Reset an existing summary row to the totals of the timesheets behind it"""
+    with transaction.atomic():
+        rows = model.objects.filter(**key)
+        if rows.select_for_update().exists():
+            totals = _totals(model, key)
+            if totals['entry_count']:
+                rows.update(**totals)
+            else:
+                rows.delete()
+
+
+def _expected_summaries(staff_uuids=None):
+    """({day key: totals}, {week key: totals}) from one grouped query over Timesheet"""
+    timesheets = Timesheet.objects.filter(staff_uuid__isnull=False, entry_date__isnull=False)
+    if staff_uuids is not None:
+        timesheets = timesheets.filter(staff_uuid__in=staff_uuids)
+    grouped = timesheets.annotate(day=TruncDate('entry_date')).values(
+        'staff_uuid', 'day', 'billable', 'job_number'
+    ).annotate(
+        total_minutes=Coalesce(Sum('minutes'), 0),
+        entries=Count('pk'),
+    ).order_by()
+
+    days = defaultdict(lambda: {'minutes': 0, 'entry_count': 0})
+    weeks = defaultdict(lambda: {'minutes': 0, 'billable_minutes': 0, 'entry_count': 0})
+    for row in grouped.iterator():
+        day_totals = days[(row['staff_uuid'], row['day'], row['billable'])]
+        day_totals['minutes'] += row['total_minutes']
+        day_totals['entry_count'] += row['entries']
+
+        week_totals = weeks[(row['staff_uuid'], week_start_of(row['day']), row['job_number'] or '')]
+        week_totals['minutes'] += row['total_minutes']
+        week_totals['billable_minutes'] += row['total_minutes'] if row['billable'] else 0
+        week_totals['entry_count'] += row['entries']
+    return days, weeks
+
+
+def _reconcile(model, key_fields, total_fields, expected, staff_uuids, repair):
+    existing = model.objects.all()
+    if staff_uuids is not None:
+        existing = existing.filter(staff_uuid__in=staff_uuids)
+    existing = {tuple(getattr(row, field) for field in key_fields): row for row in existing}
+
+    to_create, to_update = [], []
+    for key, totals in expected.items():
+        current = existing.pop(key, None)
+        if current is None:
+            to_create.append(model(**dict(zip(key_fields, key)), **totals))
+        elif any(getattr(current, field) != value for field, value in totals.items()):
+            for field, value in totals.items():
+                setattr(current, field, value)
+            to_update.append(current)
+    # Whatever is left has no timesheets behind it any more
+    to_delete = [row.pk for row in existing.values()]
+
+    if repair:
+        model.objects.bulk_create(to_create, batch_size=500)
+        model.objects.bulk_update(to_update, total_fields, batch_size=500)
+        for start in range(0, len(to_delete), 1000):
+            model.objects.filter(pk__in=to_delete[start:start + 1000]).delete()
+    return len(to_create) + len(to_update) + len(to_delete)
+
+
+def rebuild_summaries(staff_uuids=None, repair=True):
+    """
+    Compare the summary tables against Timesheet and (optionally) fix them.
+    `staff_uuids` restricts the check to some staff. Returns the number of
+    rows that were missing, wrong or stale.
+    """
+    days, weeks = _expected_summaries(staff_uuids)
+    return (
+        _reconcile(
+            StaffDaySummary, ('staff_uuid', 'day', 'billable'), ('minutes', 'entry_count'),
+            days, staff_uuids, repair,
+        )
+        + _reconcile(
+            StaffWeekJobSummary, ('staff_uuid', 'week_start', 'job_number'),
+            ('minutes', 'billable_minutes', 'entry_count'), weeks, staff_uuids, repair,
+        )
+    )
@@ -0,0 +1,166 @@
+# main/synthetic.py
+
+"""
+Synthetic data at a configurable scale, for load tests and the performance
+regression tests: staff, clients with contacts, jobs with tasks and
+assignments, and timesheets for every working day of the history.
+
+Rows are bulk-inserted (bypassing the signals), timesheets a batch at a
+time so years of history don't sit in memory; the rollup/summary tables and
+the search index are then rebuilt set-based. Nothing bumps the data
+versions: a server already running keeps its ETags (see
+`manage.py generate_synthetic_data`). Everything is derived from
+`seed`, so the same arguments give the same data.
+"""
+
+import random
+import uuid
+from datetime import datetime, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+from .models import (
+    Staff, Client, Contact, Job, Task, JobAssignedStaff, TaskAssignedStaff, Timesheet, UserProfile,
+)
+from .rollups import rebuild_progress
+from .search import rebuild_search_index
+from .summaries import rebuild_summaries
+
+# Minutes logged on a working day, split across the day's entries
+DAY_LENGTHS = (240, 360, 420, 450, 480, 480, 510)
+
+CITIES = ('Auckland', 'Wellington', 'Christchurch', 'Hamilton', 'Tauranga', 'Dunedin')
+
+
+def _uuid(rng):
+    return uuid.UUID(int=rng.getrandbits(128))
+
+
+def _split(rng, minutes, parts):
+    """`minutes` split into `parts` positive amounts, in quarter hours where possible"""
+    quarters = max(minutes // 15, parts)
+    cuts = sorted(rng.sample(range(1, quarters), parts - 1)) if parts > 1 else []
+    return [(end - start) * 15 for start, end in zip([0] + cuts, cuts + [quarters])]
+
+
+def generate(staff_count=20, client_count=50, contacts_per_client=2, jobs_per_client=3, tasks_per_job=3,
+             staff_per_job=1, days_of_history=120, entries_per_day=1, absence_rate=0.0,
+             start=datetime(2024, 1, 1), manager_count=0, seed=1, batch_size=5000, log=None):
+    """
+    Create the dataset and return the Staff list.
+
+    Each job is assigned `staff_per_job` staff (round robin) and, with
+    `manager_count`, managed by one of the first `manager_count` staff. On
+    every working day from `start` a staff member is away with probability
+    `absence_rate`, otherwise logs 1 to `entries_per_day` entries against
+    their assigned tasks (any task, for staff without assignments).
+    """
+    log = log or (lambda message: None)
+    rng = random.Random(seed)
+    start = timezone.make_aware(start) if timezone.is_naive(start) else start
+
+    staff = Staff.objects.bulk_create([
+        Staff(uuid=_uuid(rng), name=f'Staff {i:04d}', email=f'staff{i}@example.com', payroll_code=f'P{i:04d}')
+        for i in range(staff_count)
+    ])
+    clients = Client.objects.bulk_create([
+        Client(uuid=_uuid(rng), name=f'Client {i:04d}', city=CITIES[i % len(CITIES)])
+        for i in range(client_count)
+    ], batch_size=batch_size)
+    Contact.objects.bulk_create([
+        Contact(uuid=_uuid(rng), client=client, name=f'Contact {i}-{j}', is_primary=j == 0)
+        for i, client in enumerate(clients) for j in range(contacts_per_client)
+    ], batch_size=batch_size)
+    log(f"{len(staff)} staff, {len(clients)} clients, {len(clients) * contacts_per_client} contacts")
+
+    managers = staff[:manager_count]
+    jobs = Job.objects.bulk_create([
+        Job(uuid=_uuid(rng), job_id=f'J{i * jobs_per_client + j:06d}',
+            name=f'Job {i}-{j}', client=client, client_uuid=client.uuid, state='In Progress',
+            start_date=start + timedelta(days=rng.randrange(days_of_history)),
+            due_date=start + timedelta(days=days_of_history + rng.randrange(60)),
+            manager_uuid=managers[(i * jobs_per_client + j) % len(managers)].uuid if managers else None)
+        for i, client in enumerate(clients) for j in range(jobs_per_client)
+    ], batch_size=batch_size)
+    tasks = Task.objects.bulk_create([
+        Task(uuid=_uuid(rng), name=f'Task {k}', job=job, estimated_minutes=600, billable=k % 2 == 0)
+        for job in jobs for k in range(tasks_per_job)
+    ], batch_size=batch_size)
+
+    assignments = []
+    task_assignments = []
+    assigned_tasks = {member.uuid: [] for member in staff}
+    for job_index, job in enumerate(jobs):
+        job_tasks = tasks[job_index * tasks_per_job:(job_index + 1) * tasks_per_job]
+        for n in range(min(staff_per_job, staff_count)):
+            member = staff[(job_index + n) % staff_count]
+            assignments.append(JobAssignedStaff(job=job, staff=member, staff_uuid=member.uuid,
+                                                staff_name=member.name))
+            for task in job_tasks:
+                task_assignments.append(TaskAssignedStaff(task=task, staff_uuid=member.uuid,
+                                                          staff_name=member.name, allocated_minutes=480))
+            assigned_tasks[member.uuid].extend(job_tasks)
+    JobAssignedStaff.objects.bulk_create(assignments, batch_size=batch_size)
+    TaskAssignedStaff.objects.bulk_create(task_assignments, batch_size=batch_size)
+    log(f"{len(jobs)} jobs, {len(tasks)} tasks, {len(assignments)} job assignments")
+
+    timesheets = []
+    created = 0
+    for day in range(days_of_history):
+        entry_date = start + timedelta(days=day)
+        if entry_date.weekday() >= 5:
+            continue
+        for member in staff:
+            if absence_rate and rng.random() < absence_rate:
+                continue
+            options = assigned_tasks[member.uuid] or tasks
+            if entries_per_day == 1:
+                minutes = [rng.choice([60, 120, 240, 480])]
+            else:
+                minutes = _split(rng, rng.choice(DAY_LENGTHS), rng.randint(1, entries_per_day))
+            for entry_minutes in minutes:
+                task = options[rng.randrange(len(options))]
+                timesheets.append(Timesheet(
+                    uuid=_uuid(rng),
+                    job=task.job, job_number=task.job.job_id, job_name=task.job.name,
+                    task=task, task_uuid=task.uuid, task_name=task.name,
+                    staff=member, staff_uuid=member.uuid, staff_name=member.name,
+                    entry_date=entry_date, minutes=entry_minutes, billable=task.billable,
+                ))
+        if len(timesheets) >= batch_size:
+            Timesheet.objects.bulk_create(timesheets, batch_size=1000)
+            created += len(timesheets)
+            timesheets = []
+    Timesheet.objects.bulk_create(timesheets, batch_size=1000)
+    created += len(timesheets)
+    log(f"{created} timesheet entries over {days_of_history} days")
+
+    rebuild_progress()
+    rebuild_summaries()
+    rebuild_search_index()
+    log("Rebuilt the rollups, summaries and search index")
+    return staff
+
+
+def create_users(staff, password, manager_count=0, admin_count=1):
+    """
+    A login for each of `staff`, username = email: the first `manager_count`
+    are managers (generate()'s job managers), the next `admin_count` admins,
+    the rest staff. Returns the Users.
+    """
+    # One hash for all: hashing per user would take longer than generating the data
+    hashed = make_password(password)
+    users = User.objects.bulk_create([
+        User(username=member.email, email=member.email, password=hashed) for member in staff
+    ])
+    # bulk_create skips the signal that creates the profiles
+    UserProfile.objects.bulk_create([
+        UserProfile(
+            user=user, staff_uuid=member.uuid,
+            role='MANAGER' if i < manager_count else 'ADMIN' if i < manager_count + admin_count else 'STAFF',
+        )
+        for i, (user, member) in enumerate(zip(users, staff))
+    ])
+    return users
@@ -0,0 +1,50 @@
+# main/tests/data.py
+
+"""
+Data for the performance regression tests: a small main.synthetic dataset,
+one timesheet entry per staff member per working day from 2024-01-01.
+"""
+
+import uuid
+
+from django.contrib.auth.models import User
+
+from main.authentication import ProfileTokenObtainPairSerializer
+from main.models import Timesheet
+from main.synthetic import generate
+
+
+def seed_dataset(staff_count=20, client_count=50, jobs_per_client=3, tasks_per_job=3,
+                 days_of_history=120, seed=1):
+    """
+    Create staff, clients with contacts, jobs with tasks and assignments, and
+    one timesheet entry per staff member per working day. Returns the Staff list.
+    """
+    return generate(
+        staff_count=staff_count, client_count=client_count, jobs_per_client=jobs_per_client,
+        tasks_per_job=tasks_per_job, days_of_history=days_of_history, seed=seed,
+    )
+
+
+def create_api_user(staff_member, role='STAFF'):
+    """Create a user linked to `staff_member` and return (user, JWT auth header kwargs)"""
+    user = User.objects.create_user(
+        username=f'user-{staff_member.pk}', email=staff_member.email, password='password'
+    )
+    user.profile.staff_uuid = staff_member.uuid
+    user.profile.role = role
+    user.profile.save()
+    # Issued as at login, with the profile claims
+    token = ProfileTokenObtainPairSerializer.get_token(user).access_token
+    return user, {'HTTP_AUTHORIZATION': f'JWT {token}'}
+
+
+def create_timesheet(staff_member, task, entry_date, minutes, billable=True):
+    """Log an entry through the ORM, so the signals (change log, rollups, ...) see it"""
+    return Timesheet.objects.create(
+        uuid=uuid.uuid4(),
+        job=task.job, job_number=task.job.job_id, job_name=task.job.name,
+        task=task, task_uuid=task.uuid, task_name=task.name,
+        staff=staff_member, staff_uuid=staff_member.uuid, staff_name=staff_member.name,
+        entry_date=entry_date, minutes=minutes, billable=billable,
+    )
@@ -0,0 +1,107 @@
+# main/tests/test_analytics.py
+
+"""
+The in-process timesheet cube (main.analytics) must give the same sums as
+the ORM, keep giving them as timesheets are written, and never be served
+under an ETag newer than its contents.
+"""
+
+from collections import defaultdict
+from datetime import date, datetime
+
+from django.db.models import Sum
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from main.analytics import get_cube
+from main.models import Task, Timesheet
+from main.summaries import week_start_of
+from .data import seed_dataset, create_api_user, create_timesheet
+
+
+def orm_minutes(key, timesheets=None):
+    """{key(timesheet): minutes} summed in Python over the raw rows"""
+    totals = defaultdict(int)
+    for timesheet in (timesheets if timesheets is not None else Timesheet.objects.select_related('job__client')):
+        totals[key(timesheet)] += timesheet.minutes or 0
+    return dict(totals)
+
+
+class TimesheetCubeTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = seed_dataset(staff_count=3, client_count=3, days_of_history=45)
+        cls.user, cls.auth = create_api_user(cls.staff[0], role='ADMIN')
+        cls.task = Task.objects.select_related('job').order_by('uuid').first()
+
+    def setUp(self):
+        self.cube = get_cube()
+        self.cube.load()
+
+    def cube_minutes(self, key, **filters):
+        return {key(row): row['minutes'] for row in self.cube.aggregate(limit=10000, **filters)}
+
+    def test_totals(self):
+        [row] = self.cube.aggregate()
+        minutes = Timesheet.objects.aggregate(minutes=Sum('minutes'))['minutes']
+        self.assertEqual((row['minutes'], row['entries']), (minutes, Timesheet.objects.count()))
+        self.assertEqual(
+            row['billable_minutes'], Timesheet.objects.filter(billable=True).aggregate(m=Sum('minutes'))['m']
+        )
+
+    def test_group_by_matches_orm(self):
+        cases = {
+            ('staff',): (lambda row: row['staff_uuid'], lambda t: t.staff_uuid),
+            ('job', 'billable'): (lambda row: (row['job_id'], row['billable']), lambda t: (t.job_number, t.billable)),
+            ('client',): (lambda row: row['client_uuid'], lambda t: t.job.client.uuid),
+            ('month',): (
+                lambda row: row['month'], lambda t: timezone.localdate(t.entry_date).strftime('%Y-%m'),
+            ),
+            ('week', 'staff'): (
+                lambda row: (row['week'], row['staff_uuid']),
+                lambda t: (week_start_of(timezone.localdate(t.entry_date)).strftime('%Y-%m-%d'), t.staff_uuid),
+            ),
+        }
+        for group_by, (cube_key, orm_key) in cases.items():
+            with self.subTest(group_by=group_by):
+                self.assertEqual(self.cube_minutes(cube_key, group_by=list(group_by)), orm_minutes(orm_key))
+
+    def test_filters_match_orm(self):
+        member = self.staff[1]
+        start, end = date(2024, 1, 10), date(2024, 1, 31)
+        timesheets = [
+            t for t in Timesheet.objects.select_related('job__client').filter(staff_uuid=member.uuid, billable=True)
+            if start <= timezone.localdate(t.entry_date) <= end
+        ]
+        self.assertTrue(timesheets)
+        self.assertEqual(
+            self.cube_minutes(lambda row: row['day'], group_by=['day'], staff=[member.uuid],
+                              start=start, end=end, billable=True),
+            orm_minutes(lambda t: timezone.localdate(t.entry_date).strftime('%Y-%m-%d'), timesheets),
+        )
+
+    def test_follows_writes(self):
+        member = self.staff[0]
+        created = create_timesheet(member, self.task, timezone.make_aware(datetime(2024, 2, 1, 9)), 95)
+        updated = Timesheet.objects.filter(staff_uuid=member.uuid).exclude(pk=created.pk).first()
+        updated.minutes = 5
+        updated.save()
+        Timesheet.objects.filter(staff_uuid=self.staff[2].uuid).first().delete()
+        self.cube.refresh()
+        self.assertEqual(
+            self.cube_minutes(lambda row: row['staff_uuid'], group_by=['staff']),
+            orm_minutes(lambda t: t.staff_uuid),
+        )
+
+    @override_settings(ANALYTICS_REFRESH_INTERVAL=3600)
+    def test_etag_never_outruns_the_body(self):
+        path = '/api/analytics/timesheets/'
+        etag = self.client.get(path, **self.auth)['ETag']
+        create_timesheet(self.staff[0], self.task, timezone.make_aware(datetime(2024, 2, 1, 9)), 95)
+
+        response = self.client.get(path, HTTP_IF_NONE_MATCH=etag, **self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['rows'][0]['minutes'], Timesheet.objects.aggregate(m=Sum('minutes'))['m'])
+        response = self.client.get(path, HTTP_IF_NONE_MATCH=response['ETag'], **self.auth)
+        self.assertEqual(response.status_code, 304)
@@ -0,0 +1,134 @@
+# main/tests/test_asgi.py
+
+"""
+Serving under ASGI: no middleware adapted to a thread, the read endpoints
+served by the async views at their own paths, exports streamed from async
+generators rather than buffered, compressed ETags revalidated by the async
+views, and static files answered by WhiteNoise ahead of Django.
+"""
+
+import logging
+import os
+import shutil
+import tempfile
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.core.handlers.base import BaseHandler
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import Resolver404, resolve
+from django.utils import timezone
+
+from mysite.static import with_static_files
+from main.summaries import week_start_of
+from .data import seed_dataset, create_api_user
+
+
+class MiddlewareTests(SimpleTestCase):
+
+    def test_no_middleware_is_adapted(self):
+        # Django logs each adaptation to django.request at DEBUG
+        with self.assertNoLogs('django.request', logging.DEBUG):
+            BaseHandler().load_middleware(is_async=True)
+
+
+class RoutingTests(SimpleTestCase):
+
+    def test_read_endpoints_are_async(self):
+        member = '00000000-0000-0000-0000-000000000001'
+        for path in (
+            '/api/jobs/all/', f'/api/jobs/my-jobs/{member}/', '/api/jobs/J1/', '/api/jobs/J1/tasks/',
+            '/api/clients/', f'/api/clients/{member}/', '/api/clients/1/contacts/', '/api/contacts/',
+            f'/api/staff/{member}/weekly-hours/', f'/api/staff/{member}/weekly-hours/2024-01-08/',
+        ):
+            with self.subTest(path=path):
+                self.assertTrue(iscoroutinefunction(resolve(path).func))
+        with self.assertRaises(Resolver404):
+            resolve('/api/async/clients/')
+
+
+class AsyncHandlerTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        staff = seed_dataset(staff_count=3, client_count=10, days_of_history=20)
+        cls.user, cls.auth = create_api_user(staff[0], role='ADMIN')
+        cls.staff_uuid = staff[0].uuid
+        # AsyncClient takes the headers by name
+        cls.headers = {'Authorization': cls.auth['HTTP_AUTHORIZATION']}
+
+    async def test_exports_stream_asynchronously(self):
+        for export_format in ('csv', 'ndjson'):
+            with self.subTest(export_format=export_format):
+                path = f'/api/exports/timesheets/{export_format}/?start=2024-01-01&end=2024-01-31'
+                headers = {**self.headers, 'Accept-Encoding': 'identity'}
+                response = await self.async_client.get(path, headers=headers)
+                self.assertEqual(response.status_code, 200)
+                # An async iterator, which the ASGI handler sends as it goes
+                self.assertTrue(response.is_async)
+                content = b''.join([chunk async for chunk in response.streaming_content])
+
+                # The same bytes as the WSGI export
+                self.assertEqual(content, await sync_to_async(self.sync_export)(path))
+                self.assertGreater(content.count(b'\n'), 20)
+
+    async def test_week_defaults_to_the_current_one(self):
+        path = f'/api/staff/{self.staff_uuid}/weekly-hours/'
+        response = await self.async_client.get(path, headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        this_week = await self.async_client.get(f'{path}{week_start_of(timezone.localdate())}/', headers=self.headers)
+        self.assertEqual(response.json(), this_week.json())
+
+    def sync_export(self, path):
+        response = self.client.get(path, HTTP_ACCEPT_ENCODING='identity', **self.auth)
+        self.assertFalse(response.is_async)
+        return b''.join(response.streaming_content)
+
+    @override_settings(COMPRESSION_MIN_SIZE=200)
+    async def test_compressed_etag_revalidates(self):
+        path = '/api/clients/'
+        response = await self.async_client.get(path, headers={**self.headers, 'Accept-Encoding': 'gzip'})
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertTrue(response['ETag'].startswith('W/"'))
+        for etag in (response['ETag'], response['ETag'][2:], '*'):
+            with self.subTest(etag=etag):
+                headers = {**self.headers, 'Accept-Encoding': 'gzip', 'If-None-Match': etag}
+                self.assertEqual((await self.async_client.get(path, headers=headers)).status_code, 304)
+
+
+class StaticFilesTests(SimpleTestCase):
+
+    def setUp(self):
+        self.static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.static_root)
+        with open(os.path.join(self.static_root, 'app.css'), 'w') as f:
+            f.write('body {}')
+
+    async def request(self, application, path):
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            messages.append(message)
+
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+            'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'root_path': '', 'query_string': b'',
+            'headers': [(b'host', b'testserver')], 'server': ('testserver', 80), 'client': ('127.0.0.1', 1),
+        }
+        await application(scope, receive, send)
+        start = next(message for message in messages if message['type'] == 'http.response.start')
+        body = b''.join(message.get('body', b'') for message in messages if message['type'] == 'http.response.body')
+        return start['status'], body
+
+    async def test_static_files_bypass_django(self):
+        async def django_application(scope, receive, send):
+            await send({'type': 'http.response.start', 'status': 299, 'headers': []})
+            await send({'type': 'http.response.body', 'body': b'django'})
+
+        with override_settings(STATIC_ROOT=self.static_root, STATIC_URL='static/'):
+            application = with_static_files(django_application)
+        self.assertEqual(await self.request(application, '/static/app.css'), (200, b'body {}'))
+        self.assertEqual((await self.request(application, '/static/missing.css'))[0], 404)
+        self.assertEqual(await self.request(application, '/api/clients/'), (299, b'django'))
@@ -0,0 +1,68 @@
+# main/tests/test_authentication.py
+
+"""
+JWT authentication (main.authentication): the user's profile is read with
+their is_active flag, so a deactivated or deleted user is refused at once, on
+the API and on token refresh, and a role or staff record change applies to
+the very next request.
+"""
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from main.models import Staff, UserProfile
+from .data import create_api_user
+
+
+class ClaimsAuthenticationTests(TestCase):
+    path = '/api/jobs/all/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.member = Staff.objects.create(name='Sam Staff', email='sam@example.com')
+        cls.user, _ = create_api_user(cls.member)
+
+    def setUp(self):
+        response = self.client.post('/auth/jwt/create/', {'username': self.user.username, 'password': 'password'})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.tokens = response.json()
+        self.auth = {'HTTP_AUTHORIZATION': f"JWT {self.tokens['access']}"}
+
+    def refresh(self):
+        return self.client.post('/auth/jwt/refresh/', {'refresh': self.tokens['refresh']})
+
+    def test_active_user(self):
+        self.assertEqual(self.client.get(self.path, **self.auth).status_code, 200)
+        response = self.refresh()
+        self.assertEqual(response.status_code, 200, response.content)
+        auth = {'HTTP_AUTHORIZATION': f"JWT {response.json()['access']}"}
+        self.assertEqual(self.client.get(self.path, **auth).status_code, 200)
+
+    def test_deactivated_user(self):
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        response = self.client.get(self.path, **self.auth)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()['code'], 'user_inactive')
+        self.assertEqual(self.refresh().status_code, 401)
+
+    def test_deleted_user(self):
+        self.user.delete()
+        response = self.client.get(self.path, **self.auth)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()['code'], 'user_not_found')
+        self.assertEqual(self.refresh().status_code, 401)
+
+    def test_demoted_user(self):
+        UserProfile.objects.filter(user=self.user).update(role='ADMIN')
+        self.assertEqual(self.client.get('/api/metrics/', **self.auth).status_code, 200)
+        UserProfile.objects.filter(user=self.user).update(role='STAFF')
+        self.assertEqual(self.client.get('/api/metrics/', **self.auth).status_code, 403)
+
+    def test_reassigned_user(self):
+        other = Staff.objects.create(name='Other Staff', email='other@example.com')
+        own, others = (f'/api/staff/{member.uuid}/hours-summary/' for member in (self.member, other))
+        self.assertEqual(self.client.get(own, **self.auth).status_code, 200)
+        self.assertEqual(self.client.get(others, **self.auth).status_code, 403)
+        UserProfile.objects.filter(user=self.user).update(staff_uuid=other.uuid)
+        self.assertEqual(self.client.get(own, **self.auth).status_code, 403)
+        self.assertEqual(self.client.get(others, **self.auth).status_code, 200)
@@ -0,0 +1,97 @@
+# main/tests/test_autocomplete.py
+
+"""
+Autocomplete scoping (main.autocomplete): non-admins only get the jobs they
+are assigned to or manage, and those jobs' tasks and clients, also after
+the assignments change.
+"""
+
+import uuid
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+
+from main import autocomplete
+from main.authentication import ProfileTokenObtainPairSerializer
+from main.autocomplete import get_autocomplete
+from main.models import Staff, Client, Job, JobAssignedStaff, Task
+from .data import create_api_user
+
+
+class AutocompleteScopeTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.member = Staff.objects.create(name='Sam Staff')
+        cls.manager = Staff.objects.create(name='Max Manager')
+        acme = Client.objects.create(uuid=uuid.uuid4(), name='Acme Roading')
+        beta = Client.objects.create(uuid=uuid.uuid4(), name='Beta Homes')
+        cls.assigned = Job.objects.create(uuid=uuid.uuid4(), job_id='A100', name='Alpha survey', client=acme)
+        cls.managed = Job.objects.create(
+            uuid=uuid.uuid4(), job_id='B200', name='Alpha design', client=beta, manager_uuid=cls.manager.uuid,
+        )
+        JobAssignedStaff.objects.create(job=cls.assigned, staff_uuid=cls.member.uuid, staff=cls.member)
+        Task.objects.create(uuid=uuid.uuid4(), name='Site visit', job=cls.assigned)
+        Task.objects.create(uuid=uuid.uuid4(), name='Site plan', job=cls.managed)
+
+        cls.user, cls.auth = create_api_user(cls.member)
+        cls.manager_user, cls.manager_auth = create_api_user(cls.manager, role='MANAGER')
+        cls.admin, cls.admin_auth = create_api_user(Staff.objects.create(name='Pat Admin'), role='ADMIN')
+
+    def setUp(self):
+        get_autocomplete().load()
+
+    def labels(self, q, auth, **params):
+        response = self.client.get('/api/autocomplete/', {'q': q, **params}, **auth)
+        self.assertEqual(response.status_code, 200, response.content)
+        return sorted(result.get('job_number') if result['type'] == 'job' else result['name']
+                      for result in response.json())
+
+    def test_staff_see_their_jobs_tasks_and_clients(self):
+        self.assertEqual(self.labels('alpha', self.auth), ['A100'])
+        self.assertEqual(self.labels('site', self.auth), ['Site visit'])
+        self.assertEqual(self.labels('acme', self.auth), ['Acme Roading'])
+        self.assertEqual(self.labels('beta', self.auth), [])
+        self.assertEqual(self.labels('b200', self.auth), [])
+
+    def test_managers_also_see_the_jobs_they_manage(self):
+        self.assertEqual(self.labels('alpha', self.manager_auth), ['B200'])
+        self.assertEqual(self.labels('site', self.manager_auth), ['Site plan'])
+        self.assertEqual(self.labels('beta', self.manager_auth), ['Beta Homes'])
+
+    def test_unlinked_users_see_nothing(self):
+        user = User.objects.create_user(username='unlinked', password='password')
+        for role in ('STAFF', 'MANAGER'):
+            with self.subTest(role=role):
+                user.profile.role = role
+                user.profile.save()
+                token = ProfileTokenObtainPairSerializer.get_token(user).access_token
+                auth = {'HTTP_AUTHORIZATION': f'JWT {token}'}
+                for q in ('alpha', 'site', 'acme', 'beta'):
+                    self.assertEqual(self.labels(q, auth), [])
+
+    def test_job_tasks_are_not_cut_off_by_the_scan_limit(self):
+        # Other kinds, and the other job's task, sort ahead of the task asked for
+        Client.objects.create(uuid=uuid.uuid4(), name='Sandy Bay')
+        Task.objects.create(uuid=uuid.uuid4(), name='Safety check', job=self.assigned)
+        get_autocomplete().load()
+        with mock.patch.object(autocomplete, 'SCAN_LIMIT', 1):
+            for q in ('s', 'si'):
+                with self.subTest(q=q):
+                    labels = self.labels(q, self.admin_auth, types='task', job=str(self.managed.uuid))
+                    self.assertEqual(labels, ['Site plan'])
+
+    def test_admins_see_everything(self):
+        self.assertEqual(self.labels('alpha', self.admin_auth), ['A100', 'B200'])
+        self.assertEqual(self.labels('site', self.admin_auth), ['Site plan', 'Site visit'])
+        self.assertEqual(self.labels('site', self.admin_auth, job=str(self.managed.uuid)), ['Site plan'])
+
+    @override_settings(ANALYTICS_REFRESH_INTERVAL=0)
+    def test_scope_follows_assignments(self):
+        self.assertEqual(self.labels('alpha', self.auth), ['A100'])
+        JobAssignedStaff.objects.create(job=self.managed, staff_uuid=self.member.uuid, staff=self.member)
+        self.assertEqual(self.labels('alpha', self.auth), ['A100', 'B200'])
+        JobAssignedStaff.objects.filter(job=self.assigned).delete()
+        self.assertEqual(self.labels('alpha', self.auth), ['B200'])
+        self.assertEqual(self.labels('acme', self.auth), [])
@@ -0,0 +1,99 @@
+# main/tests/test_changes.py
+
+"""
+The change log readers (main.changelog): the changes feed and the cursor
+the in-process indexes follow must deliver a change that commits after a
+higher seq has been read, and the feed scopes deletions like upserts.
+"""
+
+import uuid
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from main.changelog import ChangeCursor
+from main.models import ChangeLog, Timesheet
+from .data import seed_dataset, create_api_user
+
+
+def log(seq, model_name='job', action='UPDATE', staff_uuid=None):
+    """A change-log row with an explicit seq, as if its transaction committed now"""
+    return ChangeLog.objects.create(
+        seq=seq, model_name=model_name, object_uuid=uuid.uuid4(), action=action, staff_uuid=staff_uuid
+    )
+
+
+def settle():
+    ChangeLog.objects.update(changed_at=timezone.now() - timedelta(hours=1))
+
+
+class ChangeCursorTests(TestCase):
+
+    def test_late_commit_is_returned(self):
+        cursor = ChangeCursor()
+        log(10)
+        self.assertEqual([row[0] for row in cursor.read(100)], [10])
+        # seq 7 was allocated before 10 but committed after it was read
+        log(7)
+        self.assertEqual([row[0] for row in cursor.read(100)], [7])
+        self.assertEqual(cursor.read(100), [])
+
+    def test_cursor_moves_past_settled_changes(self):
+        cursor = ChangeCursor()
+        log(3)
+        log(4)
+        cursor.read(100)
+        self.assertEqual(cursor.seq, 0)
+        with override_settings(CHANGE_LOG_SETTLE_SECONDS=0):
+            self.assertEqual(cursor.read(100), [])
+        self.assertEqual((cursor.seq, cursor.seen), (4, {}))
+
+    def test_changes_before_creation_count_as_loaded(self):
+        log(1)
+        cursor = ChangeCursor()
+        log(2)
+        self.assertEqual([row[0] for row in cursor.read(100)], [2])
+
+    def test_too_many_changes(self):
+        cursor = ChangeCursor()
+        for seq in range(1, 6):
+            log(seq)
+        self.assertIsNone(cursor.read(4))
+        self.assertEqual(len(cursor.read(5)), 5)
+
+
+class ChangesFeedTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = seed_dataset(staff_count=2, client_count=2, days_of_history=5)
+        cls.user, cls.auth = create_api_user(cls.staff[0])
+
+    def feed(self, since):
+        response = self.client.get(f'/api/changes/?since={since}', **self.auth)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_cursor_held_back_until_settled(self):
+        log(10)
+        page = self.feed(0)
+        self.assertEqual(page['next_since'], 0)
+        # Committed late, below the change already sent: still delivered
+        late = log(7)
+        page = self.feed(page['next_since'])
+        self.assertIn(str(late.object_uuid), page['changes']['job']['deleted'])
+        settle()
+        self.assertEqual(self.feed(0)['next_since'], 10)
+        self.assertEqual(self.client.get('/api/changes/', **self.auth).json()['next_since'], 10)
+
+    def test_deleted_timesheets_are_scoped(self):
+        own, other = (Timesheet.objects.filter(staff_uuid=member.uuid).first() for member in self.staff)
+        deleted_uuids = [str(own.uuid), str(other.uuid)]
+        own.delete()
+        other.delete()
+        self.assertEqual(self.feed(0)['changes']['timesheet']['deleted'], deleted_uuids[:1])
+
+        admin, admin_auth = create_api_user(self.staff[1], role='ADMIN')
+        deleted = self.client.get('/api/changes/?since=0', **admin_auth).json()['changes']['timesheet']['deleted']
+        self.assertCountEqual(deleted, deleted_uuids)
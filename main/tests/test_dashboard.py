@@ -0,0 +1,76 @@
+# main/tests/test_dashboard.py
+
+"""
+The bootstrap endpoint (main.dashboard): each section holds what its own
+endpoint returns, is built on the request's database connection, and is
+answered as not modified when its ETag is sent back.
+"""
+
+from datetime import date
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from main.dashboard import SECTIONS
+from .data import seed_dataset, create_api_user
+
+TODAY = date(2024, 1, 17)
+
+
+@mock.patch('django.utils.timezone.localdate', return_value=TODAY)
+class BootstrapTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        staff = seed_dataset(staff_count=3, client_count=6, days_of_history=20)
+        cls.member = staff[0]
+        cls.user, cls.auth = create_api_user(cls.member)
+
+    def get(self, path, **extra):
+        response = self.client.get(path, **self.auth, **extra)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_sections_match_their_endpoints(self, localdate):
+        with CaptureQueriesContext(connection) as ctx:
+            sections = self.get('/api/bootstrap/?week_start=2024-01-08')
+        # Every section's queries ran on the request's connection
+        tables = {'auth_user', 'main_job', 'main_timesheet', 'main_client', 'main_contact', 'main_task'}
+        read = {table for table in tables for query in ctx.captured_queries if f'FROM "{table}"' in query['sql']}
+        self.assertEqual(read, tables)
+
+        recent_tasks = sections['recent_tasks']['data']
+        self.assertTrue(recent_tasks)
+        expected = {
+            'user': self.get('/auth/users/me/'),
+            'jobs': self.get(f'/api/jobs/my-jobs/{self.member.uuid}/'),
+            'week': self.get(f'/api/staff/{self.member.uuid}/weekly-hours/2024-01-08/'),
+            'clients': self.get('/api/clients/'),
+            'contacts': self.get('/api/contacts/'),
+            'recent_tasks': {job: self.get(f'/api/jobs/{job}/tasks/') for job in recent_tasks},
+        }
+        for name, data in expected.items():
+            with self.subTest(name):
+                self.assertTrue(data)
+                self.assertEqual(sections[name], {'etag': sections[name]['etag'], 'data': data})
+
+    def test_known_etags_are_not_modified(self, localdate):
+        sections = self.get('/api/bootstrap/?sections=jobs,week,clients')
+        known = ', '.join(sections[name]['etag'] for name in ('jobs', 'clients'))
+        again = self.get('/api/bootstrap/?sections=jobs,week,clients', HTTP_IF_NONE_MATCH=known)
+        self.assertEqual(again['jobs'], {'etag': sections['jobs']['etag'], 'not_modified': True})
+        self.assertEqual(again['clients'], {'etag': sections['clients']['etag'], 'not_modified': True})
+        self.assertEqual(again['week'], sections['week'])
+
+        known = ', '.join(section['etag'] for section in sections.values())
+        response = self.client.get('/api/bootstrap/?sections=jobs,week,clients', HTTP_IF_NONE_MATCH=known, **self.auth)
+        self.assertEqual(response.status_code, 304)
+
+    def test_a_failing_section_spares_the_others(self, localdate):
+        failing = SECTIONS['clients']._replace(build=mock.Mock(side_effect=ValueError('boom')))
+        with mock.patch.dict(SECTIONS, clients=failing), self.assertLogs('main.dashboard', 'ERROR'):
+            result = self.get('/api/bootstrap/?sections=jobs,clients')
+        self.assertEqual(result['clients']['error'], 'boom')
+        self.assertTrue(result['jobs']['data'])
@@ -0,0 +1,93 @@
+# main/tests/test_etags.py
+
+"""
+Conditional GETs: what goes into the ETags (see main.utils.conditional_on)
+and which requests they apply to.
+"""
+
+import json
+from datetime import date
+from unittest import mock
+
+from django.test import TestCase
+
+from main.models import UserProfile
+from .data import seed_dataset, create_api_user
+
+
+class ConditionalOnTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = seed_dataset(staff_count=3, client_count=4, days_of_history=10)
+        cls.member = cls.staff[0]
+        cls.user, cls.auth = create_api_user(cls.member, role='ADMIN')
+        cls.task = cls.member.timesheets.first().task
+
+    def test_get_is_conditional(self):
+        path = f'/api/staff/{self.member.uuid}/weekly-hours/2024-01-08/'
+        etag = self.client.get(path, **self.auth)['ETag']
+        response = self.client.get(path, HTTP_IF_NONE_MATCH=etag, **self.auth)
+        self.assertEqual(response.status_code, 304)
+
+    def test_post_is_not_conditional(self):
+        path = f'/api/staff/{self.member.uuid}/weekly-hours/2024-01-08/'
+        etag = self.client.get(path, **self.auth)['ETag']
+        body = {'entries': [{'task_uuid': str(self.task.uuid), 'job_id': self.task.job.job_id,
+                             'entries': [{'date': '2024-01-09', 'hours': 1, 'notes': []}]}]}
+        for header in ('HTTP_IF_NONE_MATCH', 'HTTP_IF_MATCH'):
+            with self.subTest(header):
+                response = self.client.post(
+                    path, json.dumps(body), content_type='application/json', **{header: etag}, **self.auth
+                )
+                self.assertEqual(response.status_code, 200, response.content)
+                self.assertNotIn('ETag', response)
+
+    def test_dated_views_change_etag_with_the_date(self):
+        paths = [
+            f'/api/staff/{self.member.uuid}/hours-summary/',
+            '/api/reports/team-weekly-hours/',
+            '/api/reports/timesheet-gaps/',
+            '/api/reports/capacity/',
+        ]
+        for path in paths:
+            with self.subTest(path):
+                with mock.patch('django.utils.timezone.localdate', return_value=date(2024, 1, 14)):
+                    etag = self.client.get(path, **self.auth)['ETag']
+                    self.assertEqual(self.client.get(path, HTTP_IF_NONE_MATCH=etag, **self.auth).status_code, 304)
+                with mock.patch('django.utils.timezone.localdate', return_value=date(2024, 1, 15)):
+                    response = self.client.get(path, HTTP_IF_NONE_MATCH=etag, **self.auth)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response['ETag'], etag)
+
+    def test_bootstrap_recent_tasks_etag_changes_with_the_date(self):
+        path = '/api/bootstrap/?sections=recent_tasks'
+        with mock.patch('django.utils.timezone.localdate', return_value=date(2024, 1, 14)):
+            etag = self.client.get(path, **self.auth).json()['recent_tasks']['etag']
+            self.assertEqual(self.client.get(path, HTTP_IF_NONE_MATCH=etag, **self.auth).status_code, 304)
+        with mock.patch('django.utils.timezone.localdate', return_value=date(2024, 1, 15)):
+            response = self.client.get(path, HTTP_IF_NONE_MATCH=etag, **self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.json()['recent_tasks']['etag'], etag)
+
+    def test_refusals_carry_no_etag(self):
+        _, auth = create_api_user(self.staff[1])
+        response = self.client.get('/api/admin/staff/', **auth)
+        self.assertEqual(response.status_code, 403)
+        self.assertNotIn('ETag', response)
+
+    def test_demotion_is_not_revalidated(self):
+        path = '/api/admin/staff/'
+        etag = self.client.get(path, **self.auth)['ETag']
+        UserProfile.objects.filter(user=self.user).update(role='STAFF')
+        response = self.client.get(path, HTTP_IF_NONE_MATCH=etag, **self.auth)
+        self.assertEqual(response.status_code, 403)
+        self.assertNotIn('ETag', response)
+
+    def test_etag_changes_with_the_staff_record(self):
+        path = f'/api/staff/{self.member.uuid}/weekly-hours/2024-01-08/'
+        etag = self.client.get(path, **self.auth)['ETag']
+        UserProfile.objects.filter(user=self.user).update(staff_uuid=self.staff[1].uuid)
+        response = self.client.get(path, HTTP_IF_NONE_MATCH=etag, **self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
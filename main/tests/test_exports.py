@@ -0,0 +1,104 @@
+# main/tests/test_exports.py
+
+"""
+The streaming timesheet exports (main.exports): rows joined to the staff
+payroll code, oldest first, filtered by date range, staff and job, and
+scoped like the reports.
+"""
+
+import csv
+import io
+import json
+import uuid
+from datetime import datetime
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+
+from main.models import Staff, Job, JobAssignedStaff, Task
+from .data import create_api_user, create_timesheet
+
+
+def day(d, hour=9):
+    return timezone.make_aware(datetime(2024, 3, d, hour))
+
+
+class TimesheetExportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ann = Staff.objects.create(name='Ann', email='ann@example.com', payroll_code='P-ANN')
+        cls.bob = Staff.objects.create(name='Bob', email='bob@example.com', payroll_code='P-BOB')
+        cls.cat = Staff.objects.create(name='Cat', email='cat@example.com')
+        cls.dee = Staff.objects.create(name='Dee', email='dee@example.com')
+        tasks = {}
+        for number, manager, members in (('J1', cls.bob, [cls.ann]), ('J2', None, [cls.cat])):
+            job = Job.objects.create(uuid=uuid.uuid4(), job_id=number, name=f'Job {number}', manager_uuid=manager and manager.uuid)
+            for member in members:
+                JobAssignedStaff.objects.create(job=job, staff_uuid=member.uuid, staff=member, staff_name=member.name)
+            tasks[number] = Task.objects.create(uuid=uuid.uuid4(), name=f'Work on {number}', job=job, billable=True)
+
+        cls.entries = [
+            create_timesheet(cls.ann, tasks['J1'], day(5), 90),
+            create_timesheet(cls.ann, tasks['J1'], day(4), 60),
+            create_timesheet(cls.cat, tasks['J2'], day(6), 30, billable=False),
+            create_timesheet(cls.ann, tasks['J1'], day(20), 15),
+        ]
+        cls.admin, cls.admin_auth = create_api_user(cls.dee, role='ADMIN')
+        cls.manager, cls.manager_auth = create_api_user(cls.bob, role='MANAGER')
+        cls.member, cls.member_auth = create_api_user(cls.ann)
+
+    def export(self, export_format, auth=None, **params):
+        response = self.client.get(f'/api/exports/timesheets/{export_format}/', params, **(auth or self.admin_auth))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode(), response
+
+    def test_csv(self):
+        content, response = self.export('csv', start='2024-03-01', end='2024-03-15')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="timesheets_2024-03-01_2024-03-15.csv"')
+        rows = list(csv.DictReader(io.StringIO(content)))
+        # Oldest first, the entry after `end` left out
+        self.assertEqual([row['uuid'] for row in rows], [str(entry.uuid) for entry in self.entries[1::-1] + self.entries[2:3]])
+        self.assertEqual(rows[0], {
+            'uuid': str(self.entries[1].uuid), 'entry_date': day(4).isoformat(),
+            'staff_uuid': str(self.ann.uuid), 'staff_name': 'Ann', 'payroll_code': 'P-ANN',
+            'job_number': 'J1', 'job_name': 'Job J1',
+            'task_uuid': str(self.entries[1].task_uuid), 'task_name': 'Work on J1',
+            'minutes': '60', 'billable': 'True', 'note': '',
+        })
+        self.assertEqual((rows[2]['payroll_code'], rows[2]['billable']), ('', 'False'))
+
+    def test_ndjson_filters(self):
+        content, response = self.export('ndjson', staff=str(self.ann.uuid), job='J1', start='2024-03-05')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual([row['minutes'] for row in rows], [90, 15])
+        self.assertEqual({(row['staff_name'], row['payroll_code'], row['job_number']) for row in rows}, {('Ann', 'P-ANN', 'J1')})
+
+        content, _ = self.export('ndjson', job='J9')
+        self.assertEqual(content, '')
+
+    @mock.patch('main.exports.ROWS_PER_CHUNK', 2)
+    def test_streamed_in_chunks(self):
+        response = self.client.get('/api/exports/timesheets/ndjson/', **self.admin_auth)
+        chunks = list(response.streaming_content)
+        self.assertEqual([chunk.count(b'\n') for chunk in chunks], [2, 2])
+
+    def test_scope(self):
+        content, _ = self.export('ndjson', auth=self.manager_auth)
+        self.assertEqual({json.loads(line)['staff_name'] for line in content.splitlines()}, {'Ann'})
+
+        response = self.client.get('/api/exports/timesheets/csv/', **self.member_auth)
+        self.assertEqual(response.status_code, 403)
+
+    def test_errors(self):
+        for path, status in (
+            ('/api/exports/timesheets/xlsx/', 404),
+            ('/api/exports/timesheets/csv/?start=March', 400),
+            ('/api/exports/timesheets/csv/?staff=ann', 400),
+        ):
+            with self.subTest(path=path):
+                self.assertEqual(self.client.get(path, **self.admin_auth).status_code, status)
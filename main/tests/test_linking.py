@@ -0,0 +1,57 @@
+# main/tests/test_linking.py
+
+"""
+main.linking on rows synced ahead of what they reference: they are linked once
+the target arrives, and until then a sync neither rewrites nor counts them.
+"""
+
+import uuid
+from datetime import datetime
+
+from django.test import TestCase
+from django.utils import timezone
+
+from main.linking import link_foreign_keys
+from main.models import Staff, Client, Job, Task, JobAssignedStaff, Timesheet, DataVersion, TaskProgress
+
+NAMES = ['job', 'timesheet', 'jobassignedstaff']
+
+
+class LinkForeignKeysTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.client_uuid, cls.task_uuid, cls.staff_uuid = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+        cls.job = Job.objects.create(uuid=uuid.uuid4(), job_id='J1', name='Job 1', client_uuid=cls.client_uuid)
+        JobAssignedStaff.objects.create(job=cls.job, staff_uuid=cls.staff_uuid, staff_name='Ann')
+        cls.timesheet = Timesheet.objects.create(
+            uuid=uuid.uuid4(), job_number='J2', task_uuid=cls.task_uuid, staff_uuid=cls.staff_uuid,
+            entry_date=timezone.make_aware(datetime(2024, 3, 4, 9)), minutes=60, billable=True,
+        )
+
+    def test_orphans_are_not_counted(self):
+        versions = DataVersion.current(NAMES)
+        for _ in range(2):
+            self.assertEqual(link_foreign_keys(), 0)
+        self.assertEqual(DataVersion.current(NAMES), versions)
+
+        self.timesheet.refresh_from_db()
+        self.assertEqual((self.timesheet.job_id, self.timesheet.task_id, self.timesheet.staff_id), (None, None, None))
+
+    def test_targets_are_linked_when_they_arrive(self):
+        client = Client.objects.create(uuid=self.client_uuid, name='Client')
+        job = Job.objects.create(uuid=uuid.uuid4(), job_id='J2', name='Job 2')
+        task = Task.objects.create(uuid=self.task_uuid, name='Task', job=job, billable=True)
+        staff = Staff.objects.create(uuid=self.staff_uuid, name='Ann', email='ann@example.com')
+
+        versions = DataVersion.current(NAMES)
+        # The job's client, the timesheet's job, task and staff, and the assignment's staff
+        self.assertEqual(link_foreign_keys(), 5)
+        self.assertEqual(self.job, Job.objects.get(client=client))
+        self.timesheet.refresh_from_db()
+        self.assertEqual((self.timesheet.job, self.timesheet.task, self.timesheet.staff), (job, task, staff))
+        self.assertEqual(JobAssignedStaff.objects.get().staff, staff)
+        self.assertEqual(TaskProgress.objects.get(pk=task.pk).actual_minutes, 60)
+        self.assertTrue(all(DataVersion.current(NAMES)[name] > versions[name] for name in NAMES))
+
+        self.assertEqual(link_foreign_keys(), 0)
@@ -0,0 +1,62 @@
+# main/tests/test_metrics.py
+
+"""
+QueryMetricsMiddleware (main.metrics) in both handlers: under ASGI it runs
+on the event loop, without being adapted, and records the same queries as
+under WSGI.
+"""
+
+import re
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.http import HttpResponse
+from django.test import TestCase, override_settings
+
+from main import metrics
+from main.metrics import QueryMetricsMiddleware
+from .data import seed_dataset, create_api_user
+
+
+def server_timing_queries(response):
+    return int(re.search(r'desc="(\d+) queries"', response['Server-Timing']).group(1))
+
+
+class QueryMetricsMiddlewareTests(TestCase):
+    path = '/api/clients/'
+
+    @classmethod
+    def setUpTestData(cls):
+        staff = seed_dataset(staff_count=2, client_count=5, days_of_history=5)
+        cls.user, cls.auth = create_api_user(staff[0])
+        # AsyncClient takes the headers by name
+        cls.headers = {'Authorization': cls.auth['HTTP_AUTHORIZATION']}
+
+    def setUp(self):
+        metrics.reset()
+
+    def test_async_capable(self):
+        async def get_response(request):
+            return HttpResponse()
+
+        self.assertTrue(iscoroutinefunction(QueryMetricsMiddleware(get_response)))
+        self.assertFalse(iscoroutinefunction(QueryMetricsMiddleware(lambda request: HttpResponse())))
+
+    async def test_async_records_the_same_queries(self):
+        sync_response = await sync_to_async(self.client.get)(self.path, **self.auth)
+        queries = server_timing_queries(sync_response)
+        self.assertGreater(queries, 0)
+
+        response = await self.async_client.get(self.path, headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(server_timing_queries(response), queries)
+        endpoint = metrics.snapshot()['endpoints'][f'GET {self.path[1:]}']
+        self.assertEqual((endpoint['requests'], endpoint['max_queries']), (2, queries))
+
+    @override_settings(SLOW_QUERY_MS=0)
+    async def test_slow_queries_explained_under_asgi(self):
+        with self.assertLogs('main.metrics', 'WARNING') as logs:
+            response = await self.async_client.get(self.path, headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        slow = [message for message in logs.output if 'Slow query' in message]
+        self.assertEqual(len(slow), server_timing_queries(response))
+        self.assertTrue(all('plan:' in message for message in slow[:metrics.MAX_EXPLAINS]))
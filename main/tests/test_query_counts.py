@@ -0,0 +1,230 @@
+# main/tests/test_query_counts.py
+
+"""
+Query-count contract: every URL in main/urls.py issues exactly the number of
+queries listed in QUERY_COUNTS, at two data scales. A count that changes, or
+that differs between the scales, means a query was added (or an N+1 crept
+in); update the table only when the new count is intended and doesn't depend
+on the amount of data.
+
+The in-process indexes (analytics cube, schedule, autocomplete) are counted
+warm: loaded once, then checked against the change log on every request,
+with no change still waiting to settle (which adds a query, see
+main.changelog).
+"""
+
+import json
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from main import urls as main_urls
+from main.analytics import get_cube
+from main.autocomplete import get_autocomplete
+from main.models import Client, Job, Timesheet
+from main.schedule import get_schedule
+from .data import seed_dataset, create_api_user
+
+# url name -> queries, for the requests in QueryCountContract.requests()
+QUERY_COUNTS = {
+    'check-staff-email': 2,
+    'all_jobs': 3,
+    'my-jobs': 3,
+    'job-detail': 4,
+    'job-tasks': 4,
+    'client-list': 3,
+    'toggle-client-favorite': 11,
+    'submit-timesheet': 34,
+    'staff-weekly-hours-date': 3,
+    'staff-weekly-hours-date (POST)': 13,
+    'staff-hours-summary': 4,
+    'team-weekly-hours': 4,
+    'timesheet-gaps': 4,
+    'staff-capacity': 6,
+    'schedule-availability': 4,
+    'schedule-conflicts': 4,
+    'search': 4,
+    'autocomplete': 2,
+    'bootstrap': 9,
+    'timesheet-list': 3,
+    'export-timesheets': 2,
+    'timesheet-analytics': 4,
+    'all-contacts': 3,
+    'client-detail': 3,
+    'client-jobs': 3,
+    'client-contacts': 3,
+    'admin-staff-list': 3,
+    'admin-staff-detail': 3,
+    'changes-since': 4,
+    'request-metrics': 1,
+}
+
+# Managers' reports are scoped to their team (see reports.team_staff), a different path from admins'
+MANAGER_QUERY_COUNTS = {
+    'team-weekly-hours': 5,
+    'timesheet-gaps': 5,
+    'staff-capacity': 7,
+    'timesheet-analytics': 6,
+}
+
+# submit_timesheet writes, which grow with the entries submitted but not with the data
+# already there: each entry is looked up, written, and applied to the rollups, summaries,
+# change log and data versions
+SUBMIT_QUERY_COUNTS = {
+    'one new entry': 22,
+    'three new entries': 43,
+    'three updated entries': 24,
+}
+
+# Authentication, on top of the endpoint's own queries
+AUTH_QUERY_COUNTS = {
+    # Token with the profile claims: the user's is_active flag
+    'claims': 1,
+    # Token issued before the claims: the user and its profile
+    'legacy': 2,
+    'login': 2,
+    'refresh': 1,
+}
+
+
+class QueryCountContract:
+    scale = {}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = seed_dataset(**cls.scale)
+        cls.member = cls.staff[1]
+        cls.user, cls.auth = create_api_user(cls.member, role='ADMIN')
+        cls.manager = cls.staff[2]
+        Job.objects.filter(client__in=Client.objects.order_by('pk')[:3]).update(manager_uuid=cls.manager.uuid)
+        cls.manager_user, cls.manager_auth = create_api_user(cls.manager, role='MANAGER')
+        # A task the member has logged time on, so its rollup rows exist at either scale
+        cls.task = Timesheet.objects.filter(staff_uuid=cls.member.uuid).order_by('entry_date').first().task
+        cls.job = cls.task.job
+        cls.client_obj = cls.job.client
+
+    def setUp(self):
+        # Indexes loaded by another test class hold rows that have been rolled back
+        for index in (get_cube(), get_schedule(), get_autocomplete()):
+            with index._lock:
+                index.loaded = False
+
+    def requests(self):
+        """url name -> (method, path, extra client kwargs)"""
+        member, job, client = self.member.uuid, self.job.job_id, self.client_obj
+        # Days before the seeded history, so the entries are new
+        weekly_post = {'entries': [{
+            'task_uuid': str(self.task.uuid), 'job_id': job,
+            'entries': [{'date': '2023-12-27', 'hours': 1, 'notes': []}],
+        }]}
+        as_json = lambda data: {'data': json.dumps(data), 'content_type': 'application/json'}
+        return {
+            'check-staff-email': ('post', '/auth/check-staff-email/', {'data': {'email': self.member.email}}),
+            'all_jobs': ('get', '/api/jobs/all/', {}),
+            'my-jobs': ('get', f'/api/jobs/my-jobs/{member}/', {}),
+            'job-detail': ('get', f'/api/jobs/{job}/', {}),
+            'job-tasks': ('get', f'/api/jobs/{job}/tasks/', {}),
+            'client-list': ('get', '/api/clients/', {}),
+            'toggle-client-favorite': ('patch', f'/api/clients/{client.uuid}/favorite/', {}),
+            'submit-timesheet': ('post', f'/api/staff/{member}/weekly-hours/', as_json(self.submission())),
+            'staff-weekly-hours-date': ('get', f'/api/staff/{member}/weekly-hours/2024-01-08/', {}),
+            'staff-weekly-hours-date (POST)': (
+                'post', f'/api/staff/{member}/weekly-hours/2024-01-08/', as_json(weekly_post)
+            ),
+            'staff-hours-summary': ('get', f'/api/staff/{member}/hours-summary/?start=2024-01-01&end=2024-01-28', {}),
+            'team-weekly-hours': ('get', '/api/reports/team-weekly-hours/?week_start=2024-01-08&weeks=2', {}),
+            'timesheet-gaps': ('get', '/api/reports/timesheet-gaps/?start=2024-01-08&end=2024-01-19', {}),
+            'staff-capacity': ('get', '/api/reports/capacity/?start=2024-01-08&end=2024-01-19', {}),
+            'schedule-availability': ('get', '/api/schedule/availability/?start=2024-01-08&end=2024-01-19', {}),
+            'schedule-conflicts': ('get', '/api/schedule/conflicts/?start=2024-01-08&end=2024-01-19', {}),
+            'search': ('get', '/api/search/?q=client', {}),
+            'autocomplete': ('get', '/api/autocomplete/?q=job', {}),
+            'bootstrap': ('get', '/api/bootstrap/?week_start=2024-01-08', {}),
+            'timesheet-list': ('get', f'/api/timesheets/?staff={member}&limit=50', {}),
+            'export-timesheets': ('get', '/api/exports/timesheets/csv/?start=2024-01-01&end=2024-01-31', {}),
+            'timesheet-analytics': ('get', '/api/analytics/timesheets/?group_by=job,week', {}),
+            'all-contacts': ('get', '/api/contacts/', {}),
+            'client-detail': ('get', f'/api/clients/{client.uuid}/', {}),
+            'client-jobs': ('get', f'/api/clients/{client.uuid}/jobs/', {}),
+            'client-contacts': ('get', f'/api/clients/{client.pk}/contacts/', {}),
+            'admin-staff-list': ('get', '/api/admin/staff/', {}),
+            'admin-staff-detail': ('get', f'/api/admin/staff/{member}/', {}),
+            'changes-since': ('get', '/api/changes/?since=0', {}),
+            'request-metrics': ('get', '/api/metrics/', {}),
+        }
+
+    def submission(self, days=('2023-12-28', '2023-12-29')):
+        return {'entries': [{
+            'task_uuid': str(self.task.uuid), 'job_id': self.job.job_id,
+            'entries': [{'date': f'{day}T00:00:00Z', 'hours': 2, 'notes': ['note']} for day in days],
+        }]}
+
+    def count_queries(self, method, path, auth=None, **kwargs):
+        with CaptureQueriesContext(connection) as ctx:
+            response = getattr(self.client, method)(path, **(self.auth if auth is None else auth), **kwargs)
+            content = b''.join(response.streaming_content) if response.streaming else response.content
+        self.assertLess(response.status_code, 300, f'{method.upper()} {path}: {content[:500]}')
+        return len(ctx.captured_queries), response
+
+    def test_every_url_has_a_count(self):
+        names = {pattern.name for pattern in main_urls.urlpatterns}
+        self.assertEqual(names - {name.split(' ')[0] for name in QUERY_COUNTS}, set())
+        self.assertEqual(set(QUERY_COUNTS), set(self.requests()))
+
+    @override_settings(ANALYTICS_REFRESH_INTERVAL=0, CHANGE_LOG_SETTLE_SECONDS=0)
+    def test_endpoint_query_counts(self):
+        for name, (method, path, kwargs) in self.requests().items():
+            with self.subTest(name):
+                if method == 'get':
+                    # Warm the in-process indexes
+                    self.count_queries(method, path, **kwargs)
+                queries, _ = self.count_queries(method, path, **kwargs)
+                self.assertEqual(queries, QUERY_COUNTS[name], f'{method.upper()} {path}')
+
+    def test_submit_timesheet_query_counts(self):
+        # Days before the seeded history: a week with no entries yet, then the same days again
+        path = f'/api/staff/{self.member.uuid}/weekly-hours/'
+        submit = lambda days: self.count_queries(
+            'post', path, data=json.dumps(self.submission(days)), content_type='application/json'
+        )[0]
+        self.assertEqual(submit(('2023-12-11',)), SUBMIT_QUERY_COUNTS['one new entry'])
+        days = ('2023-12-18', '2023-12-19', '2023-12-20')
+        self.assertEqual(submit(days), SUBMIT_QUERY_COUNTS['three new entries'])
+        self.assertEqual(submit(days), SUBMIT_QUERY_COUNTS['three updated entries'])
+
+    @override_settings(ANALYTICS_REFRESH_INTERVAL=0, CHANGE_LOG_SETTLE_SECONDS=0)
+    def test_manager_scope_query_counts(self):
+        for name, expected in MANAGER_QUERY_COUNTS.items():
+            method, path, kwargs = self.requests()[name]
+            with self.subTest(name):
+                self.count_queries(method, path, auth=self.manager_auth, **kwargs)
+                queries, _ = self.count_queries(method, path, auth=self.manager_auth, **kwargs)
+                self.assertEqual(queries, expected, path)
+
+    def test_authentication_query_counts(self):
+        path = '/api/metrics/'
+        queries, _ = self.count_queries('get', path)
+        self.assertEqual(queries, AUTH_QUERY_COUNTS['claims'])
+
+        legacy = {'HTTP_AUTHORIZATION': f'JWT {RefreshToken.for_user(self.user).access_token}'}
+        queries, _ = self.count_queries('get', path, auth=legacy)
+        self.assertEqual(queries, AUTH_QUERY_COUNTS['legacy'])
+
+        self.user.set_password('password')
+        self.user.save()
+        queries, response = self.count_queries(
+            'post', '/auth/jwt/create/', auth={}, data={'username': self.user.username, 'password': 'password'}
+        )
+        self.assertEqual(queries, AUTH_QUERY_COUNTS['login'])
+        queries, _ = self.count_queries('post', '/auth/jwt/refresh/', auth={}, data={'refresh': response.json()['refresh']})
+        self.assertEqual(queries, AUTH_QUERY_COUNTS['refresh'])
+
+
+class SmallDatasetQueryCountTests(QueryCountContract, TestCase):
+    scale = dict(staff_count=4, client_count=8, days_of_history=20)
+
+
+class LargeDatasetQueryCountTests(QueryCountContract, TestCase):
+    scale = dict(staff_count=15, client_count=60, days_of_history=90)
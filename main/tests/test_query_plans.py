@@ -0,0 +1,151 @@
+# main/tests/test_query_plans.py
+
+"""
+Query-plan regression suite: seeds a synthetic dataset, calls each filtered
+endpoint and asserts via EXPLAIN that none of its SELECTs falls back to a full
+table scan. Plans are backend specific, so this runs on SQLite and PostgreSQL
+and is skipped elsewhere (Django has no EXPLAIN support for SQL Server).
+"""
+
+import re
+from unittest import skipUnless
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from main.models import Client, Contact, Job, Task
+from .data import seed_dataset, create_api_user
+
+# Plan lines that mean "read the whole table"
+FULL_SCAN_PATTERNS = {
+    'sqlite': re.compile(r'^SCAN (?P<table>\w+)(?! USING (?:COVERING )?INDEX \w+ \()'),
+    'postgresql': re.compile(r'Seq Scan on (?P<table>\w+)'),
+}
+
+
+@skipUnless(connection.vendor in FULL_SCAN_PATTERNS, 'EXPLAIN checks only run on SQLite/PostgreSQL')
+class QueryPlanTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = seed_dataset(staff_count=40, client_count=150, days_of_history=180)
+        cls.member = cls.staff[3]
+        cls.user, cls.auth = create_api_user(cls.member, role='ADMIN')
+        # Other logins (each with a profile), so the statistics don't make scanning
+        # auth_user / main_userprofile look as cheap as a lookup
+        for number in range(50):
+            User.objects.create_user(username=f'other-{number}')
+        cls.client_obj = Client.objects.order_by('pk')[7]
+        cls.job = Job.objects.filter(client=cls.client_obj).order_by('pk').first()
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                return [row[-1] for row in cursor.fetchall()]
+            cursor.execute(f'EXPLAIN {sql}')
+            return [row[0] for row in cursor.fetchall()]
+
+    def assertNoFullScans(self, method, url, auth=None, **extra):
+        with CaptureQueriesContext(connection) as ctx:
+            response = getattr(self.client, method)(url, **(auth or self.auth), **extra)
+        self.assertLess(response.status_code, 300, response.content)
+
+        pattern = FULL_SCAN_PATTERNS[connection.vendor]
+        for query in ctx.captured_queries:
+            sql = query['sql']
+            if not sql.lstrip().upper().startswith('SELECT'):
+                continue
+            for line in self.explain(sql):
+                match = pattern.search(line.strip())
+                self.assertIsNone(
+                    match, f'{url}: full scan of {match and match.group("table")}\n{sql}\n{line}'
+                )
+
+    def test_my_jobs(self):
+        self.assertNoFullScans('get', f'/api/jobs/my-jobs/{self.member.uuid}/')
+
+    def test_weekly_hours(self):
+        self.assertNoFullScans('get', f'/api/staff/{self.member.uuid}/weekly-hours/2024-03-04/')
+
+    def test_hours_summary(self):
+        self.assertNoFullScans('get', f'/api/staff/{self.member.uuid}/hours-summary/?start=2024-03-04&end=2024-03-31')
+
+    def test_team_weekly_hours(self):
+        # Admins see every staff member, so check the scoped (manager) path
+        manager = self.staff[5]
+        Job.objects.filter(client=self.client_obj).update(manager_uuid=manager.uuid)
+        _, auth = create_api_user(manager, role='MANAGER')
+        self.assertNoFullScans('get', '/api/reports/team-weekly-hours/?week_start=2024-03-04&weeks=2', auth=auth)
+
+    def test_timesheet_gaps(self):
+        manager = self.staff[5]
+        Job.objects.filter(client=self.client_obj).update(manager_uuid=manager.uuid)
+        _, auth = create_api_user(manager, role='MANAGER')
+        self.assertNoFullScans('get', '/api/reports/timesheet-gaps/?start=2024-03-04&end=2024-03-15', auth=auth)
+
+    def test_export_timesheets(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/exports/timesheets/csv/?start=2024-03-04&end=2024-03-08', **self.auth)
+            b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, 200)
+        for line in self.explain(ctx.captured_queries[-1]['sql']):
+            self.assertIsNone(FULL_SCAN_PATTERNS[connection.vendor].search(line.strip()), line)
+
+    def test_staff_capacity(self):
+        manager = self.staff[5]
+        Job.objects.filter(client=self.client_obj).update(manager_uuid=manager.uuid)
+        _, auth = create_api_user(manager, role='MANAGER')
+        self.assertNoFullScans('get', '/api/reports/capacity/?start=2024-03-04&end=2024-03-31', auth=auth)
+
+    def test_search(self):
+        self.assertNoFullScans('get', '/api/search/?q=client%2000&limit=10')
+
+    def test_bootstrap(self):
+        # clients / contacts are the full lists, read in index order
+        self.assertNoFullScans('get', '/api/bootstrap/?sections=user,jobs,week,recent_tasks&week_start=2024-03-04')
+
+    def test_filtered_job_list(self):
+        self.assertNoFullScans('get', '/api/jobs/all/?state=In%20Progress&due_from=2024-07-01&ordering=due_date&limit=20')
+        self.assertNoFullScans('get', f'/api/jobs/all/?client={self.client_obj.uuid}')
+
+    def test_filtered_contacts(self):
+        self.assertNoFullScans('get', f'/api/contacts/?client={self.client_obj.uuid}')
+
+    def test_timesheet_list(self):
+        self.assertNoFullScans('get', f'/api/timesheets/?staff={self.member.uuid}&start=2024-03-04&end=2024-03-31&limit=20')
+        self.assertNoFullScans('get', f'/api/timesheets/?job={self.job.job_id}&limit=20')
+
+    def test_job_detail(self):
+        self.assertNoFullScans('get', f'/api/jobs/{self.job.job_id}/')
+
+    def test_job_tasks(self):
+        self.assertNoFullScans('get', f'/api/jobs/{self.job.job_id}/tasks/')
+
+    def test_client_detail(self):
+        self.assertNoFullScans('get', f'/api/clients/{self.client_obj.uuid}/')
+
+    def test_client_jobs(self):
+        self.assertNoFullScans('get', f'/api/clients/{self.client_obj.uuid}/jobs/')
+
+    def test_client_contacts(self):
+        self.assertNoFullScans('get', f'/api/clients/{self.client_obj.pk}/contacts/')
+
+    def test_admin_staff_detail(self):
+        self.assertNoFullScans('get', f'/api/admin/staff/{self.member.uuid}/')
+
+    def test_check_staff_email(self):
+        self.assertNoFullScans('post', '/auth/check-staff-email/', data={'email': self.member.email})
+
+    def test_submit_timesheet(self):
+        task = Task.objects.filter(job=self.job).first()
+        payload = {'entries': [{
+            'task_uuid': str(task.uuid), 'job_id': self.job.job_id,
+            'entries': [{'date': '2024-03-05T00:00:00Z', 'hours': 2, 'notes': []}],
+        }]}
+        self.assertNoFullScans('post', f'/api/staff/{self.member.uuid}/weekly-hours/',
+                               data=payload, content_type='application/json')
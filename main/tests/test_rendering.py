@@ -0,0 +1,135 @@
+# main/tests/test_rendering.py
+
+"""
+Response encoding: FastJSONRenderer against DRF's JSONRenderer, and the
+ETag / Vary headers of compressed responses (main.middleware).
+"""
+
+import datetime
+import decimal
+import gzip
+import json
+import uuid
+from unittest import skipIf
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from main import middleware
+from main.renderers import FastJSONRenderer, orjson
+from .data import seed_dataset, create_api_user
+
+
+class FastJSONRendererTests(TestCase):
+
+    def test_matches_json_renderer(self):
+        payloads = [
+            {
+                'uuid': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+                'utc': datetime.datetime(2024, 1, 2, 3, 4, 5, 678000, tzinfo=datetime.timezone.utc),
+                'local': timezone.localtime(datetime.datetime(2024, 6, 1, 12, tzinfo=datetime.timezone.utc)),
+                'naive': datetime.datetime(2024, 1, 2, 3, 4),
+                'date': datetime.date(2024, 2, 29),
+                'time': datetime.time(9, 30),
+                'decimal': decimal.Decimal('1234.5000'),
+                'numbers': [0, -1, 2 ** 63 - 1, 1.5, 0.1, True, False, None],
+                'text': 'Māori café     "quoted" \\ </script>',
+                'nested': {'empty': [], 'tuple': (1, 2), 'dict': {}},
+            },
+            [{'a': 1}, {'b': [None]}],
+            # Beyond 64 bits: orjson rejects it, so it goes through DRF
+            {'big': 2 ** 64},
+            'plain',
+            {1: 'int key', None: 'null key'},
+        ]
+        for payload in payloads:
+            with self.subTest(payload=payload):
+                self.assertEqual(FastJSONRenderer().render(payload), JSONRenderer().render(payload))
+
+    def test_indented_output_is_drfs(self):
+        payload = {'a': [1, 2]}
+        media_type = 'application/json; indent=2'
+        self.assertEqual(
+            FastJSONRenderer().render(payload, media_type), JSONRenderer().render(payload, media_type)
+        )
+
+    @skipIf(orjson is None, "orjson not installed")
+    def test_documented_differences(self):
+        # Exponents: spelt differently, same value
+        floats = [1e-7, 1.5e300, -2.5e-12]
+        self.assertEqual(FastJSONRenderer().render(floats), b'[1e-7,1.5e300,-2.5e-12]')
+        self.assertEqual(json.loads(FastJSONRenderer().render(floats)), json.loads(JSONRenderer().render(floats)))
+        # NaN / infinity: null instead of DRF's ValueError
+        self.assertEqual(FastJSONRenderer().render([float('nan'), float('inf')]), b'[null,null]')
+        with self.assertRaises(ValueError):
+            JSONRenderer().render([float('nan')])
+        # UUID keys: rendered instead of DRF's TypeError
+        key = uuid.UUID(int=1)
+        self.assertEqual(json.loads(FastJSONRenderer().render({key: 1})), {str(key): 1})
+        with self.assertRaises(TypeError):
+            JSONRenderer().render({key: 1})
+
+
+@override_settings(COMPRESSION_MIN_SIZE=200)
+class CompressionMiddlewareTests(TestCase):
+    path = '/api/clients/'
+
+    @classmethod
+    def setUpTestData(cls):
+        staff = seed_dataset(staff_count=2, client_count=10, days_of_history=5)
+        cls.user, cls.auth = create_api_user(staff[0])
+
+    def get(self, accept_encoding, **headers):
+        return self.client.get(self.path, HTTP_ACCEPT_ENCODING=accept_encoding, **headers, **self.auth)
+
+    def assertVaries(self, response, *headers):
+        varies = {header.strip().lower() for header in response['Vary'].split(',')}
+        self.assertTrue({header.lower() for header in headers} <= varies, response['Vary'])
+
+    def test_gzip_weakens_the_etag(self):
+        plain = self.get('identity')
+        response = self.get('gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertEqual(response['ETag'], 'W/' + plain['ETag'])
+        self.assertVaries(response, 'Accept-Encoding', 'Authorization')
+        # The weak ETag still revalidates
+        self.assertEqual(self.get('gzip', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_uncompressed_keeps_the_strong_etag(self):
+        for accept_encoding in ('identity', 'gzip;q=0, identity', ''):
+            with self.subTest(accept_encoding=accept_encoding):
+                response = self.get(accept_encoding)
+                self.assertNotIn('Content-Encoding', response)
+                self.assertTrue(response['ETag'].startswith('"'))
+                # Compressible, so caches must still key on Accept-Encoding
+                self.assertVaries(response, 'Accept-Encoding', 'Authorization')
+
+    def test_small_responses_are_left_alone(self):
+        with override_settings(COMPRESSION_MIN_SIZE=10 ** 9):
+            response = self.get('gzip, br')
+        self.assertNotIn('Content-Encoding', response)
+        self.assertTrue(response['ETag'].startswith('"'))
+
+    @skipIf(middleware.brotli is None, "brotli not installed")
+    def test_brotli_weakens_the_etag(self):
+        plain = self.get('identity')
+        response = self.get('gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(middleware.brotli.decompress(response.content), plain.content)
+        self.assertEqual(response['ETag'], 'W/' + plain['ETag'])
+        self.assertVaries(response, 'Accept-Encoding', 'Authorization')
+
+    @skipIf(middleware.brotli is None, "brotli not installed")
+    def test_brotli_is_padded(self):
+        plain = self.get('identity')
+        lengths = set()
+        for _ in range(10):
+            response = self.get('br')
+            decompressor = middleware.brotli.Decompressor()
+            self.assertEqual(decompressor.process(response.content), plain.content)
+            self.assertTrue(decompressor.is_finished())
+            lengths.add(len(response.content))
+        # As gzip's: a random length, not just the content's
+        self.assertGreater(len(lengths), 1)
@@ -0,0 +1,235 @@
+# main/tests/test_reports.py
+
+"""
+The team reports (main.reports) on hand-built data: who a manager's team is,
+including a manager not yet linked to a staff record, whose team must be
+empty rather than everyone on the unmanaged jobs; which days the gaps report
+flags; and what the capacity report counts as allocated and logged.
+"""
+
+import io
+import json
+import uuid
+from datetime import date, datetime
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from main.authentication import ProfileTokenObtainPairSerializer
+from main.models import Staff, Job, JobAssignedStaff, Task, TaskAssignedStaff
+from main.reports import team_staff
+from .data import create_api_user, create_timesheet
+
+
+def day(d, hour=9):
+    return timezone.make_aware(datetime(2024, 3, d, hour))
+
+
+def create_job(number, manager=None, staff=()):
+    job = Job.objects.create(
+        uuid=uuid.uuid4(), job_id=number, name=f'Job {number}', manager_uuid=manager.uuid if manager else None,
+        start_date=day(1), due_date=day(29),
+    )
+    for member in staff:
+        JobAssignedStaff.objects.create(job=job, staff_uuid=member.uuid, staff=member, staff_name=member.name)
+    return Task.objects.create(uuid=uuid.uuid4(), name=f'Work on {number}', job=job, billable=True)
+
+
+class TeamScopeTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ann, cls.bob, cls.cat = (
+            Staff.objects.create(name=name, email=f'{name.lower()}@example.com') for name in ('Ann', 'Bob', 'Cat')
+        )
+        unmanaged = create_job('J0', staff=[cls.ann])
+        managed = create_job('J1', manager=cls.bob, staff=[cls.cat])
+        create_timesheet(cls.ann, unmanaged, day(4), 240)
+        create_timesheet(cls.cat, managed, day(4), 120)
+
+        cls.manager, cls.manager_auth = create_api_user(cls.bob, role='MANAGER')
+        # A manager not linked to a staff record yet
+        cls.unlinked = User.objects.create_user(username='unlinked-manager', password='password')
+        cls.unlinked.profile.role = 'MANAGER'
+        cls.unlinked.profile.save()
+        token = ProfileTokenObtainPairSerializer.get_token(cls.unlinked).access_token
+        cls.unlinked_auth = {'HTTP_AUTHORIZATION': f'JWT {token}'}
+
+    def get(self, path, auth, **params):
+        response = self.client.get(path, params, **auth)
+        self.assertEqual(response.status_code, 200, None if response.streaming else response.content)
+        return response
+
+    def test_team_staff(self):
+        self.assertEqual({member.name for member in team_staff(self.manager.profile)}, {'Bob', 'Cat'})
+        self.assertEqual(list(team_staff(self.unlinked.profile)), [])
+
+    @override_settings(ANALYTICS_REFRESH_INTERVAL=0)
+    def test_unlinked_manager_sees_nobody(self):
+        for auth, names in ((self.manager_auth, {'Bob', 'Cat'}), (self.unlinked_auth, set())):
+            with self.subTest(names=names):
+                grid = self.get('/api/reports/team-weekly-hours/', auth, week_start='2024-03-04').json()
+                self.assertEqual({row['name'] for row in grid['staff']}, names)
+                schedule = self.get('/api/schedule/availability/', auth, start='2024-03-04', end='2024-03-08').json()
+                self.assertEqual({row['name'] for row in schedule['free'] + schedule['busy']}, names)
+
+                expected = {'Cat'} if names else set()
+                rows = self.get('/api/timesheets/', auth).json()['results']
+                self.assertEqual({row['staff_name'] for row in rows}, expected)
+                analytics = self.get('/api/analytics/timesheets/', auth, group_by='staff').json()
+                self.assertEqual(sum(row['minutes'] for row in analytics['rows']), 120 if names else 0)
+                export = self.get('/api/exports/timesheets/csv/', auth)
+                self.assertEqual(b''.join(export.streaming_content).count(b'\n'), 2 if names else 1)
+
+
+# Wednesday of the second week of March 2024
+TODAY = date(2024, 3, 13)
+
+
+@mock.patch('django.utils.timezone.localdate', return_value=TODAY)
+class TimesheetGapsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ann, cls.bob, cls.cat = (
+            Staff.objects.create(name=name, email=f'{name.lower()}@example.com') for name in ('Ann', 'Bob', 'Cat')
+        )
+        task = create_job('J1', staff=[cls.ann, cls.bob])
+        weekdays = [4, 5, 6, 7, 8, 11, 12, 13]
+        for d in weekdays:
+            create_timesheet(cls.bob, task, day(d), 450)
+        # Ann: nothing on the 6th or today, 4h on the 7th, and a full day split in two on the 11th
+        for d in (4, 5, 8, 12):
+            create_timesheet(cls.ann, task, day(d), 480)
+        create_timesheet(cls.ann, task, day(7), 240)
+        create_timesheet(cls.ann, task, day(11), 200)
+        create_timesheet(cls.ann, task, day(11, hour=14), 250)
+        # Weekend work doesn't make up for a missing weekday, and isn't expected
+        create_timesheet(cls.ann, task, day(9), 480)
+        # After today: neither counted nor expected yet
+        create_timesheet(cls.ann, task, day(14), 60)
+        # Cat has logged nothing at all
+
+        cls.admin, cls.admin_auth = create_api_user(cls.bob, role='ADMIN')
+        cls.member, cls.member_auth = create_api_user(cls.ann)
+
+    def report(self, **params):
+        response = self.client.get('/api/reports/timesheet-gaps/', params, **self.admin_auth)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_missing_and_under_filled_days(self, localdate):
+        report = self.report(start='2024-03-04', end='2024-03-17')
+        self.assertEqual(report['end'], '2024-03-17')
+        rows = {row['name']: row for row in report['staff']}
+        # Bob filled every weekday
+        self.assertEqual(set(rows), {'Ann', 'Cat'})
+
+        ann = rows['Ann']
+        self.assertEqual(ann['missing_days'], ['2024-03-06', '2024-03-13'])
+        self.assertEqual(ann['under_filled_days'], [{'date': '2024-03-07', 'hours': 4.0}])
+        # Weekdays up to and including today
+        self.assertEqual(ann['expected_hours'], 8 * 7.5)
+        self.assertEqual(ann['logged_hours'], (4 * 480 + 240 + 450) / 60)
+
+        cat = rows['Cat']
+        self.assertEqual(cat['missing_days'], [
+            '2024-03-04', '2024-03-05', '2024-03-06', '2024-03-07', '2024-03-08',
+            '2024-03-11', '2024-03-12', '2024-03-13',
+        ])
+        self.assertEqual((cat['under_filled_days'], cat['logged_hours']), ([], 0))
+
+    def test_min_hours(self, localdate):
+        rows = {row['name']: row for row in self.report(start='2024-03-04', end='2024-03-08', min_hours=8)['staff']}
+        self.assertEqual(set(rows), {'Ann', 'Bob', 'Cat'})
+        self.assertEqual([d['date'] for d in rows['Ann']['under_filled_days']], ['2024-03-07'])
+        self.assertEqual(len(rows['Bob']['under_filled_days']), 5)
+
+    def test_defaults_to_last_week(self, localdate):
+        report = self.report()
+        self.assertEqual((report['start'], report['end']), ('2024-03-04', '2024-03-08'))
+        rows = {row['name']: row for row in report['staff']}
+        self.assertEqual(rows['Ann']['missing_days'], ['2024-03-06'])
+
+    def test_errors(self, localdate):
+        for params in ({'start': '2024-03-08', 'end': '2024-03-04'}, {'start': 'March'}, {'min_hours': 'all'}):
+            with self.subTest(params=params):
+                response = self.client.get('/api/reports/timesheet-gaps/', params, **self.admin_auth)
+                self.assertEqual(response.status_code, 400)
+        response = self.client.get('/api/reports/timesheet-gaps/', **self.member_auth)
+        self.assertEqual(response.status_code, 403)
+
+    def test_command(self, localdate):
+        out = io.StringIO()
+        call_command('timesheet_gaps', '--json', stdout=out)
+        gaps = json.loads(out.getvalue())
+        self.assertEqual({row['name']: row['missing_days'] for row in gaps}, {
+            'Ann': ['2024-03-06'],
+            'Cat': ['2024-03-04', '2024-03-05', '2024-03-06', '2024-03-07', '2024-03-08'],
+        })
+
+        out = io.StringIO()
+        call_command('timesheet_gaps', '--start', '2024-03-11', '--end', '2024-03-15', stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[0], 'Ann <ann@example.com>: 15.5/22.5h; missing: 2024-03-13; under-filled: -')
+        self.assertIn('2 staff with gaps between 2024-03-11 and 2024-03-15', lines[-1])
+
+
+class StaffCapacityTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ann, cls.bob, cls.cat = (
+            Staff.objects.create(name=name, email=f'{name.lower()}@example.com') for name in ('Ann', 'Bob', 'Cat')
+        )
+        allocated = create_job('J1', staff=[cls.ann, cls.cat])
+        overrun = Task.objects.create(uuid=uuid.uuid4(), name='Overrun', job=allocated.job, billable=True)
+        completed = Task.objects.create(uuid=uuid.uuid4(), name='Done', job=allocated.job, completed=True)
+        finished = create_job('J2', staff=[cls.ann])
+        Job.objects.filter(pk=finished.job.pk).update(completed_date=day(8))
+        for task, member, minutes in (
+            (allocated, cls.ann, 600), (overrun, cls.ann, 300), (completed, cls.ann, 500), (finished, cls.ann, 200),
+            (allocated, cls.cat, 3000),
+        ):
+            TaskAssignedStaff.objects.create(
+                task=task, staff_uuid=member.uuid, staff_name=member.name, allocated_minutes=minutes,
+            )
+
+        create_timesheet(cls.ann, allocated, day(4), 240)
+        create_timesheet(cls.ann, allocated, day(12), 120)
+        # After the window: neither logged in it nor against the allocation yet
+        create_timesheet(cls.ann, allocated, day(20), 60)
+        create_timesheet(cls.ann, overrun, day(11), 400)
+        create_timesheet(cls.ann, completed, day(13), 30)
+
+        cls.admin, cls.admin_auth = create_api_user(cls.bob, role='ADMIN')
+
+    def test_allocated_vs_logged(self):
+        response = self.client.get('/api/reports/capacity/', {'start': '2024-03-11', 'end': '2024-03-17'}, **self.admin_auth)
+        self.assertEqual(response.status_code, 200, response.content)
+        rows = {row['name']: row for row in response.json()['staff']}
+        # The completed task and the job finished before the window are left out
+        self.assertEqual(rows['Ann'], {
+            'staff_uuid': str(self.ann.uuid),
+            'name': 'Ann',
+            'open_tasks': 2,
+            'allocated_minutes': 900,
+            'logged_on_allocated_minutes': 240 + 120 + 400,
+            # The overrun on one task doesn't eat into what's left on the other
+            'remaining_minutes': 600 - 360,
+            'logged_minutes': 120 + 400 + 30,
+            'capacity_minutes': 5 * 450,
+            'utilisation': round(550 / 2250, 4),
+            'over_allocated': False,
+        })
+        self.assertEqual(
+            (rows['Bob']['open_tasks'], rows['Bob']['allocated_minutes'], rows['Bob']['logged_minutes']), (0, 0, 0)
+        )
+        self.assertEqual((rows['Cat']['remaining_minutes'], rows['Cat']['over_allocated']), (3000, True))
+
+        response = self.client.get('/api/reports/capacity/', {'start': '2024-03-11', 'end': '2024-03-15', 'daily_hours': 10}, **self.admin_auth)
+        rows = {row['name']: row for row in response.json()['staff']}
+        self.assertEqual((rows['Cat']['capacity_minutes'], rows['Cat']['over_allocated']), (3000, False))
@@ -0,0 +1,157 @@
+# main/tests/test_rollups.py
+
+"""
+The rollups and summaries maintained from the timesheet signals
+(main.rollups, main.summaries) must match a rebuild from the raw tables after
+any sequence of writes, including a first write that races another writer
+creating the same row.
+"""
+
+from datetime import datetime
+from importlib import import_module
+from unittest import mock
+
+from django.apps import apps
+
+from django.test import TestCase
+from django.utils import timezone
+
+from main import rollups, summaries
+from main.models import Task, Timesheet, TaskProgress, JobProgress, StaffDaySummary, StaffWeekJobSummary
+from .data import seed_dataset, create_timesheet
+
+
+def entry(member, task, day, minutes, billable=True):
+    return create_timesheet(member, task, timezone.make_aware(datetime(2024, 2, day, 9)), minutes, billable)
+
+
+class RollupMaintenanceTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = seed_dataset(staff_count=2, client_count=2, days_of_history=5)
+        cls.member = cls.staff[0]
+        cls.tasks = list(Task.objects.select_related('job').order_by('job__job_id', 'name'))
+        # Two tasks of one job and one of another
+        cls.task, cls.sibling = [task for task in cls.tasks if task.job_id == cls.tasks[0].job_id][:2]
+        cls.other = next(task for task in cls.tasks if task.job_id != cls.task.job_id)
+
+    def assertConsistent(self):
+        self.assertEqual(rollups.rebuild_progress(repair=False), 0)
+        self.assertEqual(summaries.rebuild_summaries(repair=False), 0)
+
+    def test_migration_backfills_the_rollups(self):
+        backfill = import_module('main.migrations.0021_backfill_progress_rollups').backfill_progress
+        # One row the signals created after the tables were added, the rest missing
+        TaskProgress.objects.exclude(pk=self.task.pk).delete()
+        JobProgress.objects.all().delete()
+        self.assertGreater(rollups.rebuild_progress(repair=False), 0)
+        backfill(apps, None)
+        self.assertEqual(rollups.rebuild_progress(repair=False), 0)
+
+    def test_migration_backfills_the_summaries(self):
+        backfill = import_module('main.migrations.0022_backfill_timesheet_summaries').backfill_summaries
+        StaffDaySummary.objects.exclude(staff_uuid=self.member.uuid).delete()
+        StaffWeekJobSummary.objects.all().delete()
+        self.assertGreater(summaries.rebuild_summaries(repair=False), 0)
+        backfill(apps, None)
+        self.assertEqual(summaries.rebuild_summaries(repair=False), 0)
+
+    def test_changes_to_missing_summary_rows_are_recounted(self):
+        first = entry(self.member, self.task, 1, 60)
+        second = entry(self.member, self.task, 1, 30)
+        moved = entry(self.member, self.task, 1, 45)
+        # Buckets the summaries don't have yet, as before a backfill
+        StaffDaySummary.objects.all().delete()
+        StaffWeekJobSummary.objects.all().delete()
+        first.delete()
+        moved.minutes, moved.task, moved.job = 15, self.other, self.other.job
+        moved.task_uuid, moved.job_number = self.other.uuid, self.other.job.job_id
+        moved.save()
+
+        day = StaffDaySummary.objects.get(staff_uuid=self.member.uuid, day=timezone.localdate(second.entry_date))
+        self.assertEqual((day.minutes, day.entry_count), (45, 2))
+        week = StaffWeekJobSummary.objects.get(staff_uuid=self.member.uuid, job_number=self.task.job.job_id)
+        self.assertEqual((week.minutes, week.entry_count), (30, 1))
+
+    def test_write_sequences(self):
+        self.assertConsistent()
+        first = entry(self.member, self.task, 1, 60)
+        second = entry(self.member, self.task, 2, 30, billable=False)
+        self.assertConsistent()
+
+        first.minutes, first.billable = 90, False
+        first.save()
+        self.assertConsistent()
+
+        # Between tasks of the same job, then to another job
+        second.task, second.task_uuid = self.sibling, self.sibling.uuid
+        second.save()
+        self.assertConsistent()
+        first.task, first.job = self.other, self.other.job
+        first.task_uuid, first.job_number = self.other.uuid, self.other.job.job_id
+        first.save()
+        self.assertConsistent()
+
+        # The latest entry goes: last_entry_date falls back to the one before
+        latest = entry(self.member, self.other, 20, 15)
+        latest.delete()
+        first.delete()
+        second.delete()
+        self.assertConsistent()
+
+    def test_first_entry_is_counted(self):
+        Timesheet.objects.filter(task=self.task).delete()
+        TaskProgress.objects.filter(pk=self.task.pk).delete()
+        entry(self.member, self.task, 1, 45)
+        self.assertEqual(TaskProgress.objects.get(pk=self.task.pk).actual_minutes, 45)
+        self.assertConsistent()
+
+    def test_concurrent_first_write_is_not_lost(self):
+        TaskProgress.objects.filter(pk=self.task.pk).delete()
+        JobProgress.objects.filter(pk=self.task.job_id).delete()
+        # Another writer's aggregate, read before our entry committed
+        stale = {
+            model: rollups._expected_totals(model, [key]).get(key, rollups._zero_totals(model))
+            for model, key in ((TaskProgress, self.task.pk), (JobProgress, self.task.job_id))
+        }
+        expected_totals = rollups._expected_totals
+
+        def race(model, keys=None):
+            # ... whose row is created between our aggregate and our create
+            totals = expected_totals(model, keys)
+            if model in stale:
+                model.objects.create(pk=keys[0], **stale.pop(model))
+            return totals
+
+        with mock.patch.object(rollups, '_expected_totals', side_effect=race):
+            entry(self.member, self.task, 3, 25)
+        self.assertFalse(stale)
+        self.assertConsistent()
+
+    def test_concurrent_first_summary_write_is_not_lost(self):
+        first = entry(self.member, self.task, 5, 40)
+        day = timezone.localdate(first.entry_date)
+        keys = {
+            StaffDaySummary: {'staff_uuid': self.member.uuid, 'day': day, 'billable': True},
+            StaffWeekJobSummary: {
+                'staff_uuid': self.member.uuid, 'week_start': summaries.week_start_of(day),
+                'job_number': self.task.job.job_id,
+            },
+        }
+        for model, key in keys.items():
+            model.objects.filter(**key).delete()
+        # Another writer's totals, read before our entry committed
+        stale = {model: summaries._totals(model, key) for model, key in keys.items()}
+        totals_of = summaries._totals
+
+        def race(model, key):
+            totals = totals_of(model, key)
+            if model in stale:
+                model.objects.create(**key, **stale.pop(model))
+            return totals
+
+        with mock.patch.object(summaries, '_totals', side_effect=race):
+            entry(self.member, self.task, 5, 20)
+        self.assertFalse(stale)
+        self.assertConsistent()
@@ -0,0 +1,95 @@
+# main/tests/test_schedule.py
+
+"""
+The schedule endpoints (main.schedule) on a handful of hand-built bookings,
+where the free/busy staff and the double bookings are known.
+"""
+
+import uuid
+from datetime import datetime
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from main.models import Staff, Job, JobAssignedStaff
+from main.schedule import get_schedule
+from .data import create_api_user
+
+
+def day(d):
+    return timezone.make_aware(datetime(2024, 3, d))
+
+
+class ScheduleTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ann, cls.bob, cls.cat = (
+            Staff.objects.create(name=name, email=f'{name.lower()}@example.com') for name in ('Ann', 'Bob', 'Cat')
+        )
+        cls.user, cls.auth = create_api_user(cls.ann, role='ADMIN')
+
+        def job(number, staff, start=None, due=None, completed=None):
+            job = Job.objects.create(
+                job_id=number, uuid=uuid.uuid4(), name=f'Job {number}',
+                start_date=start, due_date=due, completed_date=completed,
+            )
+            for member in staff:
+                JobAssignedStaff.objects.create(job=job, staff_uuid=member.uuid, staff=member, staff_name=member.name)
+            return job
+
+        cls.early = job('J1', [cls.ann], day(1), day(10))
+        # Due on the 25th but completed on the 20th, which ends the booking
+        cls.late = job('J2', [cls.ann], day(8), day(25), day(20))
+        cls.bobs = job('J3', [cls.bob], day(15), day(31))
+        job('J4', [cls.ann, cls.bob, cls.cat])  # Undated: books nobody
+
+    def setUp(self):
+        get_schedule().load()
+
+    def get(self, view, start, end, status=200, **kwargs):
+        response = self.client.get(
+            f'/api/schedule/{view}/', {'start': f'2024-03-{start:02}', 'end': f'2024-03-{end:02}'}, **self.auth,
+            **kwargs
+        )
+        self.assertEqual(response.status_code, status, response.content)
+        return response
+
+    def availability(self, start, end):
+        body = self.get('availability', start, end).json()
+        free = {entry['name'] for entry in body['free']}
+        busy = {entry['name']: [booking['job_id'] for booking in entry['bookings']] for entry in body['busy']}
+        return free, busy
+
+    def test_availability(self):
+        self.assertEqual(self.availability(1, 7), ({'Bob', 'Cat'}, {'Ann': ['J1']}))
+        self.assertEqual(self.availability(9, 16), ({'Cat'}, {'Ann': ['J1', 'J2'], 'Bob': ['J3']}))
+        # Bookings include their end day
+        self.assertEqual(self.availability(20, 20), ({'Cat'}, {'Ann': ['J2'], 'Bob': ['J3']}))
+        self.assertEqual(self.availability(21, 31), ({'Ann', 'Cat'}, {'Bob': ['J3']}))
+
+    def test_conflicts(self):
+        body = self.get('conflicts', 1, 31).json()
+        self.assertEqual(len(body['staff']), 1)
+        [entry] = body['staff']
+        self.assertEqual(entry['name'], 'Ann')
+        self.assertEqual(entry['conflicts'], [{
+            'first': {'job_uuid': str(self.early.uuid), 'job_id': 'J1', 'job_name': 'Job J1',
+                      'start': '2024-03-01', 'end': '2024-03-10'},
+            'second': {'job_uuid': str(self.late.uuid), 'job_id': 'J2', 'job_name': 'Job J2',
+                       'start': '2024-03-08', 'end': '2024-03-20'},
+            'overlap_start': '2024-03-08',
+            'overlap_end': '2024-03-10',
+        }])
+        # Clipped to the window, and none outside the overlap
+        self.assertEqual(self.get('conflicts', 9, 31).json()['staff'][0]['conflicts'][0]['overlap_start'], '2024-03-09')
+        self.assertEqual(self.get('conflicts', 11, 31).json()['staff'], [])
+
+    @override_settings(ANALYTICS_REFRESH_INTERVAL=3600)
+    def test_etag_never_outruns_the_body(self):
+        etag = self.get('availability', 1, 7)['ETag']
+        JobAssignedStaff.objects.create(job=self.early, staff_uuid=self.cat.uuid, staff=self.cat, staff_name='Cat')
+
+        response = self.get('availability', 1, 7, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual({entry['name'] for entry in response.json()['busy']}, {'Ann', 'Cat'})
+        self.get('availability', 1, 7, status=304, HTTP_IF_NONE_MATCH=response['ETag'])
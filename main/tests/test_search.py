@@ -0,0 +1,87 @@
+# main/tests/test_search.py
+
+"""
+The search endpoint (main.search) on a few hand-built objects, indexed by
+the model signals: ranking by field weight, every query token required as a
+prefix, and staff only searchable by admins.
+"""
+
+import uuid
+from importlib import import_module
+
+from django.apps import apps
+from django.test import TestCase
+
+from main.models import Staff, Client, Contact, Job, SearchTerm
+from .data import create_api_user
+
+
+class SearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.client_obj = Client.objects.create(
+            uuid=uuid.uuid4(), name='Harbour Bridge Holdings', email='hb@example.com', phone='09 555 1234',
+        )
+        cls.job = Job.objects.create(
+            uuid=uuid.uuid4(), job_id='HB100', name='Bridge repaint', description='Harbour side spans',
+            client=cls.client_obj, client_uuid=cls.client_obj.uuid,
+        )
+        cls.contact = Contact.objects.create(uuid=uuid.uuid4(), name='Bridget Jones', client=cls.client_obj)
+        cls.harbour_master = Staff.objects.create(name='Harbour Master', email='master@example.com')
+
+        cls.admin, cls.admin_auth = create_api_user(Staff.objects.create(name='Pat Admin'), role='ADMIN')
+        cls.user, cls.auth = create_api_user(Staff.objects.create(name='Sam Staff'))
+
+    def search(self, q, auth=None, status=200, **params):
+        response = self.client.get('/api/search/', {'q': q, **params}, **(auth or self.auth))
+        self.assertEqual(response.status_code, status, response.content)
+        return response.json()
+
+    def found(self, q, auth=None, **params):
+        return [(result['type'], result['name']) for result in self.search(q, auth, **params)['results']]
+
+    def test_ranked_by_field_weight(self):
+        # Exact in a client name, exact in a job name, prefix of a contact name
+        self.assertEqual(self.found('bridge'), [
+            ('client', 'Harbour Bridge Holdings'), ('job', 'Bridge repaint'), ('contact', 'Bridget Jones'),
+        ])
+        scores = [result['score'] for result in self.search('bridge')['results']]
+        self.assertEqual(scores, [16, 12, 8])
+        # A job number outranks the job's name
+        self.assertEqual(self.found('hb100'), [('job', 'Bridge repaint')])
+
+    def test_every_token_must_match_as_a_prefix(self):
+        self.assertEqual(self.found('harb bri'), [('client', 'Harbour Bridge Holdings'), ('job', 'Bridge repaint')])
+        self.assertEqual(self.found('bridget jon'), [('contact', 'Bridget Jones')])
+        self.assertEqual(self.found('bridge zzz'), [])
+        # Infixes don't match
+        self.assertEqual(self.found('ridge'), [])
+
+    def test_phone_and_email_tokens(self):
+        self.assertEqual(self.found('095551234'), [('client', 'Harbour Bridge Holdings')])
+        self.assertEqual(self.found('hb@example.com'), [('client', 'Harbour Bridge Holdings')])
+
+    def test_staff_only_for_admins(self):
+        self.assertNotIn(('staff', 'Harbour Master'), self.found('harbour'))
+        self.assertIn('error', self.search('harbour', types='staff', status=400))
+        self.assertIn(('staff', 'Harbour Master'), self.found('harbour', auth=self.admin_auth))
+        self.assertEqual(self.found('master', auth=self.admin_auth, types='staff'), [('staff', 'Harbour Master')])
+
+    def test_paging_and_bad_queries(self):
+        page = self.search('bridge', limit=2)
+        self.assertEqual((len(page['results']), page['next_offset']), (2, 2))
+        page = self.search('bridge', limit=2, offset=2)
+        self.assertEqual(([r['type'] for r in page['results']], page['next_offset']), (['contact'], None))
+        self.search('  --  ', status=400)
+
+    def test_migration_backfills_the_index(self):
+        backfill = import_module('main.migrations.0023_backfill_search_terms').backfill_search_terms
+        terms = lambda: set(SearchTerm.objects.values_list('kind', 'object_uuid', 'term', 'weight'))
+        indexed = terms()
+        # Everything but one client missing, as right after the table was created
+        SearchTerm.objects.exclude(object_uuid=self.client_obj.uuid).delete()
+        self.assertEqual(self.found('bridge'), [('client', 'Harbour Bridge Holdings')])
+        backfill(apps, None)
+        self.assertEqual(terms(), indexed)
+        self.assertEqual(len(self.found('bridge')), 3)
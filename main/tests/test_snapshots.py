@@ -0,0 +1,116 @@
+# main/tests/test_snapshots.py
+
+"""
+Columnar snapshots (main.snapshots): partitions and the manifest written
+from the seeded dataset, read back with pyarrow and compared with the ORM,
+and which partitions a second run rewrites.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import uuid
+from datetime import datetime, timezone as dt_timezone
+from unittest import skipIf
+
+from django.test import TestCase
+from django.utils import timezone
+
+from main.models import Timesheet, Client
+from .data import seed_dataset
+
+try:
+    from main import snapshots
+except ImportError:
+    snapshots = None
+
+
+def orm_rows(queryset, schema):
+    """Rows as pyarrow reads them back: strings for UUIDs, UTC datetimes"""
+    rows = []
+    for row in queryset.values(*schema.names):
+        for name, value in row.items():
+            if isinstance(value, uuid.UUID):
+                row[name] = str(value)
+            elif isinstance(value, datetime):
+                row[name] = value.astimezone(dt_timezone.utc)
+        rows.append(row)
+    return rows
+
+
+@skipIf(snapshots is None, "pyarrow not installed")
+class SnapshotTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_dataset(staff_count=3, client_count=3, days_of_history=45)
+        # One entry the syncs couldn't date
+        Timesheet.objects.create(uuid=uuid.uuid4(), minutes=20)
+
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.output_dir)
+
+    def export(self, file_format='parquet', **kwargs):
+        return snapshots.export_snapshots(self.output_dir, file_format, log=lambda message: None, **kwargs)
+
+    def partition_path(self, month, file_format='parquet'):
+        return os.path.join(self.output_dir, 'timesheet', f'month={month}', f'part-0.{file_format}')
+
+    def manifest(self):
+        with open(os.path.join(self.output_dir, '_manifest.json')) as f:
+            return json.load(f)
+
+    def test_round_trip(self):
+        for file_format in snapshots.FORMATS:
+            with self.subTest(file_format=file_format):
+                shutil.rmtree(self.output_dir)
+                written = self.export(file_format)
+                schema = snapshots.table_schema(Timesheet)
+
+                fingerprints = snapshots.month_fingerprints()
+                self.assertIn(snapshots.UNKNOWN_MONTH, fingerprints)
+                self.assertEqual(sum(rows for rows, _ in fingerprints.values()), Timesheet.objects.count())
+                manifest = self.manifest()
+                self.assertEqual(manifest['format'], file_format)
+                self.assertEqual(manifest['partitions'], fingerprints)
+                self.assertEqual(written['partitions'], {month: rows for month, (rows, _) in fingerprints.items()})
+
+                for month in fingerprints:
+                    table = snapshots.read_table(self.partition_path(month, file_format))
+                    self.assertEqual(table.schema, schema)
+                    if month == snapshots.UNKNOWN_MONTH:
+                        expected = Timesheet.objects.filter(entry_date__isnull=True)
+                    else:
+                        start, end = snapshots._month_bounds(month)
+                        expected = Timesheet.objects.filter(entry_date__gte=start, entry_date__lt=end)
+                    self.assertEqual(table.to_pylist(), orm_rows(expected.order_by('entry_date', 'uuid'), schema))
+
+                clients = snapshots.read_table(os.path.join(self.output_dir, f'client.{file_format}'))
+                self.assertEqual(
+                    clients.to_pylist(),
+                    orm_rows(Client.objects.order_by('pk'), snapshots.table_schema(Client)),
+                )
+
+    def test_only_changed_months_are_rewritten(self):
+        self.export()
+        self.assertEqual(self.export()['partitions'], {})
+
+        # Same row count and minute total, so only the change log gives it away
+        entry = Timesheet.objects.filter(entry_date__isnull=False).order_by('entry_date').first()
+        entry.billable = not entry.billable
+        entry.save()
+        month = timezone.localtime(entry.entry_date).strftime('%Y-%m')
+        self.assertEqual(list(self.export()['partitions']), [month])
+        self.assertEqual(self.export()['partitions'], {})
+
+        # A month that empties is removed from the snapshot
+        start, end = snapshots._month_bounds(month)
+        Timesheet.objects.filter(entry_date__gte=start, entry_date__lt=end).delete()
+        self.export()
+        self.assertFalse(os.path.exists(self.partition_path(month)))
+        self.assertNotIn(month, self.manifest()['partitions'])
+
+        # --full rewrites everything
+        self.assertEqual(set(self.export(full=True)['partitions']), set(snapshots.month_fingerprints()))
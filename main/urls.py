@@ -1,20 +1,36 @@
-from django.urls import path
-from . import views
+from django.urls import path, register_converter
+from . import async_views, converters, views
+
+register_converter(converters.FlexibleUUIDConverter, 'anyuuid')
 
 urlpatterns = [
     path('auth/check-staff-email/', views.check_staff_email, name='check-staff-email'),
-    path('api/jobs/all/', views.all_jobs, name='all_jobs'),
-    path('api/jobs/my-jobs/<str:staff_uuid>/', views.my_jobs, name='my-jobs'),
-    path('api/jobs/<str:job_id>/', views.job_detail, name='job-detail'),
-    path('api/jobs/<str:job_id>/tasks/', views.job_tasks, name='job-tasks'),
-    path('api/clients/', views.client_list, name='client-list'),
-    path('api/clients/<str:uuid>/favorite/', views.toggle_client_favorite, name='toggle-client-favorite'),
-    path('api/staff/<str:staff_uuid>/weekly-hours/', views.submit_timesheet, name='submit-timesheet'),
-    path('api/staff/<str:staff_uuid>/weekly-hours/<str:week_start>/', views.staff_weekly_hours, name='staff-weekly-hours-date'),
-    path('api/contacts/', views.all_contacts, name='all-contacts'),
-    path('api/clients/<str:client_id>/', views.client_detail, name='client-detail'),
-    path('api/clients/<str:client_id>/jobs/', views.client_jobs, name='client-jobs'),
-    path('api/clients/<str:client_id>/contacts/', views.client_contacts, name='client-contacts'),
+    path('api/jobs/all/', async_views.all_jobs, name='all_jobs'),
+    path('api/jobs/my-jobs/<anyuuid:staff_uuid>/', async_views.my_jobs, name='my-jobs'),
+    path('api/jobs/<str:job_id>/', async_views.job_detail, name='job-detail'),
+    path('api/jobs/<str:job_id>/tasks/', async_views.job_tasks, name='job-tasks'),
+    path('api/clients/', async_views.client_list, name='client-list'),
+    path('api/clients/<anyuuid:uuid>/favorite/', views.toggle_client_favorite, name='toggle-client-favorite'),
+    path('api/staff/<anyuuid:staff_uuid>/weekly-hours/', async_views.current_weekly_hours, name='submit-timesheet'),
+    path('api/staff/<anyuuid:staff_uuid>/weekly-hours/<str:week_start>/', async_views.staff_weekly_hours, name='staff-weekly-hours-date'),
+    path('api/staff/<anyuuid:staff_uuid>/hours-summary/', views.staff_hours_summary, name='staff-hours-summary'),
+    path('api/reports/team-weekly-hours/', views.team_weekly_hours, name='team-weekly-hours'),
+    path('api/reports/timesheet-gaps/', views.timesheet_gaps_report, name='timesheet-gaps'),
+    path('api/reports/capacity/', views.staff_capacity_report, name='staff-capacity'),
+    path('api/schedule/availability/', views.schedule_availability, name='schedule-availability'),
+    path('api/schedule/conflicts/', views.schedule_conflicts, name='schedule-conflicts'),
+    path('api/search/', views.search, name='search'),
+    path('api/autocomplete/', views.autocomplete, name='autocomplete'),
+    path('api/bootstrap/', views.bootstrap, name='bootstrap'),
+    path('api/timesheets/', views.timesheet_list, name='timesheet-list'),
+    path('api/exports/timesheets/<str:export_format>/', views.export_timesheets, name='export-timesheets'),
+    path('api/analytics/timesheets/', views.timesheet_analytics, name='timesheet-analytics'),
+    path('api/contacts/', async_views.all_contacts, name='all-contacts'),
+    path('api/clients/<anyuuid:client_id>/', async_views.client_detail, name='client-detail'),
+    path('api/clients/<anyuuid:client_id>/jobs/', views.client_jobs, name='client-jobs'),
+    path('api/clients/<str:client_id>/contacts/', async_views.client_contacts, name='client-contacts'),
     path('api/admin/staff/', views.admin_staff_list, name='admin-staff-list'),
-    path('api/admin/staff/<str:staff_uuid>/', views.admin_staff_detail, name='admin-staff-detail'),
-] 
\ No newline at end of file
+    path('api/admin/staff/<anyuuid:staff_uuid>/', views.admin_staff_detail, name='admin-staff-detail'),
+    path('api/changes/', views.changes_since, name='changes-since'),
+    path('api/metrics/', views.request_metrics, name='request-metrics'),
+]
@@ -1,17 +1,73 @@
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
 from django.shortcuts import render
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
-from django.db.models import Q, Sum
+from django.db.models import F, Q
 from django.db.models.functions import TruncDate
-from .models import Staff, Job, JobAssignedStaff, Client, Task, Timesheet, Contact, TimeEntry
+from .models import (
+    Staff, Job, Client, Task, Timesheet, Contact, TimeEntry, ChangeLog,
+    StaffDaySummary, StaffWeekJobSummary,
+)
 from datetime import datetime, timedelta
+import logging
 from django.utils import timezone
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags
+import time
 import uuid
-from .utils import standardize_uuid, format_uuid_with_hyphens
+from . import metrics
+from .analytics import get_cube, catch_up as catch_up_cube, GROUP_DIMENSIONS, MAX_GROUP_DIMENSIONS
+from .autocomplete import get_autocomplete, KINDS as AUTOCOMPLETE_KINDS, DEFAULT_LIMIT, MAX_LIMIT
+from .changelog import COLUMNS as CHANGE_LOG_COLUMNS, settled_head, settled_seq
+from .dashboard import SECTIONS, bootstrap as dashboard_bootstrap
+from .exports import EXPORT_FORMATS
+from .fieldsets import TIMESHEET_FIELDS
+from .filters import TimesheetFilter, MAX_PAGE_SIZE
+from .reports import (
+    team_staff, team_weekly_grid, timesheet_gaps, last_week, staff_capacity, DEFAULT_DAILY_MINUTES,
+)
+from .schedule import get_schedule, catch_up as catch_up_schedule
+from .search import SEARCH_KINDS, ranked_matches, describe
+from .summaries import day_bounds, week_start_of
+from .utils import conditional_on
+
+logger = logging.getLogger(__name__)
 
 # Create your views here.
 
+def _filtered(request, filterset_class, queryset):
+    """`queryset` narrowed and sorted by the request's filter parameters, or a 400 Response"""
+    filterset = filterset_class(request.query_params, queryset=queryset, request=request)
+    if not filterset.is_valid():
+        return Response({'error': filterset.errors}, status=400)
+    return filterset.qs
+
+
+def _list_response(request, rows, transform, default_limit=None):
+    """
+    transform(row) for each of `rows`. With `limit` (or a `default_limit`) only
+    one page is read, limit + 1 rows to tell whether there is another, and
+    returned as {'results', 'offset', 'limit', 'next_offset'}.
+    """
+    limit = request.query_params.get('limit', default_limit)
+    if limit is None:
+        return Response([transform(row) for row in rows])
+    try:
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        offset = max(0, int(request.query_params.get('offset', 0)))
+    except ValueError:
+        return Response({'error': 'limit and offset must be integers'}, status=400)
+    page = list(rows[offset:offset + limit + 1])
+    return Response({
+        'results': [transform(row) for row in page[:limit]],
+        'offset': offset,
+        'limit': limit,
+        'next_offset': offset + limit if len(page) > limit else None,
+    })
+
+
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def check_staff_email(request):
@@ -31,148 +87,6 @@ def check_staff_email(request):
             'exists': False
         })
 
-@api_view(['GET'])
-@permission_classes([IsAuthenticated])
-def my_jobs(request, staff_uuid):
-    try:
-        print(f"Fetching jobs for staff_uuid: {staff_uuid}")
-        
-        # Get all job IDs assigned to the staff member
-        job_assignments = JobAssignedStaff.objects.filter(staff_uuid=staff_uuid)
-        print(f"Found {job_assignments.count()} job assignments")
-        
-        job_ids = job_assignments.values_list('job_id', flat=True)
-        print(f"Job IDs: {list(job_ids)}")
-
-        # Get all jobs with their related client data
-        jobs = Job.objects.filter(id__in=job_ids).select_related('client').order_by('due_date').values(
-            'id',
-            'job_id',
-            'name',
-            'client_uuid',
-            'state',
-            'due_date'
-        )
-        print(f"Found {jobs.count()} jobs")
-
-        # Get all client data in one query
-        client_uuids = [job['client_uuid'] for job in jobs]
-        clients = {
-            client.uuid: client.name 
-            for client in Client.objects.filter(uuid__in=client_uuids)
-        }
-
-        # Transform the data to match the frontend expectations
-        transformed_jobs = []
-        for job in jobs:
-            transformed_jobs.append({
-                'id': job['id'],
-                'job_number': job['job_id'],
-                'name': job['name'],
-                'client_name': clients.get(job['client_uuid'], 'Unknown Client'),  # Get client name from dict
-                'status': job['state'],
-                'due_date': job['due_date']
-            })
-
-        return Response(transformed_jobs)
-    except Exception as e:
-        print(f"Error in my_jobs view: {str(e)}")
-        return Response(
-            {'error': str(e)}, 
-            status=500
-        )
-
-@api_view(['GET'])
-@permission_classes([IsAuthenticated])
-def job_detail(request, job_id):
-    try:
-        # First get the job to get its internal ID
-        job = Job.objects.get(job_id=job_id)
-        
-        # Get all tasks for this job using the internal ID
-        tasks = Task.objects.filter(job_id=job.id).values(
-            'uuid',
-            'name',
-            'estimated_minutes',
-            'completed'
-        )
-
-        # Get actual minutes from timesheet entries for each task
-        for task in tasks:
-            actual_minutes = Timesheet.objects.filter(
-                task_uuid=task['uuid']
-            ).aggregate(
-                total_minutes=Sum('minutes')
-            )['total_minutes'] or 0
-            
-            task['actual_minutes'] = actual_minutes
-            task['remaining_minutes'] = task['estimated_minutes'] - actual_minutes if task['estimated_minutes'] else 0
-            task['status'] = 'Incomplete'  # You can add more status logic here
-
-        return Response({
-            'job_id': job.job_id,
-            'job_name': job.name,  # Include the job name in the response
-            'tasks': tasks
-        })
-
-    except Job.DoesNotExist:
-        return Response({'error': 'Job not found'}, status=404)
-    except Exception as e:
-        print(f"Error in job_detail view: {str(e)}")
-        return Response({'error': str(e)}, status=500)
-
-@api_view(['GET'])
-@permission_classes([IsAuthenticated])
-def client_list(request):
-    try:
-        clients = Client.objects.all().values(
-            'uuid',
-            'name',
-            'is_archived',  # Instead of status
-            'phone',
-            'address',  # This is the default address
-            'city',
-            'region',
-            'country',
-            'post_code',
-            'email',
-            'website',
-            'type_name',
-            'account_manager_name',
-            'job_manager_name'
-        ).order_by('name')
-        
-        # Transform the data to match the frontend expectations
-        transformed_clients = []
-        for client in clients:
-            # Format the full address
-            address_parts = [
-                client['address'],
-                client['city'],
-                client['region'],
-                client['post_code'],
-                client['country']
-            ]
-            full_address = ', '.join(filter(None, address_parts))
-
-            transformed_clients.append({
-                'uuid': client['uuid'],
-                'name': client['name'],
-                'status': 'Archived' if client['is_archived'] else 'Active',
-                'phone': client['phone'],
-                'address': full_address,
-                'email': client['email'],
-                'website': client['website'],
-                'type': client['type_name'],
-                'account_manager': client['account_manager_name'],
-                'job_manager': client['job_manager_name']
-            })
-        
-        return Response(transformed_clients)
-    except Exception as e:
-        print(f"Error in client_list view: {str(e)}")
-        return Response({'error': str(e)}, status=500)
-
 @api_view(['PATCH'])
 @permission_classes([IsAuthenticated])
 def toggle_client_favorite(request, uuid):
@@ -186,211 +100,44 @@ def toggle_client_favorite(request, uuid):
     except Exception as e:
         return Response({'error': str(e)}, status=500)
 
-@api_view(['GET', 'POST'])
+@api_view(['POST'])
 @permission_classes([IsAuthenticated])
-def staff_weekly_hours(request, staff_uuid, week_start=None):
+def submit_weekly_hours(request, staff_uuid, week_start=None):
+    """
+    POST to a week's URL (main.async_views.staff_weekly_hours serves its
+    GET): adds the entries as they are, unlike submit_timesheet.
+    """
     try:
-        # Standardize UUID format
-        staff_uuid = staff_uuid.replace('-', '')
-        formatted_staff_uuid = '-'.join([
-            staff_uuid[:8],
-            staff_uuid[8:12],
-            staff_uuid[12:16],
-            staff_uuid[16:20],
-            staff_uuid[20:]
-        ])
-
-        if request.method == 'GET':
-            try:
-                # If no week_start provided, default to current week's Monday
-                if not week_start:
-                    today = timezone.now().date()
-                    week_start = today - timedelta(days=today.weekday())
-                else:
-                    # Parse the date and make it timezone aware
-                    week_start = datetime.strptime(week_start, '%Y-%m-%d').date()
-                
-                week_end = week_start + timedelta(days=6)
-
-                # Make the datetime range timezone aware
-                week_start_dt = timezone.make_aware(datetime.combine(week_start, datetime.min.time()))
-                week_end_dt = timezone.make_aware(datetime.combine(week_end, datetime.max.time()))
-
-                # Get all timesheet entries and tasks for the week
-                timesheet_entries = Timesheet.objects.filter(
-                    staff_uuid=formatted_staff_uuid,
-                    entry_date__range=[week_start_dt, week_end_dt]
+        entries = request.data.get('entries', [])
+        
+        for entry in entries:
+            task_uuid = entry['task_uuid']
+            job_id = entry['job_id']
+            task = Task.objects.select_related('job').filter(uuid=task_uuid).first()
+            
+            for time_entry in entry['entries']:
+                # Create a new Timesheet entry
+                Timesheet.objects.create(
+                    uuid=uuid.uuid4(),  # Generate a new UUID for each entry
+                    staff_uuid=staff_uuid,
+                    task_uuid=task_uuid,
+                    task=task,
+                    job_number=job_id,
+                    job=task.job if task and task.job.job_id == job_id else None,
+                    entry_date=datetime.strptime(time_entry['date'], '%Y-%m-%d'),
+                    minutes=int(float(time_entry['hours']) * 60),  # Convert hours to minutes
+                    note='\n'.join(time_entry['notes']) if time_entry['notes'] else '',
+                    billable=True  # Default to billable
                 )
-
-                # Get all tasks with their billable status
-                tasks = {
-                    task.uuid: task.billable
-                    for task in Task.objects.filter(
-                        uuid__in=timesheet_entries.values_list('task_uuid', flat=True)
-                    )
-                }
-
-                # Group by task and day
-                task_hours = {}
-                daily_hours = [{'billable': 0, 'non_billable': 0} for _ in range(7)]
-
-                for entry in timesheet_entries:
-                    day_index = (entry.entry_date.date() - week_start).days
-                    hours = entry.minutes / 60
-
-                    # Add to daily totals based on billable status
-                    is_billable = tasks.get(entry.task_uuid, False)
-                    if is_billable:
-                        daily_hours[day_index]['billable'] += hours
-                    else:
-                        daily_hours[day_index]['non_billable'] += hours
-
-                    # Create unique key for job+task combination
-                    task_key = f"{entry.job_id}_{entry.task_uuid}"
-
-                    if task_key not in task_hours:
-                        task_hours[task_key] = {
-                            'job_id': entry.job_id,
-                            'job_name': entry.job_name,
-                            'task_uuid': entry.task_uuid,
-                            'task_name': entry.task_name,
-                            'daily_hours': [{'date': (week_start + timedelta(days=i)).strftime('%Y-%m-%d'), 
-                                           'hours': 0,
-                                           'notes': []} for i in range(7)]
-                        }
-                    
-                    day_hours = task_hours[task_key]['daily_hours'][day_index]
-                    day_hours['hours'] += hours
-                    if entry.note:
-                        day_hours['notes'].append(entry.note)
-
-                # Format daily summary
-                week_data = []
-                for i in range(7):
-                    current_date = week_start + timedelta(days=i)
-                    week_data.append({
-                        'date': current_date.strftime('%Y-%m-%d'),
-                        'day': current_date.strftime('%a'),
-                        'billable': daily_hours[i]['billable'],
-                        'non_billable': daily_hours[i]['non_billable'],
-                        'total': daily_hours[i]['billable'] + daily_hours[i]['non_billable']
-                    })
-
-                return Response({
-                    'week_start': week_start.strftime('%Y-%m-%d'),
-                    'week_end': week_end.strftime('%Y-%m-%d'),
-                    'daily_hours': week_data,
-                    'task_hours': task_hours
-                })
-            except Exception as e:
-                print(f"Error fetching weekly hours: {str(e)}")
-                return Response({'error': str(e)}, status=500)
         
-        elif request.method == 'POST':
-            try:
-                entries = request.data.get('entries', [])
-                
-                for entry in entries:
-                    task_uuid = entry['task_uuid']
-                    job_id = entry['job_id']
-                    
-                    for time_entry in entry['entries']:
-                        # Create a new Timesheet entry
-                        Timesheet.objects.create(
-                            uuid=uuid.uuid4(),  # Generate a new UUID for each entry
-                            staff_uuid=formatted_staff_uuid,
-                            task_uuid=task_uuid,
-                            job_id=job_id,
-                            entry_date=datetime.strptime(time_entry['date'], '%Y-%m-%d'),
-                            minutes=int(float(time_entry['hours']) * 60),  # Convert hours to minutes
-                            note='\n'.join(time_entry['notes']) if time_entry['notes'] else '',
-                            billable=True  # Default to billable
-                        )
-                
-                return Response({'message': 'Timesheet submitted successfully'})
-            except Exception as e:
-                print(f"Error submitting timesheet: {str(e)}")
-                return Response({'error': str(e)}, status=500)
+        return Response({'message': 'Timesheet submitted successfully'})
     except Exception as e:
-        print(f"Error in staff_weekly_hours view: {str(e)}")
+        logger.exception("Error submitting timesheet: %s", e)
         return Response({'error': str(e)}, status=500)
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
-def all_jobs(request):
-    try:
-        print(f"Fetching all jobs")
-        
-        # Get all job IDs assigned to the staff member
-        job_assignments = JobAssignedStaff.objects.all()
-        print(f"Found {job_assignments.count()} job assignments")
-        
-        job_ids = job_assignments.values_list('job_id', flat=True)
-        print(f"Job IDs: {list(job_ids)}")
-
-        # Get all jobs with their related client data
-        jobs = Job.objects.filter(id__in=job_ids).select_related('client').order_by('due_date').values(
-            'id',
-            'job_id',
-            'name',
-            'client_uuid',
-            'state',
-            'due_date'
-        )
-        print(f"Found {jobs.count()} jobs")
-
-        # Get all client data in one query
-        client_uuids = [job['client_uuid'] for job in jobs]
-        clients = {
-            client.uuid: client.name 
-            for client in Client.objects.filter(uuid__in=client_uuids)
-        }
-
-        # Transform the data to match the frontend expectations
-        transformed_jobs = []
-        for job in jobs:
-            transformed_jobs.append({
-                'id': job['id'],
-                'job_number': job['job_id'],
-                'name': job['name'],
-                'client_name': clients.get(job['client_uuid'], 'Unknown Client'),  # Get client name from dict
-                'status': job['state'],
-                'due_date': job['due_date']
-            })
-
-        return Response(transformed_jobs)
-    except Exception as e:
-        print(f"Error in my_jobs view: {str(e)}")
-        return Response(
-            {'error': str(e)}, 
-            status=500
-        )
-
-@api_view(['GET'])
-@permission_classes([IsAuthenticated])
-def client_detail(request, client_id):
-    try:
-        client = Client.objects.get(uuid=client_id)
-        return Response({
-            'uuid': client.uuid,
-            'id': client.id,
-            'name': client.name,
-            'phone': client.phone,
-            'email': client.email,
-            'website': client.website,
-            'address': client.address,
-            'city': client.city,
-            'region': client.region,
-            'country': client.country,
-            'post_code': client.post_code,
-            'account_manager': client.account_manager_name,
-            'job_manager': client.job_manager_name
-        })
-    except Client.DoesNotExist:
-        return Response({'error': 'Client not found'}, status=404)
-
-@api_view(['GET'])
-@permission_classes([IsAuthenticated])
+@conditional_on('job')
 def client_jobs(request, client_id):
     try:
         jobs = Job.objects.filter(client_uuid=client_id).values(
@@ -409,80 +156,13 @@ def client_jobs(request, client_id):
     except Exception as e:
         return Response({'error': str(e)}, status=500)
 
-@api_view(['GET'])
-@permission_classes([IsAuthenticated])
-def all_contacts(request):
-    try:
-        contacts = Contact.objects.all().values(
-            'uuid',
-            'name',
-            'client__name',  # Get client name through relation
-            'phone',
-            'email'
-        ).order_by('name')
-        
-        transformed_contacts = [{
-            'uuid': contact['uuid'],
-            'name': contact['name'],
-            'client': contact['client__name'],
-            'phone': contact['phone'],
-            'email': contact['email']
-        } for contact in contacts]
-        
-        return Response(transformed_contacts)
-    except Exception as e:
-        return Response({'error': str(e)}, status=500)
-
-@api_view(['GET'])
-@permission_classes([IsAuthenticated])
-def client_contacts(request, client_id):
-    try:
-        print(f"Fetching contacts for client: {client_id}")
-        contacts = Contact.objects.filter(client_id=client_id).values(
-            'uuid',
-            'name',
-            'phone',
-            'email'
-        ).order_by('name')
-        
-        print(f"Found {contacts.count()} contacts")
-        return Response(list(contacts))
-    except Exception as e:
-        print(f"Error in client_contacts: {str(e)}")
-        return Response({'error': str(e)}, status=500)
-
-@api_view(['GET'])
-@permission_classes([IsAuthenticated])
-def job_tasks(request, job_id):
-    try:
-        job = Job.objects.get(job_id=job_id)
-        
-        tasks = Task.objects.filter(job=job).values(
-            'id',
-            'uuid',  # Add UUID to the response
-            'name',
-            'estimated_minutes'
-        ).order_by('name')
-        
-        print(f"Found {tasks.count()} tasks for job {job_id}")
-        return Response(list(tasks))
-    except Job.DoesNotExist:
-        return Response({'error': f'Job {job_id} not found'}, status=404)
-    except Exception as e:
-        print(f"Error in job_tasks: {str(e)}")
-        return Response({'error': str(e)}, status=500)
-
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def submit_timesheet(request, staff_uuid):
     """Submit timesheet entries for a staff member"""
     try:
-        # Standardize UUIDs by removing hyphens
-        staff_uuid_clean = standardize_uuid(staff_uuid)
-        user_staff_uuid = standardize_uuid(request.user.profile.staff_uuid) if request.user.profile.staff_uuid else None
-        
         is_admin = request.user.profile.is_admin
-        is_own_timesheet = user_staff_uuid == staff_uuid_clean
+        is_own_timesheet = request.user.profile.staff_uuid == staff_uuid
 
         if not (is_admin or is_own_timesheet):
             return Response(
@@ -491,7 +171,7 @@ def submit_timesheet(request, staff_uuid):
             )
 
         try:
-            staff = Staff.objects.get(uuid=format_uuid_with_hyphens(staff_uuid))
+            staff = Staff.objects.get(uuid=staff_uuid)
             staff_name = staff.name
         except Staff.DoesNotExist:
             return Response(
@@ -500,7 +180,7 @@ def submit_timesheet(request, staff_uuid):
             )
 
         entries = request.data.get('entries', [])
-        print(f"Received entries: {entries}")
+        logger.debug("Received entries: %s", entries)
 
         # Process entries
         for entry in entries:
@@ -508,11 +188,12 @@ def submit_timesheet(request, staff_uuid):
             job_id = entry.get('job_id')
             
             try:
-                job = Job.objects.get(job_id=job_id)
-                job_name = job.name
-                
-                task = Task.objects.get(uuid=task_uuid)
+                # One query for the task and its job
+                task = Task.objects.select_related('job').get(uuid=task_uuid, job__job_id=job_id)
                 task_name = task.name
+
+                job = task.job
+                job_name = job.name
                 
                 for time_entry in entry.get('entries', []):
                     entry_date = time_entry['date']
@@ -524,9 +205,9 @@ def submit_timesheet(request, staff_uuid):
                     minutes = int(float(hours) * 60)
 
                     existing_entry = Timesheet.objects.filter(
-                        staff_uuid=format_uuid_with_hyphens(staff_uuid),
+                        staff_uuid=staff_uuid,
                         task_uuid=task_uuid,
-                        job_id=job_id,
+                        job_number=job_id,
                         entry_date=entry_date
                     ).first()
 
@@ -537,28 +218,30 @@ def submit_timesheet(request, staff_uuid):
                     else:
                         Timesheet.objects.create(
                             uuid=uuid.uuid4(),
-                            staff_uuid=format_uuid_with_hyphens(staff_uuid),
+                            staff_uuid=staff_uuid,
                             staff_name=staff_name,
+                            staff=staff,
                             task_name=task_name,
                             task_uuid=task_uuid,
-                            job_id=job_id,
+                            task=task,
+                            job_number=job_id,
                             job_name=job_name,
+                            job=job,
                             entry_date=entry_date,
                             minutes=minutes,
                             note=notes,  # Store as string
                             billable=True
                         )
 
-            except (Job.DoesNotExist, Task.DoesNotExist) as e:
+            except Task.DoesNotExist:
                 return Response(
-                    {'error': str(e)},
+                    {'error': f'Task {task_uuid} not found on job {job_id}'},
                     status=404
                 )
 
         return Response({'message': 'Timesheet submitted successfully'})
     except Exception as e:
-        print(f"Error submitting timesheet: {str(e)}")
-        print(f"Request data: {request.data}")
+        logger.exception("Error submitting timesheet: %s (request data: %s)", e, request.data)
         return Response(
             {'error': f'Failed to submit timesheet: {str(e)}'}, 
             status=500
@@ -566,6 +249,7 @@ def submit_timesheet(request, staff_uuid):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@conditional_on('staff')
 def admin_staff_list(request):
     """Get all staff members for admin view"""
     try:
@@ -587,7 +271,7 @@ def admin_staff_list(request):
         
         return Response(list(staff))
     except Exception as e:
-        print(f"Error in admin_staff_list: {str(e)}")
+        logger.exception("Error in admin_staff_list: %s", e)
         return Response(
             {'error': str(e)}, 
             status=500
@@ -595,6 +279,7 @@ def admin_staff_list(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@conditional_on('staff')
 def admin_staff_detail(request, staff_uuid):
     """Get details for a specific staff member"""
     try:
@@ -621,8 +306,646 @@ def admin_staff_detail(request, staff_uuid):
         
         return Response(staff)
     except Exception as e:
-        print(f"Error in admin_staff_detail: {str(e)}")
+        logger.exception("Error in admin_staff_detail: %s", e)
         return Response(
             {'error': str(e)}, 
             status=500
-        )
\ No newline at end of file
+        )
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@conditional_on('timesheet', dated=True)
+def staff_hours_summary(request, staff_uuid):
+    """
+    Hours and billable ratio for a period, compared with the period before it,
+    plus hours per ISO week per job. Reads the summary tables only, never the
+    raw timesheets. Optional `start` / `end` (YYYY-MM-DD) default to the last
+    four weeks up to the end of the current week.
+    """
+    try:
+        profile = request.user.profile
+        if not (profile.is_admin or profile.is_manager or profile.staff_uuid == staff_uuid):
+            return Response({'error': 'You can only view your own hours unless you are an admin or manager'}, status=403)
+
+        try:
+            end = request.query_params.get('end')
+            end = datetime.strptime(end, '%Y-%m-%d').date() if end else week_start_of(timezone.localdate()) + timedelta(days=6)
+            start = request.query_params.get('start')
+            start = datetime.strptime(start, '%Y-%m-%d').date() if start else week_start_of(end) - timedelta(weeks=3)
+        except ValueError:
+            return Response({'error': 'start and end must be dates in YYYY-MM-DD format'}, status=400)
+        if start > end:
+            return Response({'error': 'start must not be after end'}, status=400)
+
+        period_days = (end - start).days + 1
+        previous_start = start - timedelta(days=period_days)
+
+        # Both periods from the daily table in one query
+        periods = {
+            'current': {'minutes': 0, 'billable_minutes': 0},
+            'previous': {'minutes': 0, 'billable_minutes': 0},
+        }
+        day_rows = StaffDaySummary.objects.filter(
+            staff_uuid=staff_uuid, day__range=[previous_start, end]
+        ).values_list('day', 'billable', 'minutes')
+        for day, billable, minutes in day_rows:
+            totals = periods['current' if day >= start else 'previous']
+            totals['minutes'] += minutes
+            if billable:
+                totals['billable_minutes'] += minutes
+
+        for totals in periods.values():
+            totals['hours'] = totals['minutes'] / 60
+            totals['billable_hours'] = totals['billable_minutes'] / 60
+            totals['billable_ratio'] = (
+                round(totals['billable_minutes'] / totals['minutes'], 4) if totals['minutes'] else None
+            )
+
+        weeks = {}
+        week_rows = StaffWeekJobSummary.objects.filter(
+            staff_uuid=staff_uuid, week_start__range=[week_start_of(start), end]
+        ).values_list('week_start', 'job_number', 'minutes', 'billable_minutes').order_by('week_start', 'job_number')
+        for week_start, job_number, minutes, billable_minutes in week_rows:
+            week = weeks.setdefault(week_start.strftime('%Y-%m-%d'), {'hours': 0, 'billable_hours': 0, 'jobs': []})
+            week['hours'] += minutes / 60
+            week['billable_hours'] += billable_minutes / 60
+            week['jobs'].append({
+                'job_id': job_number or None,
+                'hours': minutes / 60,
+                'billable_hours': billable_minutes / 60,
+            })
+
+        return Response({
+            'start': start.strftime('%Y-%m-%d'),
+            'end': end.strftime('%Y-%m-%d'),
+            'previous_start': previous_start.strftime('%Y-%m-%d'),
+            'current': periods['current'],
+            'previous': periods['previous'],
+            'weeks': weeks,
+        })
+    except Exception as e:
+        logger.exception("Error in staff_hours_summary: %s", e)
+        return Response({'error': str(e)}, status=500)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@conditional_on('timesheet', 'task', 'staff', 'job', 'jobassignedstaff', dated=True)
+def team_weekly_hours(request):
+    """
+    Weekly timesheet grid for a whole team: per-day billable/non-billable hours
+    and missing weekdays for every staff member the caller manages (everyone
+    for admins). Optional `week_start` (YYYY-MM-DD, snapped to its Monday)
+    defaults to the current week; `weeks` (1-8) defaults to 1.
+    """
+    try:
+        staff = team_staff(request.user.profile)
+        if staff is None:
+            return Response({'error': 'Manager or admin access required'}, status=403)
+
+        try:
+            week_start = request.query_params.get('week_start')
+            week_start = datetime.strptime(week_start, '%Y-%m-%d').date() if week_start else timezone.localdate()
+            weeks = int(request.query_params.get('weeks', 1))
+        except ValueError:
+            return Response({'error': 'week_start must be YYYY-MM-DD and weeks an integer'}, status=400)
+        if not 1 <= weeks <= 8:
+            return Response({'error': 'weeks must be between 1 and 8'}, status=400)
+        week_start = week_start_of(week_start)
+
+        return Response({
+            'week_start': week_start.strftime('%Y-%m-%d'),
+            'week_end': (week_start + timedelta(days=7 * weeks - 1)).strftime('%Y-%m-%d'),
+            'staff': team_weekly_grid(staff, week_start, weeks),
+        })
+    except Exception as e:
+        logger.exception("Error in team_weekly_hours: %s", e)
+        return Response({'error': str(e)}, status=500)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@conditional_on('timesheet', 'staff', 'job', 'jobassignedstaff', dated=True)
+def timesheet_gaps_report(request):
+    """
+    Staff with missing or under-filled weekdays in a period. Optional `start` /
+    `end` (YYYY-MM-DD) default to last week's Monday-Friday; `min_hours` is the
+    smallest full day (default 7.5). Scoped like the team grid.
+    """
+    try:
+        staff = team_staff(request.user.profile)
+        if staff is None:
+            return Response({'error': 'Manager or admin access required'}, status=403)
+
+        default_start, default_end = last_week()
+        try:
+            start = request.query_params.get('start')
+            start = datetime.strptime(start, '%Y-%m-%d').date() if start else default_start
+            end = request.query_params.get('end')
+            end = datetime.strptime(end, '%Y-%m-%d').date() if end else default_end
+            min_hours = float(request.query_params.get('min_hours', DEFAULT_DAILY_MINUTES / 60))
+        except ValueError:
+            return Response({'error': 'start and end must be YYYY-MM-DD and min_hours a number'}, status=400)
+        if start > end or (end - start).days > 92:
+            return Response({'error': 'start must not be after end, and the period is limited to 92 days'}, status=400)
+
+        return Response({
+            'start': start.strftime('%Y-%m-%d'),
+            'end': end.strftime('%Y-%m-%d'),
+            'min_hours': min_hours,
+            'staff': timesheet_gaps(staff, start, end, min_minutes=round(min_hours * 60)),
+        })
+    except Exception as e:
+        logger.exception("Error in timesheet_gaps_report: %s", e)
+        return Response({'error': str(e)}, status=500)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@conditional_on('timesheet', 'task', 'taskassignedstaff', 'staff', 'job', 'jobassignedstaff', dated=True)
+def staff_capacity_report(request):
+    """
+    Allocated vs logged minutes per staff member for the planning board.
+    Optional `start` / `end` (YYYY-MM-DD) default to the four weeks from this
+    Monday; `daily_hours` (default 7.5) sets the capacity of a weekday.
+    Scoped like the team grid.
+    """
+    try:
+        staff = team_staff(request.user.profile)
+        if staff is None:
+            return Response({'error': 'Manager or admin access required'}, status=403)
+
+        try:
+            start = request.query_params.get('start')
+            start = datetime.strptime(start, '%Y-%m-%d').date() if start else week_start_of(timezone.localdate())
+            end = request.query_params.get('end')
+            end = datetime.strptime(end, '%Y-%m-%d').date() if end else start + timedelta(weeks=4, days=-1)
+            daily_hours = float(request.query_params.get('daily_hours', DEFAULT_DAILY_MINUTES / 60))
+        except ValueError:
+            return Response({'error': 'start and end must be YYYY-MM-DD and daily_hours a number'}, status=400)
+        if start > end or (end - start).days > 366:
+            return Response({'error': 'start must not be after end, and the window is limited to a year'}, status=400)
+
+        return Response({
+            'start': start.strftime('%Y-%m-%d'),
+            'end': end.strftime('%Y-%m-%d'),
+            'staff': staff_capacity(staff, start, end, daily_minutes=round(daily_hours * 60)),
+        })
+    except Exception as e:
+        logger.exception("Error in staff_capacity_report: %s", e)
+        return Response({'error': str(e)}, status=500)
+
+def _schedule_window(request):
+    """(staff in scope as {uuid: name}, start, end) for the schedule views, or an error Response"""
+    staff = team_staff(request.user.profile)
+    if staff is None:
+        return Response({'error': 'Manager or admin access required'}, status=403)
+    try:
+        start = request.query_params.get('start')
+        start = datetime.strptime(start, '%Y-%m-%d').date() if start else timezone.localdate()
+        end = request.query_params.get('end')
+        end = datetime.strptime(end, '%Y-%m-%d').date() if end else start + timedelta(days=13)
+        wanted = request.query_params.get('staff')
+        wanted = {uuid.UUID(u.strip()) for u in wanted.split(',') if u.strip()} if wanted else None
+    except ValueError:
+        return Response({'error': 'start and end must be YYYY-MM-DD and staff comma separated UUIDs'}, status=400)
+    if start > end:
+        return Response({'error': 'start must not be after end'}, status=400)
+
+    members = dict(staff.order_by('name').values_list('uuid', 'name'))
+    if wanted is not None:
+        members = {staff_uuid: name for staff_uuid, name in members.items() if staff_uuid in wanted}
+    return members, start, end
+
+
+def _booking_json(booking):
+    return {
+        'job_uuid': booking.job_uuid,
+        'job_id': booking.job_number,
+        'job_name': booking.job_name,
+        'start': booking.start.strftime('%Y-%m-%d'),
+        'end': booking.end.strftime('%Y-%m-%d'),
+    }
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@conditional_on('job', 'jobassignedstaff', 'staff', catch_up=catch_up_schedule)
+def schedule_availability(request):
+    """
+    Which staff are free in a window (no dated job assignment overlaps it) and
+    what the others are booked on. Optional `start` / `end` (YYYY-MM-DD,
+    default the next two weeks) and `staff` (comma separated UUIDs).
+    """
+    try:
+        window = _schedule_window(request)
+        if isinstance(window, Response):
+            return window
+        members, start, end = window
+
+        free, busy = get_schedule().availability(members, start, end)
+        return Response({
+            'start': start.strftime('%Y-%m-%d'),
+            'end': end.strftime('%Y-%m-%d'),
+            'free': [{'staff_uuid': staff_uuid, 'name': members[staff_uuid]} for staff_uuid in free],
+            'busy': [
+                {'staff_uuid': staff_uuid, 'name': members[staff_uuid],
+                 'bookings': [_booking_json(booking) for booking in bookings]}
+                for staff_uuid, bookings in busy.items()
+            ],
+        })
+    except Exception as e:
+        logger.exception("Error in schedule_availability: %s", e)
+        return Response({'error': str(e)}, status=500)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@conditional_on('job', 'jobassignedstaff', 'staff', catch_up=catch_up_schedule)
+def schedule_conflicts(request):
+    """
+    Double bookings: pairs of a staff member's job assignments whose date
+    ranges overlap within the window. Same parameters as availability.
+    """
+    try:
+        window = _schedule_window(request)
+        if isinstance(window, Response):
+            return window
+        members, start, end = window
+
+        found = get_schedule().conflicts(members, start, end)
+        return Response({
+            'start': start.strftime('%Y-%m-%d'),
+            'end': end.strftime('%Y-%m-%d'),
+            'staff': [
+                {
+                    'staff_uuid': staff_uuid,
+                    'name': members[staff_uuid],
+                    'conflicts': [
+                        {
+                            'first': _booking_json(first),
+                            'second': _booking_json(second),
+                            'overlap_start': max(first.start, second.start, start).strftime('%Y-%m-%d'),
+                            'overlap_end': min(first.end, second.end, end).strftime('%Y-%m-%d'),
+                        }
+                        for first, second in pairs
+                    ],
+                }
+                for staff_uuid, pairs in found.items()
+            ],
+        })
+    except Exception as e:
+        logger.exception("Error in schedule_conflicts: %s", e)
+        return Response({'error': str(e)}, status=500)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@conditional_on('job', 'client', 'contact', 'staff')
+def search(request):
+    """
+    Ranked search across jobs, clients, contacts and (for admins) staff.
+    `q` is required; optional `types` (comma separated: job, client, contact,
+    staff), `limit` (default 20, at most 100) and `offset`.
+    """
+    try:
+        query = request.query_params.get('q', '').strip()
+        allowed = SEARCH_KINDS if request.user.profile.is_admin else tuple(k for k in SEARCH_KINDS if k != 'staff')
+        kinds = request.query_params.get('types')
+        kinds = [k.strip() for k in kinds.split(',') if k.strip()] if kinds else list(allowed)
+        if any(kind not in allowed for kind in kinds):
+            return Response({'error': f"types must be a subset of {', '.join(allowed)}"}, status=400)
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', 20)), 100))
+            offset = max(0, int(request.query_params.get('offset', 0)))
+        except ValueError:
+            return Response({'error': 'limit and offset must be integers'}, status=400)
+
+        matches = ranked_matches(query, kinds)
+        if matches is None:
+            return Response({'error': 'q must contain at least one letter or digit'}, status=400)
+
+        page = list(matches[offset:offset + limit + 1])
+        has_more = len(page) > limit
+        page = page[:limit]
+        return Response({
+            'query': query,
+            'results': describe(page),
+            'offset': offset,
+            'limit': limit,
+            'next_offset': offset + limit if has_more else None,
+        })
+    except Exception as e:
+        logger.exception("Error in search: %s", e)
+        return Response({'error': str(e)}, status=500)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def autocomplete(request):
+    """
+    Typeahead for the timesheet entry screen. `q` is matched as word prefixes
+    against job numbers/names, client names and task names; optional `types`
+    (comma separated: job, client, task), `job` (a job UUID, to only suggest
+    its tasks) and `limit`. Non-admins only get the jobs they are assigned to
+    (or manage) and those jobs' tasks and clients.
+    """
+    try:
+        kinds = request.query_params.get('types')
+        kinds = tuple(k.strip() for k in kinds.split(',') if k.strip()) if kinds else AUTOCOMPLETE_KINDS
+        if any(kind not in AUTOCOMPLETE_KINDS for kind in kinds):
+            return Response({'error': f"types must be a subset of {', '.join(AUTOCOMPLETE_KINDS)}"}, status=400)
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', DEFAULT_LIMIT)), MAX_LIMIT))
+            job_uuid = request.query_params.get('job')
+            job_uuid = uuid.UUID(job_uuid) if job_uuid else None
+        except ValueError:
+            return Response({'error': 'limit must be an integer and job a UUID'}, status=400)
+
+        index = get_autocomplete()
+        job = None
+        if job_uuid is not None:
+            job = index.pks.get(('job', job_uuid))
+            if job is None:
+                return Response({'error': 'Job not found'}, status=404)
+
+        entries = index.lookup(request.query_params.get('q', ''), request.user.profile, kinds, job, limit)
+        return Response([index.describe(entry) for entry in entries])
+    except Exception as e:
+        logger.exception("Error in autocomplete: %s", e)
+        return Response({'error': str(e)}, status=500)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def bootstrap(request):
+    """
+    Everything the app loads after login in one request (see main.dashboard):
+    `sections` picks which (comma separated, default all: user, jobs, week,
+    clients, contacts, recent_tasks); `week_start` (YYYY-MM-DD, default this
+    week) and `shape=compact` apply to the week. Each section carries its own
+    ETag; send the ones you hold in If-None-Match and unchanged sections come
+    back as {etag, not_modified}, or the whole response as a 304 if none
+    changed.
+    """
+    try:
+        names = request.query_params.get('sections')
+        names = list(dict.fromkeys(n.strip() for n in names.split(',') if n.strip())) if names else list(SECTIONS)
+        if any(name not in SECTIONS for name in names):
+            return Response({'error': f"sections must be a subset of {', '.join(SECTIONS)}"}, status=400)
+        week_start = request.query_params.get('week_start')
+        try:
+            week_start = datetime.strptime(week_start, '%Y-%m-%d').date() if week_start else None
+        except ValueError:
+            return Response({'error': 'Invalid date format. Use YYYY-MM-DD'}, status=400)
+
+        sections = dashboard_bootstrap(
+            request.user,
+            names,
+            known_etags=parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')),
+            week_start=week_start,
+            compact=request.query_params.get('shape') == 'compact',
+        )
+        if all(section.get('not_modified') for section in sections.values()):
+            response = Response(status=304)
+        else:
+            response = Response(sections)
+        # The body depends on who is asking
+        patch_vary_headers(response, ('Authorization',))
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+    except Exception as e:
+        logger.exception("Error in bootstrap: %s", e)
+        return Response({'error': str(e)}, status=500)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@conditional_on('timesheet', 'staff', 'job', 'jobassignedstaff')
+def timesheet_list(request):
+    """
+    Timesheet entries, newest first, paged with `limit` (default 100) and
+    `offset`. Filters (see TimesheetFilter): `staff`, `job` (job number),
+    `task`, `start` / `end` (YYYY-MM-DD, inclusive), `billable`;
+    `ordering=entry_date|-entry_date`; `fields` selects the keys returned.
+    Staff see their own entries, managers their team's, admins everyone's.
+    """
+    try:
+        try:
+            columns, transform = TIMESHEET_FIELDS.select(request)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+        profile = request.user.profile
+        timesheets = Timesheet.objects.order_by('-entry_date', 'uuid')
+        if not profile.is_admin:
+            team = team_staff(profile)
+            if team is None:
+                # Unlinked users have no entries (filtering on NULL would match the unassigned ones)
+                timesheets = timesheets.filter(staff_uuid=profile.staff_uuid) if profile.staff_uuid else timesheets.none()
+            else:
+                timesheets = timesheets.filter(staff_uuid__in=team.values('uuid'))
+
+        timesheets = _filtered(request, TimesheetFilter, timesheets)
+        if isinstance(timesheets, Response):
+            return timesheets
+        return _list_response(request, timesheets.values(*columns), transform, default_limit=100)
+    except Exception as e:
+        logger.exception("Error in timesheet_list: %s", e)
+        return Response({'error': str(e)}, status=500)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def export_timesheets(request, export_format):
+    """
+    Stream timesheet rows, with each staff member's payroll code, as CSV or
+    NDJSON. Optional filters: `start` / `end` (YYYY-MM-DD, inclusive), `staff`
+    (staff UUID) and `job` (job number). Admins export everything; managers
+    only their team's rows.
+    """
+    try:
+        profile = request.user.profile
+        staff = team_staff(profile)
+        if staff is None:
+            return Response({'error': 'Manager or admin access required'}, status=403)
+        if export_format not in EXPORT_FORMATS:
+            return Response({'error': f'Unknown export format: {export_format}'}, status=404)
+
+        timesheets = Timesheet.objects.all()
+        if not profile.is_admin:
+            timesheets = timesheets.filter(staff_uuid__in=staff.values('uuid'))
+
+        try:
+            start = request.query_params.get('start')
+            if start:
+                start = datetime.strptime(start, '%Y-%m-%d').date()
+                timesheets = timesheets.filter(entry_date__gte=day_bounds(start)[0])
+            end = request.query_params.get('end')
+            if end:
+                end = datetime.strptime(end, '%Y-%m-%d').date()
+                timesheets = timesheets.filter(entry_date__lt=day_bounds(end)[1])
+            staff_uuid = request.query_params.get('staff')
+            if staff_uuid:
+                timesheets = timesheets.filter(staff_uuid=uuid.UUID(staff_uuid))
+        except ValueError:
+            return Response({'error': 'start and end must be YYYY-MM-DD and staff a UUID'}, status=400)
+        job_number = request.query_params.get('job')
+        if job_number:
+            timesheets = timesheets.filter(job_number=job_number)
+
+        stream, astream, content_type = EXPORT_FORMATS[export_format]
+        if isinstance(request._request, ASGIRequest):
+            # Streamed from the event loop: Django would buffer a sync iterator whole first
+            stream = astream
+        response = StreamingHttpResponse(stream(timesheets), content_type=content_type)
+        filename = '_'.join(['timesheets'] + [str(part) for part in (start, end) if part])
+        response['Content-Disposition'] = f'attachment; filename="{filename}.{export_format}"'
+        return response
+    except Exception as e:
+        logger.exception("Error in export_timesheets: %s", e)
+        return Response({'error': str(e)}, status=500)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@conditional_on('timesheet', 'job', 'client', 'staff', 'jobassignedstaff', catch_up=catch_up_cube)
+def timesheet_analytics(request):
+    """
+    Ad-hoc timesheet aggregates from the in-memory cube. `group_by` is a comma
+    separated list of up to three of staff, job, task, client, day, week,
+    month, billable. Filters: `start` / `end` (YYYY-MM-DD), `staff`, `job`,
+    `task`, `client` (comma separated UUIDs / job numbers) and `billable`.
+    Managers only see their team's time.
+    """
+    try:
+        profile = request.user.profile
+        team = team_staff(profile)
+        if team is None:
+            return Response({'error': 'Manager or admin access required'}, status=403)
+
+        params = request.query_params
+        group_by = [d for d in params.get('group_by', '').split(',') if d]
+        unknown = set(group_by) - set(GROUP_DIMENSIONS)
+        if unknown or len(group_by) > MAX_GROUP_DIMENSIONS or len(set(group_by)) != len(group_by):
+            return Response({
+                'error': f'group_by takes up to {MAX_GROUP_DIMENSIONS} distinct dimensions out of: '
+                         f'{", ".join(GROUP_DIMENSIONS)}'
+            }, status=400)
+
+        def values(name, parse=str):
+            raw = params.get(name)
+            return [parse(v.strip()) for v in raw.split(',') if v.strip()] if raw else None
+
+        try:
+            filters = {
+                'staff': values('staff', uuid.UUID),
+                'jobs': values('job'),
+                'tasks': values('task', uuid.UUID),
+                'clients': values('client', uuid.UUID),
+                'start': datetime.strptime(params['start'], '%Y-%m-%d').date() if params.get('start') else None,
+                'end': datetime.strptime(params['end'], '%Y-%m-%d').date() if params.get('end') else None,
+                'billable': {'true': True, 'false': False}[params['billable'].lower()] if params.get('billable') else None,
+                'limit': max(1, min(int(params.get('limit', 1000)), 10000)),
+            }
+        except (ValueError, KeyError):
+            return Response({'error': 'Invalid filter: check the UUIDs, dates (YYYY-MM-DD), billable (true/false) and limit'}, status=400)
+
+        if not profile.is_admin:
+            team_uuids = set(team.values_list('uuid', flat=True))
+            filters['staff'] = [u for u in filters['staff'] if u in team_uuids] if filters['staff'] is not None else team_uuids
+
+        started = time.perf_counter()
+        rows = get_cube().aggregate(group_by=group_by, **filters)
+        return Response({
+            'group_by': group_by,
+            'rows': rows,
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 2),
+        })
+    except Exception as e:
+        logger.exception("Error in timesheet_analytics: %s", e)
+        return Response({'error': str(e)}, status=500)
+
+# Fields (and aliased related fields) returned for created/updated objects in the changes feed
+CHANGE_FEED_FIELDS = {
+    'job': (Job, ('uuid', 'job_id', 'name', 'client_uuid', 'state', 'start_date', 'due_date'), {}),
+    'task': (Task, ('uuid', 'name', 'estimated_minutes', 'completed', 'billable'),
+             {'job_number': F('job__job_id')}),
+    'client': (Client, ('uuid', 'name', 'is_archived', 'phone', 'email', 'address', 'city',
+                        'region', 'post_code', 'country', 'website', 'type_name',
+                        'account_manager_name', 'job_manager_name'), {}),
+    'contact': (Contact, ('uuid', 'name', 'phone', 'email', 'mobile', 'position', 'is_primary'),
+                {'client_uuid': F('client__uuid')}),
+    'timesheet': (Timesheet, ('uuid', 'job_number', 'job_name', 'task_uuid', 'task_name', 'staff_uuid',
+                              'entry_date', 'minutes', 'note', 'billable'), {}),
+}
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def changes_since(request):
+    """
+    Incremental refresh feed: everything created, updated or deleted after the
+    `since` cursor. Call without `since` to get the current cursor (do this
+    before the initial full download), then pass back `next_since` each time.
+    The cursor only moves past changes that have settled (see
+    main.changelog), so the most recent changes may be sent again on the
+    next call; apply them idempotently.
+    """
+    try:
+        limit = max(1, min(int(request.query_params.get('limit', 1000)), 5000))
+        since = request.query_params.get('since')
+        if since is None:
+            return Response({'next_since': settled_head(), 'has_more': False, 'changes': {}})
+        since = int(since)
+
+        log = list(
+            ChangeLog.objects.filter(seq__gt=since).order_by('seq').values_list(*CHANGE_LOG_COLUMNS)[:limit + 1]
+        )
+        full = len(log) > limit
+        log = log[:limit]
+        next_since = settled_seq(log, since)
+        # Another page only helps if this one moved the cursor
+        has_more = full and next_since > since
+
+        # Collapse to the latest action per object
+        latest = {}
+        for _, model_name, object_uuid, action, staff_uuid, _ in log:
+            latest[(model_name, object_uuid)] = (action, staff_uuid)
+
+        profile = request.user.profile
+        own_timesheets_only = not (profile.is_admin or profile.is_manager)
+        changes = {}
+        for model_name, (model, fields, related) in CHANGE_FEED_FIELDS.items():
+            upserted_uuids = [u for (m, u), (a, _) in latest.items() if m == model_name and a != 'DELETE']
+            deleted = [
+                u for (m, u), (a, staff_uuid) in latest.items() if m == model_name and a == 'DELETE'
+                # Deleted timesheets are scoped like the rest, by the staff_uuid logged with them
+                and not (model is Timesheet and own_timesheets_only and (
+                    profile.staff_uuid is None or staff_uuid != profile.staff_uuid
+                ))
+            ]
+            upserted = []
+            if upserted_uuids:
+                rows = model.objects.filter(uuid__in=upserted_uuids)
+                if model is Timesheet and own_timesheets_only:
+                    rows = rows.filter(staff_uuid=profile.staff_uuid) if profile.staff_uuid else rows.none()
+                upserted = list(rows.values(*fields, **related))
+                # Objects removed since this page was logged are reported as deleted
+                found = {str(row['uuid']) for row in upserted}
+                deleted += [u for u in upserted_uuids if str(u) not in found and model is not Timesheet]
+            if upserted or deleted:
+                changes[model_name] = {'upserted': upserted, 'deleted': deleted}
+
+        return Response({
+            'next_since': next_since,
+            'has_more': has_more,
+            'changes': changes,
+        })
+    except ValueError:
+        return Response({'error': 'since and limit must be integers'}, status=400)
+    except Exception as e:
+        logger.exception("Error in changes_since: %s", e)
+        return Response({'error': str(e)}, status=500)
+
+@api_view(['GET', 'DELETE'])
+@permission_classes([IsAuthenticated])
+def request_metrics(request):
+    """
+    Per-endpoint request counts, latency percentiles, queries, database time
+    and response sizes, for this server process since it started or was last
+    reset (see main.metrics). DELETE resets them. Admins only.
+    """
+    if not request.user.profile.is_admin:
+        return Response({'error': 'Admin access required'}, status=403)
+    if request.method == 'DELETE':
+        metrics.reset()
+        return Response(status=204)
+    return Response(metrics.snapshot())
@@ -13,4 +13,6 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mysite.settings')
 
-application = get_asgi_application()
+from .static import with_static_files  # noqa: E402  (needs the settings)
+
+application = with_static_files(get_asgi_application())
@@ -103,10 +103,19 @@ CORS_ALLOW_HEADERS = [
     'user-agent',
     'x-csrftoken',
     'x-requested-with',
+    'if-none-match',
+]
+# Let the frontend read validators for conditional requests
+CORS_EXPOSE_HEADERS = [
+    'etag',
 ]
 
 MIDDLEWARE = [
+    # Outermost, so it times the whole request and sees the bytes actually sent
+    'main.metrics.QueryMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    # Before anything that reads or changes the response body
+    'main.middleware.CompressionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -114,7 +123,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    # Every middleware here is async-capable, so none is adapted under ASGI. Static files are
+    # served by WhiteNoise (sync-only) ahead of Django instead, see mysite/static.py
 ]
 
 ROOT_URLCONF = 'mysite.urls'
@@ -200,13 +210,22 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Add these settings for REST framework and JWT
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # SimpleJWT, with the user and profile built from the token's claims
+        'main.authentication.ClaimsJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        # orjson-backed, same output as rest_framework.renderers.JSONRenderer
+        'main.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
+# Responses smaller than this (bytes) aren't worth compressing (main.middleware)
+COMPRESSION_MIN_SIZE = config('COMPRESSION_MIN_SIZE', default=1024, cast=int)
+
 # JWT settings
 SIMPLE_JWT = {
     'AUTH_HEADER_TYPES': ('JWT',),
@@ -214,6 +233,9 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
     'USER_ID_FIELD': 'username',
     'USER_AUTHENTICATION_RULE': 'rest_framework_simplejwt.authentication.default_user_authentication_rule',
+    # Put the profile (staff_uuid, role) in the tokens, re-read on refresh (main.authentication)
+    'TOKEN_OBTAIN_SERIALIZER': 'main.authentication.ProfileTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'main.authentication.ProfileTokenRefreshSerializer',
 }
 
 # Djoser settings
@@ -241,10 +263,32 @@ DJOSER = {
     }
 }
 
+# Seconds between change-log checks of the in-process indexes: analytics cube, schedule
+# and autocomplete (main.analytics, main.schedule, main.autocomplete)
+ANALYTICS_REFRESH_INTERVAL = config('ANALYTICS_REFRESH_INTERVAL', default=2.0, cast=float)
+
+# Seconds after which a change-log row's transaction (and those of every lower seq) is
+# assumed committed: readers of the log hold their cursor back this far (main.changelog).
+# Must exceed the longest write transaction
+CHANGE_LOG_SETTLE_SECONDS = config('CHANGE_LOG_SETTLE_SECONDS', default=60, cast=int)
+
+# Requests per process the async views let use the database at once (main.async_views);
+# keep it within what the database allows per instance
+ASYNC_DB_CONCURRENCY = config('ASYNC_DB_CONCURRENCY', default=8, cast=int)
+
 # Add email backend settings (for development)
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
 # Add this after all your other settings
+# Request instrumentation (main.metrics): Server-Timing headers, /api/metrics/, and warnings
+# for SQL shapes repeated more than QUERY_REPEAT_THRESHOLD times in a request (N+1s) and for
+# queries slower than SLOW_QUERY_MS (logged with their plan)
+QUERY_METRICS = config('QUERY_METRICS', default=True, cast=bool)
+QUERY_REPEAT_THRESHOLD = config('QUERY_REPEAT_THRESHOLD', default=10, cast=int)
+SLOW_QUERY_MS = config('SLOW_QUERY_MS', default=500, cast=float)
+# Recent requests per endpoint kept for the latency percentiles
+QUERY_METRICS_SAMPLES = config('QUERY_METRICS_SAMPLES', default=1000, cast=int)
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
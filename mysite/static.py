@@ -0,0 +1,35 @@
+"""
+Static files (STATIC_ROOT, filled by collectstatic) served by WhiteNoise in
+front of Django rather than as a middleware: WhiteNoise is sync-only, and in
+MIDDLEWARE it would have every ASGI request adapted to a thread and back.
+Under WSGI it wraps the application; under ASGI only requests under
+STATIC_URL go to it, in a thread, and everything else stays on the event
+loop.
+"""
+
+from asgiref.wsgi import WsgiToAsgi
+from django.conf import settings
+from whitenoise import WhiteNoise
+
+
+def _not_found(environ, start_response):
+    start_response('404 Not Found', [('Content-Type', 'text/plain')])
+    return [b'Not Found']
+
+
+def static_files(application=_not_found):
+    """WhiteNoise serving STATIC_ROOT at STATIC_URL, passing any other request to the WSGI `application`"""
+    return WhiteNoise(application, root=settings.STATIC_ROOT, prefix=settings.STATIC_URL)
+
+
+def with_static_files(application):
+    """The ASGI `application` with requests under STATIC_URL answered by WhiteNoise"""
+    static = WsgiToAsgi(static_files())
+    prefix = '/' + settings.STATIC_URL.lstrip('/')
+
+    async def router(scope, receive, send):
+        if scope['type'] == 'http' and scope['path'].startswith(prefix):
+            return await static(scope, receive, send)
+        return await application(scope, receive, send)
+
+    return router
@@ -13,4 +13,6 @@ from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mysite.settings')
 
-application = get_wsgi_application()
+from .static import static_files  # noqa: E402  (needs the settings)
+
+application = static_files(get_wsgi_application())
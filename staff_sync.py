@@ -16,6 +16,7 @@ django.setup()  # Initialize Django
 # 2) Import Django models AFTER django.setup()
 # -----------------------------------------------------------------------------
 from main.models import Staff  # or wherever your Staff model lives
+from main.linking import link_foreign_keys
 
 # -----------------------------------------------------------------------------
 # 3) API Credentials & Base URL (read via python-decouple)
@@ -88,6 +89,9 @@ def sync_staff_to_db():
             }
         )
 
+    # Timesheets and assignments synced before their staff member can be linked now
+    link_foreign_keys()
+
     print(f"Successfully synced {len(staff_members)} staff records.")
 
 if __name__ == "__main__":
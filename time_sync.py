@@ -5,6 +5,7 @@ from decouple import config
 from xml.etree import ElementTree as ET
 from django.utils.dateparse import parse_datetime
 from datetime import date
+import uuid
 
 # --------------------------------------------------------------------------
 # 1) Configure Django
@@ -15,7 +16,8 @@ django.setup()
 # --------------------------------------------------------------------------
 # 2) Import Django models AFTER django.setup()
 # --------------------------------------------------------------------------
-from main.models import Timesheet  # Ensure correct model import
+from main.models import Job, Task, Timesheet  # Ensure correct model import
+from main.linking import link_foreign_keys, staff_pk_map
 
 # --------------------------------------------------------------------------
 # 3) API Credentials & Base URL (from .env)
@@ -77,7 +79,7 @@ def get_time_sheet_entries(from_date, to_date):
         for time in root.findall(".//Time"):
             entry = {
                 "uuid": time.find("UUID").text if time.find("UUID") is not None else None,
-                "job_id": time.find("Job/ID").text if time.find("Job/ID") is not None else None,
+                "job_number": time.find("Job/ID").text if time.find("Job/ID") is not None else None,
                 "job_name": time.find("Job/Name").text if time.find("Job/Name") is not None else None,
                 "task_uuid": time.find("Task/UUID").text if time.find("Task/UUID") is not None else None,
                 "task_name": time.find("Task/Name").text if time.find("Task/Name") is not None else None,
@@ -112,6 +114,11 @@ def sync_timesheets_to_db():
         print("No time sheet entries found or API call failed.")
         return
 
+    # Lookup tables for the foreign keys, loaded once instead of per entry
+    job_pks = dict(Job.objects.filter(job_id__isnull=False).values_list("job_id", "pk"))
+    task_pks = dict(Task.objects.filter(uuid__isnull=False).values_list("uuid", "pk"))
+    staff_pks = staff_pk_map()
+
     for entry in timesheet_entries:
         # Check if the timesheet entry already exists
         if Timesheet.objects.filter(uuid=entry["uuid"]).exists():
@@ -121,12 +128,15 @@ def sync_timesheets_to_db():
         # Create the new timesheet entry
         Timesheet.objects.create(
             uuid=entry["uuid"],
-            job_id=entry["job_id"],
+            job_number=entry["job_number"],
             job_name=entry["job_name"],
+            job_id=job_pks.get(entry["job_number"]),
             task_uuid=entry["task_uuid"],
             task_name=entry["task_name"],
+            task_id=task_pks.get(_parse_uuid(entry["task_uuid"])),
             staff_uuid=entry["staff_uuid"],
             staff_name=entry["staff_name"],
+            staff_id=staff_pks.get(_parse_uuid(entry["staff_uuid"])),
             entry_date=entry["entry_date"],
             minutes=entry["minutes"],
             note=entry["note"],
@@ -134,8 +144,19 @@ def sync_timesheets_to_db():
             invoice_task_uuid=entry["invoice_task_uuid"],
         )
 
+    link_foreign_keys()
+
     print(f"Successfully synced {len(timesheet_entries)} time sheet records.")
 
+def _parse_uuid(uuid_str):
+    """Convert a UUID string to a UUID. Return None if blank or invalid."""
+    if not uuid_str:
+        return None
+    try:
+        return uuid.UUID(uuid_str)
+    except ValueError:
+        return None
+
 # --------------------------------------------------------------------------
 # 7) Run Script
 # --------------------------------------------------------------------------